@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tracker.middleware.QueryInstrumentationMiddleware',
+    'tracker.middleware.ReadReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,7 +82,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Take the write lock when a transaction starts, so a transaction that reads first
+        # waits for busy_timeout instead of failing with "database is locked" on its first write.
+        # Needs Django 5.1 or later
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    },
+    # Read replica for reporting reads (tracker.routers.ReadReplicaRouter). Locally it is a
+    # copy of db.sqlite3 made by `manage.py refresh_replica`; tests read the primary.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['tracker.routers.ReadReplicaRouter']
+
+# Reporting views and admin changelists read from ALIAS unless the request, or a
+# request from the same client in the last MAX_LAG seconds, wrote. Off by default:
+# set ALIAS to 'replica' and keep `manage.py refresh_replica --interval 10` running
+# to use the local copy; while it is more than MAX_LAG seconds old, reads use db.sqlite3.
+TRACKER_READ_REPLICA = {
+    'ALIAS': None,
+    'MAX_LAG': 30,
+    'CACHE_ALIAS': 'analytics',
+}
+
+# Pragmas applied to every new SQLite connection (tracker.services.sqlite_profile).
+# JOURNAL_MODE is stored in the database file instead: apply it once with
+# `manage.py set_journal_mode`. The active values are at /db-diagnostics/ for staff users.
+TRACKER_SQLITE = {
+    'JOURNAL_MODE': 'wal',
+    'PRAGMAS': {
+        'synchronous': 'normal',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+        'mmap_size': 134217728,
+        'temp_store': 'memory',
+    },
 }
 
 
@@ -134,6 +173,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Budget forecasting
+# MODEL is one of 'mean', 'exponential_smoothing' or 'linear_trend'
+BUDGET_FORECAST = {
+    'MODEL': 'mean',
+    'HORIZON': 3,  # Months ahead to predict
+}
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The analytics cache is file-based so gunicorn workers and the analysis worker
+# share per-user data versions; a local-memory cache only suits a single process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'analytics',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+TRACKER_ANALYTICS_CACHE = {
+    'ALIAS': 'analytics',
+    'TIMEOUT': 60 * 60,
+    'MAX_ENTRIES': 512,
+}
+
+# Tax regimes, slabs and deduction sections/categories are held in memory per
+# process (tracker.services.reference_data). Saving a row bumps a version in the
+# ALIAS cache; each worker checks it at most every CHECK_INTERVAL seconds.
+TRACKER_REFERENCE_DATA = {
+    'ALIAS': 'analytics',
+    'CHECK_INTERVAL': 1.0,
+}
+
+# Per-request SQL instrumentation (tracker.middleware.QueryInstrumentationMiddleware)
+# BUDGETS caps the queries a view may run; going over logs a warning on the
+# tracker.queries logger. Stats are at /query-stats/ for staff users.
+TRACKER_QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    'BUDGETS': {
+        'tracker:dashboard': 14,
+        'tracker:financial_summary': 6,
+        'tracker:get_monthly_data': 5,
+        'tracker:export_data': 4,
+        'tracker:regime_comparison': 8,
+        'tracker:regime_comparison_data': 7,
+        'tracker:tax_deductions': 10,
+    },
+    'DEFAULT_BUDGET': 30,
+}
+
 # Authentication settings
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = 'login'
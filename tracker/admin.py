@@ -1,4 +1,11 @@
+from datetime import date
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .services.replica import reporting_reads
 from .models import (
     UserProfile,
     Category,
@@ -10,9 +17,144 @@ from .models import (
     DeductionSection,
     DeductionCategory,
     TaxDeduction,
-    UserTaxProfile
+    UserTaxProfile,
+    MonthlyExpenseRollup,
+    MonthlyIncomeRollup
 )
 
+# GET parameter that scopes a large changelist to one user
+USER_PARAMETER = 'user__id__exact'
+
+
+def estimated_row_count(model, using='default'):
+    """Approximate row count of a model's table without scanning it, or None if unknown."""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            # One seek on the rowid B-tree; overcounts by the rows deleted since the last insert
+            cursor.execute(f'SELECT MAX(rowid) FROM {table}')
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that stops counting after exact_count_limit rows.
+
+    Smaller result sets get their exact count from a COUNT over a LIMITed
+    subquery. Past the limit an unfiltered changelist uses the table
+    estimate, and a filtered one pages through the first
+    exact_count_limit rows only, so narrowing the filters is the way on.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if bounded <= self.exact_count_limit:
+            return bounded
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate:
+                return max(estimate, bounded)
+        return bounded
+
+
+class UserScopedCategoryFilter(admin.SimpleListFilter):
+    """Category filter listing only the categories of the user the changelist is scoped to."""
+    title = 'category'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        user_id = request.GET.get(USER_PARAMETER)
+        if not (user_id and user_id.isdigit()):
+            return []
+        return list(Category.objects.filter(user_id=user_id).order_by('name').values_list('id', 'name'))
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(category_id=self.value())
+        return queryset
+
+
+class RollupDateFilter(admin.SimpleListFilter):
+    """Year and month drill-down listing the periods found in the monthly rollups.
+
+    Replaces date_hierarchy, whose distinct-date queries scan the raw
+    table; the rollups hold one row per user, group and month.
+    """
+    title = 'period'
+    parameter_name = 'period'
+    rollup_model = None
+
+    def lookups(self, request, model_admin):
+        rollups = self.rollup_model.objects.order_by()
+        user_id = request.GET.get(USER_PARAMETER)
+        if user_id and user_id.isdigit():
+            rollups = rollups.filter(user_id=user_id)
+        years = sorted(set(rollups.values_list('year', flat=True).distinct()), reverse=True)
+        choices = [(str(year), str(year)) for year in years]
+
+        year = (self.value() or '').split('-')[0]
+        if year.isdigit():
+            months = sorted(set(rollups.filter(year=year).values_list('month', flat=True).distinct()), reverse=True)
+            position = choices.index((year, year)) + 1 if (year, year) in choices else len(choices)
+            choices[position:position] = [
+                (f'{year}-{month:02d}', date(int(year), month, 1).strftime('%B %Y')) for month in months
+            ]
+        return choices
+
+    def queryset(self, request, queryset):
+        value = self.value() or ''
+        try:
+            if len(value) == 4:
+                start = date(int(value), 1, 1)
+                end = date(start.year + 1, 1, 1)
+            elif len(value) == 7:
+                start = date(int(value[:4]), int(value[5:]), 1)
+                end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+            else:
+                return queryset
+        except ValueError:
+            return queryset
+        return queryset.filter(date__gte=start, date__lt=end)
+
+
+class ExpenseDateFilter(RollupDateFilter):
+    rollup_model = MonthlyExpenseRollup
+
+
+class IncomeDateFilter(RollupDateFilter):
+    rollup_model = MonthlyIncomeRollup
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables with millions of rows.
+
+    Counts are estimated past EstimatedCountPaginator.exact_count_limit, the
+    unfiltered total is not counted again, the list is read from the read
+    replica when one is configured, and the user column links to the
+    changelist scoped to that user, which the category and period filters
+    follow.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        # Listing reads may come from the read replica; actions that write pin the primary
+        with reporting_reads():
+            return super().changelist_view(request, extra_context)
+
+    @admin.display(description='user', ordering='user__username')
+    def user_link(self, obj):
+        url = reverse(f'admin:{obj._meta.app_label}_{obj._meta.model_name}_changelist')
+        return format_html('<a href="{}?{}={}">{}</a>', url, USER_PARAMETER, obj.user_id, obj.user.username)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'monthly_income', 'currency')
@@ -25,18 +167,20 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ('name', 'user__username')
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
-    list_display = ('user', 'category', 'amount', 'date', 'description')
-    list_filter = ('category', 'date')
+class ExpenseAdmin(LargeTableAdmin):
+    list_display = ('user_link', 'category', 'amount', 'date', 'description')
+    list_filter = (UserScopedCategoryFilter, ExpenseDateFilter)
+    list_select_related = ('user', 'category')
     search_fields = ('user__username', 'description')
-    date_hierarchy = 'date'
+    raw_id_fields = ('user', 'category')
 
 @admin.register(Income)
-class IncomeAdmin(admin.ModelAdmin):
-    list_display = ('user', 'amount', 'date', 'source')
-    list_filter = ('date',)
+class IncomeAdmin(LargeTableAdmin):
+    list_display = ('user_link', 'amount', 'date', 'source')
+    list_filter = ('source', IncomeDateFilter)
+    list_select_related = ('user',)
     search_fields = ('user__username', 'source')
-    date_hierarchy = 'date'
+    raw_id_fields = ('user',)
 
 @admin.register(BudgetPrediction)
 class BudgetPredictionAdmin(admin.ModelAdmin):
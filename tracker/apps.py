@@ -7,3 +7,9 @@ class TrackerConfig(AppConfig):
 
     def ready(self):
         import tracker.signals  # noqa
+        from .services.reference_data import reference_data
+
+        # The tables are read on first use: querying here would run before migrate on a fresh database
+        reference_data.connect_signals([
+            self.get_model(name) for name in ('TaxRegime', 'TaxSlab', 'DeductionSection', 'DeductionCategory')
+        ])
@@ -4,8 +4,10 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import (
     Category, Expense, UserProfile, Income,
-    TaxDeduction, UserTaxProfile
+    TaxDeduction, UserTaxProfile, DeductionCategory
 )
+from .services.deduction_headroom import deduction_headroom
+from .services.reference_data import reference_data
 
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField()
@@ -73,30 +75,100 @@ class IncomeForm(forms.ModelForm):
             raise forms.ValidationError("Amount must be greater than zero.")
         return amount
 
+class SnapshotCategoryIterator(forms.models.ModelChoiceIterator):
+    """Deduction category choices built from the reference data snapshot instead of a query."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for category in self.field.categories:
+            yield (
+                forms.models.ModelChoiceIteratorValue(category.id, category),
+                self.field.reference_data.category_label(category),
+            )
+
+    def __len__(self):
+        return len(self.field.categories) + (self.field.empty_label is not None)
+
+
+class DeductionCategoryChoiceField(forms.ModelChoiceField):
+    """Offers the categories of a reference data snapshot and validates against the same ids."""
+    iterator = SnapshotCategoryIterator
+
+    def set_categories(self, snapshot, categories):
+        self.reference_data = snapshot
+        self.categories = categories
+        # Looked up once when the form is validated; rendering stays on the snapshot
+        self.queryset = DeductionCategory.objects.filter(id__in=[category.id for category in categories])
+
+
 class TaxDeductionForm(forms.ModelForm):
     class Meta:
         model = TaxDeduction
         fields = ['deduction_category', 'amount', 'fiscal_year', 'date_claimed', 'proof_document']
+        field_classes = {
+            'deduction_category': DeductionCategoryChoiceField,
+        }
         widgets = {
             'date_claimed': forms.DateInput(attrs={'type': 'date'}),
         }
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
+        self.user = user
+        # Views that already loaded the profile pass it in (None when the user has none)
+        if 'tax_profile' in kwargs:
+            tax_profile = kwargs.pop('tax_profile')
+        else:
+            tax_profile = UserTaxProfile.objects.filter(user=user).first() if user else None
         super().__init__(*args, **kwargs)
-        if user:
-            try:
-                tax_profile = UserTaxProfile.objects.get(user=user)
-                if tax_profile.tax_regime == 'new':
-                    self.fields['deduction_category'].queryset = self.fields['deduction_category'].queryset.filter(
-                        section__applicable_new_regime=True
-                    )
-                else:
-                    self.fields['deduction_category'].queryset = self.fields['deduction_category'].queryset.filter(
-                        section__applicable_old_regime=True
-                    )
-            except UserTaxProfile.DoesNotExist:
-                pass
+
+        # Choices come from the reference data cache rather than a query per render
+        self.reference_data = reference_data.get()
+        if tax_profile:
+            categories = self.reference_data.categories_for_regime(tax_profile.tax_regime)
+        else:
+            categories = self.reference_data.categories
+        self.fields['deduction_category'].set_categories(self.reference_data, categories)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        category = cleaned_data.get('deduction_category')
+        amount = cleaned_data.get('amount')
+        fiscal_year = cleaned_data.get('fiscal_year')
+        if not (self.user and category and amount is not None and fiscal_year):
+            return cleaned_data
+
+        # Claimed totals for the year come from the cached headroom rather than a query per limit
+        headroom = deduction_headroom(self.user.id, fiscal_year)
+        limits = headroom['categories'].get(category.id)
+        if limits is None:
+            return cleaned_data
+        section = next(section for section in headroom['sections'] if section['id'] == limits['section_id'])
+
+        # The deduction being edited is already part of the claimed totals
+        category_claimed, section_claimed = limits['claimed'], section['claimed']
+        instance = self.instance
+        if instance.pk and instance.fiscal_year == fiscal_year and instance.verification_status != 'rejected':
+            previous = headroom['categories'].get(instance.deduction_category_id)
+            if instance.deduction_category_id == category.id:
+                category_claimed -= instance.amount
+            if previous and previous['section_id'] == section['id']:
+                section_claimed -= instance.amount
+
+        category_left = max(limits['max_limit'] - category_claimed, 0)
+        section_left = max(section['max_limit'] - section_claimed, 0)
+        if amount > category_left:
+            self.add_error('amount', (
+                f"Only ₹{category_left:,.2f} of the ₹{limits['max_limit']:,.2f} limit for "
+                f"{limits['name']} is left in {fiscal_year}"
+            ))
+        elif amount > section_left:
+            self.add_error('amount', (
+                f"Only ₹{section_left:,.2f} of the ₹{section['max_limit']:,.2f} section "
+                f"{section['section_code']} limit is left in {fiscal_year}"
+            ))
+        return cleaned_data
 
 class UserTaxProfileForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,81 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from tracker.services.sqlite_profile import (
+    BASELINE_PRAGMAS, apply_pragmas, configured_profile, run_reader, run_writer, summarize
+)
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+class Command(BaseCommand):
+    help = 'Measures SQLite read throughput with parallel readers and one writer, before and after the pragma profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes running alongside the writer')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds each profile is measured for')
+        parser.add_argument('--output', help='JSON file to write the results to')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark only applies to the SQLite backend.')
+        if options['readers'] < 1 or options['duration'] <= 0:
+            raise CommandError('--readers must be at least 1 and --duration positive')
+
+        profiles = {'baseline': BASELINE_PRAGMAS, 'configured': configured_profile()}
+        results = {'readers': options['readers'], 'duration': options['duration'], 'profiles': {}}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas in profiles.items():
+                # A fresh copy per profile, so the journal mode of one run does not carry over
+                path = os.path.join(directory, f'{name}.sqlite3')
+                user_ids = self._copy_database(path, pragmas)
+                self.stdout.write(f"Measuring the {name} profile ({options['readers']} readers, 1 writer)...")
+                results['profiles'][name] = self._measure(path, pragmas, user_ids, options)
+                results['profiles'][name]['pragmas'] = pragmas
+
+        for name, result in results['profiles'].items():
+            reads, writes = result['reads'], result['writes']
+            self.stdout.write(
+                f"  - {name}: {reads['per_second']:,.1f} reads/s (median {reads['median_ms']} ms, "
+                f"p95 {reads['p95_ms']} ms, max {reads['max_ms']} ms, {reads['errors']} lock errors); "
+                f"{writes['per_second']:,.1f} writes/s ({writes['errors']} lock errors)"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        before = results['profiles']['baseline']['reads']['per_second']
+        after = results['profiles']['configured']['reads']['per_second']
+        change = f'{after / before:.1f}x' if before else 'n/a'
+        self.stdout.write(self.style.SUCCESS(f'Read throughput with the configured profile: {change} the baseline'))
+
+    def _copy_database(self, path, pragmas):
+        """Copy the database with the backup API and return the users with the most expenses."""
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        apply_pragmas(target, pragmas)
+        target.execute(
+            'CREATE TABLE benchmark_writes (id INTEGER PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        user_ids = [row[0] for row in target.execute(
+            'SELECT user_id FROM tracker_expense GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 50'
+        )]
+        target.commit()
+        target.close()
+        return user_ids
+
+    def _measure(self, path, pragmas, user_ids, options):
+        readers, duration = options['readers'], options['duration']
+        with ProcessPoolExecutor(max_workers=readers + 1) as pool:
+            # Give every process time to start so they all begin together
+            start_at = time.time() + 1.0
+            writer = pool.submit(run_writer, path, pragmas, start_at, duration)
+            reads = [pool.submit(run_reader, path, pragmas, user_ids, start_at, duration) for _ in range(readers)]
+            return {
+                'reads': summarize([future.result() for future in reads], duration),
+                'writes': summarize([writer.result()], duration),
+            }
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from tracker.services.tax_engine import compiled_regimes, compute_liabilities, current_fiscal_year
+import re
+import time
+
+class Command(BaseCommand):
+    help = 'Computes every user\'s tax liability under the old and new regimes in one batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fiscal-year', default=current_fiscal_year(), help='Fiscal year as 2024-25')
+        parser.add_argument('--user', help='Only compute the liability of this username')
+
+    def handle(self, *args, **options):
+        fiscal_year = options['fiscal_year']
+        if not re.fullmatch(r'\d{4}-\d{2}', fiscal_year):
+            raise CommandError(f'Invalid --fiscal-year value: {fiscal_year}')
+        if not compiled_regimes():
+            self.stdout.write(self.style.ERROR('No active tax regime has slabs. Please run setup_test_data first.'))
+            return
+
+        user_ids = None
+        if options['user']:
+            try:
+                user_ids = [User.objects.get(username=options['user']).id]
+            except User.DoesNotExist:
+                self.stdout.write(self.style.ERROR(f"User {options['user']} does not exist."))
+                return
+
+        started = time.perf_counter()
+        results = compute_liabilities(fiscal_year, user_ids=user_ids)
+        elapsed = time.perf_counter() - started
+
+        usernames = dict(User.objects.filter(id__in=list(results)).values_list('id', 'username'))
+        for user_id, result in sorted(results.items(), key=lambda item: usernames[item[0]]):
+            liabilities = ', '.join(
+                f"{code} ₹{regime['total']:,.2f}" for code, regime in sorted(result['regimes'].items())
+            )
+            self.stdout.write(
+                f"  - {usernames[user_id]}: income ₹{result['gross_income']:,.2f}; {liabilities}; "
+                f"{result['better_regime']} regime is cheaper"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed liabilities for {len(results)} user(s) in FY {fiscal_year} in {elapsed:.3f}s'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from tracker.services.media import migrate_legacy_files, prune_unreferenced, rebuild_references
+from tracker.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = 'Moves tax proofs and Form 16 uploads to content-addressed paths and recounts their references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats', action='store_true', help='Only print the deduplication statistics')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete files in the upload directories that no row points at')
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            moved, missing = migrate_legacy_files()
+            self.stdout.write(f'Moved {moved} files to content-addressed paths')
+            for name in missing:
+                self.stdout.write(self.style.WARNING(f'  - missing file: {name}'))
+
+            references = rebuild_references()
+            self.stdout.write(f'Counted {sum(references.values())} references to {len(references)} files')
+
+            if options['prune']:
+                removed, freed = prune_unreferenced()
+                self.stdout.write(f'Deleted {removed} unreferenced files ({freed / 1024:,.1f} KiB)')
+
+        stats = content_storage.stats()
+        self.stdout.write(f'  - files stored: {stats["files"]}')
+        self.stdout.write(f'  - references: {stats["reference_count"]}')
+        self.stdout.write(f'  - stored size: {stats["stored_bytes"] / 1024:,.1f} KiB')
+        self.stdout.write(f'  - size without dedup: {stats["logical_bytes"] / 1024:,.1f} KiB')
+        self.stdout.write(self.style.SUCCESS(
+            f'Dedup ratio {stats["dedup_ratio"]:.2f} ({stats["saved_bytes"] / 1024:,.1f} KiB saved)'
+        ))
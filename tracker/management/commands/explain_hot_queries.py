@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q, Sum
+from django.utils import timezone
+from datetime import timedelta
+from tracker.models import (
+    Expense, Income, BudgetPrediction, BudgetRecommendation, AnalysisJob,
+    MonthlyExpenseRollup, MonthlyIncomeRollup
+)
+from tracker.services.rollups import month_bounds, month_range_q
+import re
+
+# A plan step that reads a whole table rather than seeking an index
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)')
+
+class Command(BaseCommand):
+    help = 'Prints the SQLite query plans of the hot dashboard and analysis queries and flags full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to build the queries for (defaults to the first user)')
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if any query scans a full table')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('explain_hot_queries reads SQLite query plans; the default database is not SQLite.')
+
+        user = User.objects.filter(username=options['user']).first() if options['user'] else User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('No matching user found. Please run setup_test_data first.')
+
+        scans = []
+        for name, queryset in self._hot_queries(user):
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+
+            tables = FULL_SCAN.findall(plan)
+            if tables:
+                scans.append(name)
+                self.stdout.write(self.style.WARNING(f"  full scan of {', '.join(tables)}"))
+            self.stdout.write('')
+
+        if scans:
+            message = f"{len(scans)} hot queries scan a full table: {', '.join(scans)}"
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No full table scans in the hot queries'))
+
+    def _hot_queries(self, user):
+        today = timezone.now().date()
+        year_ago = today - timedelta(days=365)
+        first_day, next_month = month_bounds(today.year, today.month)
+        category = user.category_set.order_by('id').first()
+
+        queries = [
+            ('Expense by user and date range', Expense.objects.filter(
+                user=user, date__gte=year_ago, date__lte=today
+            ).order_by('date')),
+            ('Income by user and date range', Income.objects.filter(
+                user=user, date__gte=year_ago, date__lte=today
+            ).order_by('date')),
+            ('Income month total (rollup rebuild)', Income.objects.filter(
+                user=user, source='salary', date__gte=first_day, date__lt=next_month
+            ).values('user').annotate(total=Sum('amount'))),
+            ('Expense rollup series', MonthlyExpenseRollup.objects.filter(
+                month_range_q(year_ago, today), user=user
+            ).values('year', 'month', 'category__name').annotate(total=Sum('total'))),
+            ('Income rollup series', MonthlyIncomeRollup.objects.filter(
+                month_range_q(year_ago, today), user=user
+            ).values('year', 'month').annotate(total=Sum('total'))),
+            ('Future budget predictions', BudgetPrediction.objects.filter(
+                Q(year=today.year, month__gt=today.month) | Q(year__gt=today.year),
+                user=user
+            ).select_related('category').order_by('year', 'month')),
+            ('Open budget recommendations', BudgetRecommendation.objects.filter(
+                user=user, implemented=False
+            ).select_related('category')),
+            ('Next pending analysis job', AnalysisJob.objects.filter(
+                status='pending'
+            ).order_by('requested_at')[:1]),
+        ]
+        if category is not None:
+            queries.insert(1, ('Expense month total for a category (rollup rebuild)', Expense.objects.filter(
+                user=user, category=category, date__gte=first_day, date__lt=next_month
+            ).values('user').annotate(total=Sum('amount'))))
+        return queries
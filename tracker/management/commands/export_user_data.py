@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from tracker.services.export import EXPORT_FORMATS, DEFAULT_CHUNK_SIZE, export_stream
+from datetime import datetime
+import sys
+import time
+
+class Command(BaseCommand):
+    help = "Streams a user's expenses and income to a CSV or JSON-lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to export')
+        parser.add_argument('--output', default='-', help='File to write to (default: standard output)')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--start', help='Only rows on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Only rows on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--type', choices=['all', 'expense', 'income'], default='all')
+        parser.add_argument('--category', action='append', help='Only expenses in this category (repeatable)')
+        parser.add_argument('--source', action='append', help='Only income from this source (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('--start and --end must be dates in YYYY-MM-DD format')
+
+        chunks = export_stream(
+            user,
+            format=options['format'],
+            compress=options['gzip'],
+            start_date=start_date,
+            end_date=end_date,
+            categories=options['category'],
+            sources=options['source'],
+            types=('expense', 'income') if options['type'] == 'all' else (options['type'],),
+            chunk_size=options['chunk_size'],
+        )
+
+        started = time.perf_counter()
+        written = 0
+        to_stdout = options['output'] == '-'
+        output = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if to_stdout:
+                output.flush()
+            else:
+                output.close()
+
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported {written:,} bytes for {user.username} to {options['output']} "
+                f"in {time.perf_counter() - started:.2f}s"
+            ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from tracker.services.importer import ExpenseImporter
+import json
+
+class Command(BaseCommand):
+    help = 'Imports expenses for a user from a CSV file in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file to import')
+        parser.add_argument('--user', required=True, help='Username to import the expenses for')
+        parser.add_argument('--mapping', help='JSON file describing how CSV columns map to expense fields')
+        parser.add_argument('--start-month', help='YYYY-MM that month index 1 refers to (for month_index dates)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Expenses inserted per transaction')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        mapping = {}
+        if options['mapping']:
+            with open(options['mapping']) as f:
+                mapping = json.load(f)
+        if options['start_month']:
+            mapping['start_month'] = options['start_month']
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        try:
+            importer = ExpenseImporter(user, mapping=mapping, chunk_size=options['chunk_size'])
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                stats = importer.import_file(f, on_chunk=self._report_progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in importer.errors:
+            self.stdout.write(self.style.WARNING(f'  - {error}'))
+
+        seconds = stats['seconds'] or 1e-9
+        self.stdout.write(
+            f"  - {stats['rows']} CSV rows, {stats['skipped']} skipped, "
+            f"{stats['categories_created']} new categories"
+        )
+        self.stdout.write(
+            f"  - {stats['created']} expenses in {stats['seconds']:.2f}s "
+            f"({stats['rows'] / seconds:,.0f} rows/s, {stats['created'] / seconds:,.0f} expenses/s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Successfully imported expenses for {user.username}"))
+
+    def _report_progress(self, stats):
+        if self.verbosity > 1:
+            self.stdout.write(f"  ... {stats['created']} expenses saved ({stats['seconds']:.2f}s)")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from tracker.services.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Regenerates the monthly expense and income rollups from raw rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild rollups for this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                self.stdout.write(self.style.ERROR(f"User {options['user']} does not exist."))
+                return
+
+        written = rebuild_rollups(user=user)
+        for rollup_model, count in written.items():
+            self.stdout.write(f'  - {rollup_model._meta.verbose_name_plural}: {count} rows')
+
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt rollups'))
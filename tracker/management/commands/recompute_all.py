@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from tracker.services.batch import run_batch, users_to_recompute
+from datetime import datetime, timedelta
+import os
+import re
+import time
+
+class Command(BaseCommand):
+    help = 'Recomputes budget predictions and recommendations for every user in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+        parser.add_argument('--shard-size', type=int, default=25, help='Users handed to a worker at a time')
+        parser.add_argument(
+            '--since',
+            help='Skip users whose data has not changed since this time: a date, a datetime, or an age like 24h or 7d'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['shard_size'] < 1:
+            raise CommandError('--workers and --shard-size must be at least 1')
+
+        since = self._parse_since(options['since']) if options['since'] else None
+        user_ids = users_to_recompute(since=since)
+        if not user_ids:
+            self.stdout.write(self.style.SUCCESS('No users need recomputing'))
+            return
+
+        self.stdout.write(f"Recomputing {len(user_ids)} user(s) with {options['workers']} worker(s)...")
+        started = time.perf_counter()
+        totals = {'users': 0, 'failed': 0, 'created': 0, 'updated': 0, 'deleted': 0}
+
+        for number, stats in run_batch(user_ids, workers=options['workers'], shard_size=options['shard_size']):
+            rate = stats['users'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(
+                f"  - Shard {number}: {stats['users']} users in {stats['seconds']:.2f}s ({rate:.1f} users/s), "
+                f"{stats['created']} created, {stats['updated']} updated, {stats['deleted']} deleted, "
+                f"{stats['failed']} failed"
+            )
+            for key in totals:
+                totals[key] += stats[key]
+
+        elapsed = time.perf_counter() - started
+        summary = (
+            f"Recomputed {totals['users']} user(s) in {elapsed:.2f}s ({totals['users'] / elapsed:.1f} users/s): "
+            f"{totals['created']} created, {totals['updated']} updated, {totals['deleted']} deleted"
+        )
+        if totals['failed']:
+            self.stdout.write(self.style.ERROR(f"{summary}; {totals['failed']} failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _parse_since(self, value):
+        try:
+            match = re.fullmatch(r'(\d+)([hd])', value)
+            if match:
+                amount, unit = int(match.group(1)), match.group(2)
+                return timezone.now() - (timedelta(hours=amount) if unit == 'h' else timedelta(days=amount))
+
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                if day is None:
+                    raise CommandError(f'Invalid --since value: {value}')
+                moment = datetime(day.year, day.month, day.day)
+        except (ValueError, OverflowError) as exc:
+            # Well formed but impossible, e.g. 2024-02-30 or an age reaching past year 1
+            raise CommandError(f'Invalid --since value: {value} ({exc})')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
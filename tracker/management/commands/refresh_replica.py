@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from tracker.services.replica import get_read_replica_settings, refresh_replica, replica_alias
+import time
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database into the read replica, once or every --interval seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep refreshing, waiting this many seconds between copies')
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if not alias:
+            raise CommandError('No read replica is configured; set TRACKER_READ_REPLICA["ALIAS"].')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('Only a SQLite stand-in replica is refreshed by copying; a real replica keeps itself current.')
+
+        interval = options['interval']
+        max_lag = get_read_replica_settings()['MAX_LAG']
+        if interval is not None and interval >= max_lag:
+            self.stdout.write(self.style.WARNING(
+                f'--interval {interval:g} is not below MAX_LAG ({max_lag}s); reads will fall back to the primary between copies'
+            ))
+
+        try:
+            while True:
+                started = time.time()
+                refreshed = refresh_replica()
+                if interval is None and not refreshed:
+                    raise CommandError(f'{alias} was not refreshed: the copy failed or another refresh is running.')
+                if refreshed:
+                    self.stdout.write(f'Copied the primary into {alias} in {time.time() - started:.2f}s')
+                else:
+                    self.stdout.write(self.style.WARNING(f'{alias} was not refreshed; reads use the primary until it is'))
+                if interval is None:
+                    break
+                time.sleep(max(interval - (time.time() - started), 0))
+        except KeyboardInterrupt:
+            pass
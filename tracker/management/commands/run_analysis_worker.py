@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from tracker.services.jobs import process_jobs, requeue_stale_jobs
+import time
+
+class Command(BaseCommand):
+    help = 'Processes queued budget recomputation jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--batch', type=int, default=50, help='Maximum jobs to run between stale-job checks')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Starting budget analysis worker...')
+
+        try:
+            while True:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+
+                processed = process_jobs(limit=options['batch'])
+                if processed:
+                    self.stdout.write(f'Processed {processed} job(s)')
+
+                if options['once'] and processed < options['batch']:
+                    break
+                if not processed:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from tracker.services.benchmark import benchmark_users, compare_results
+from tracker.services.seeding import seed_users
+import django
+import json
+import os
+import platform
+import tempfile
+import time
+
+class Command(BaseCommand):
+    help = 'Times the dashboard, summary and monthly data views and the budget analyzer at several data sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1x6x1,5x8x2,20x12x3',
+            help='Comma-separated USERSxCATEGORIESxYEARS datasets to seed and benchmark'
+        )
+        parser.add_argument(
+            '--existing', metavar='PREFIX',
+            help='Benchmark users already seeded with this prefix in the current database instead of seeding'
+        )
+        parser.add_argument('--sample', type=int, default=3, help='Users benchmarked per dataset')
+        parser.add_argument('--repeat', type=int, default=3, help='Calls per user and benchmark')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data')
+        parser.add_argument('--output', default='benchmark-results.json', help='JSON file to write the results to')
+        parser.add_argument('--compare', help='Earlier results file to compare median times against')
+
+    def handle(self, *args, **options):
+        if options['sample'] < 1 or options['repeat'] < 1:
+            raise CommandError('--sample and --repeat must be at least 1')
+
+        results = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'runs': [],
+        }
+
+        if options['existing']:
+            users = list(User.objects.filter(username__startswith=options['existing']).order_by('id'))
+            if not users:
+                raise CommandError(f"No users with prefix {options['existing']!r}. Run seed_benchmark first.")
+            results['runs'].append(self._benchmark(users, {'prefix': options['existing'], 'users': len(users)}, options))
+        else:
+            sizes = self._parse_sizes(options['sizes'])
+            with self._scratch_database():
+                for users, categories, years in sizes:
+                    size = {'users': users, 'categories': categories, 'years': years}
+                    self.stdout.write(f'Seeding {users} users x {categories} categories x {years} year(s)...')
+                    call_command('flush', interactive=False, verbosity=0)
+                    started = time.perf_counter()
+                    rows = seed_users(users, categories=categories, years=years, seed=options['seed'])
+                    seed_seconds = time.perf_counter() - started
+
+                    sample = list(User.objects.order_by('id')[:options['sample']])
+                    run = self._benchmark(sample, size, options)
+                    run.update(rows=rows, seed_seconds=round(seed_seconds, 3))
+                    results['runs'].append(run)
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+
+        if options['compare']:
+            self._compare(options['compare'], results)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
+
+    def _benchmark(self, users, size, options):
+        benchmarks = benchmark_users(users[:options['sample']], repeat=options['repeat'])
+        for name, summary in benchmarks.items():
+            self.stdout.write(
+                f"  - {name}: {summary['median_ms']:.1f} ms median "
+                f"({summary['min_ms']:.1f}-{summary['max_ms']:.1f}), {summary['queries']} queries"
+            )
+        return {'size': size, 'benchmarks': benchmarks}
+
+    def _compare(self, path, results):
+        try:
+            with open(path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        self.stdout.write(f'Compared with {path}:')
+        for label, name, before, after in compare_results(previous, results):
+            change = (after - before) / before * 100 if before else 0
+            style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+            self.stdout.write(style(f'  - {label} {name}: {before:.1f} -> {after:.1f} ms ({change:+.0f}%)'))
+
+    def _parse_sizes(self, value):
+        sizes = []
+        for part in value.split(','):
+            try:
+                users, categories, years = (int(number) for number in part.strip().lower().split('x'))
+            except ValueError:
+                raise CommandError(f'Invalid size {part!r}; expected USERSxCATEGORIESxYEARS, e.g. 5x8x2')
+            if min(users, categories, years) < 1:
+                raise CommandError(f'Invalid size {part!r}; every dimension must be at least 1')
+            sizes.append((users, categories, years))
+        return sizes
+
+    @contextmanager
+    def _scratch_database(self):
+        """Run against a throwaway copy of the schema so real data is never touched."""
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        old_test_name = test_settings.get('NAME')
+
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # On disk rather than in memory, so timings include real I/O
+                test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            self.stdout.write('Creating a scratch database...')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = old_test_name
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from tracker.services.seeding import delete_seeded_users, seed_users
+from datetime import datetime
+import time
+
+class Command(BaseCommand):
+    help = 'Generates a deterministic synthetic dataset of users, expenses and income for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create')
+        parser.add_argument('--categories', type=int, default=8, help='Expense categories per user')
+        parser.add_argument('--years', type=int, default=1, help='Years of history per user')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--prefix', default='bench_', help='Username prefix for the generated users')
+        parser.add_argument('--end-month', help='Last month of generated history as YYYY-MM (default: this month)')
+        parser.add_argument('--reset', action='store_true', help='Delete existing users with the prefix first')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['categories'], options['years']) < 1:
+            raise CommandError('--users, --categories and --years must be at least 1')
+
+        end_month = None
+        if options['end_month']:
+            try:
+                end = datetime.strptime(options['end_month'], '%Y-%m')
+            except ValueError:
+                raise CommandError('--end-month must be in YYYY-MM format')
+            end_month = (end.year, end.month)
+
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            if not options['reset']:
+                raise CommandError(f'Users with prefix {prefix!r} already exist. Use --reset or another --prefix.')
+            deleted = delete_seeded_users(prefix)
+            self.stdout.write(f'Deleted {deleted} existing {prefix}* user(s)')
+
+        self.stdout.write(
+            f"Seeding {options['users']} users x {options['categories']} categories x {options['years']} year(s)..."
+        )
+        started = time.perf_counter()
+        counts = seed_users(
+            options['users'],
+            categories=options['categories'],
+            years=options['years'],
+            seed=options['seed'],
+            prefix=prefix,
+            end_month=end_month,
+        )
+        elapsed = time.perf_counter() - started
+
+        for name, count in counts.items():
+            self.stdout.write(f'  - {name}: {count:,}')
+        rows = counts['expenses'] + counts['incomes']
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully seeded {rows:,} transactions in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from tracker.services.sqlite_profile import configured_journal_mode, read_pragmas
+
+class Command(BaseCommand):
+    help = "Switches the SQLite database file to TRACKER_SQLITE['JOURNAL_MODE'] (WAL by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', help='Journal mode to set instead of the configured one, e.g. delete to undo WAL')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The journal mode only applies to the SQLite backend.')
+        mode = (options['mode'] or configured_journal_mode()).lower()
+        if not mode.isalpha():
+            raise CommandError(f'Invalid journal mode: {mode!r}')
+
+        connection.ensure_connection()
+        before = read_pragmas(connection.connection, ['journal_mode'])['journal_mode']
+        # The mode is kept in the file header, so it outlasts this connection; other processes
+        # holding the database open make the switch fail with "database is locked"
+        after = connection.connection.execute(f'PRAGMA journal_mode = {mode}').fetchone()[0]
+        if after != mode:
+            raise CommandError(f'SQLite kept the {after} journal mode; stop other processes using the database and retry.')
+        self.stdout.write(self.style.SUCCESS(f'Journal mode of {connection.settings_dict["NAME"]}: {before} -> {after}'))
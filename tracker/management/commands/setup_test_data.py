@@ -1,10 +1,12 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
 from tracker.models import (
     UserProfile, Category, Expense, Income, TaxDeduction,
-    DeductionSection, DeductionCategory, UserTaxProfile, TaxRegime
+    DeductionSection, DeductionCategory, UserTaxProfile, TaxRegime, TaxSlab
 )
+from tracker.services.reference_data import reference_data
 from decimal import Decimal
 from datetime import datetime, timedelta
 import random
@@ -12,6 +14,31 @@ import random
 class Command(BaseCommand):
     help = 'Populates the database with test data'
 
+    # FY 2024-25 slabs as (min, max, rate %, surcharge %), split where the surcharge rate changes
+    TAX_SLABS = {
+        'Old': [
+            (0, 250000, 0, 0),
+            (250000, 500000, 5, 0),
+            (500000, 1000000, 20, 0),
+            (1000000, 5000000, 30, 0),
+            (5000000, 10000000, 30, 10),
+            (10000000, 20000000, 30, 15),
+            (20000000, 50000000, 30, 25),
+            (50000000, None, 30, 37),
+        ],
+        'New': [
+            (0, 300000, 0, 0),
+            (300000, 700000, 5, 0),
+            (700000, 1000000, 10, 0),
+            (1000000, 1200000, 15, 0),
+            (1200000, 1500000, 20, 0),
+            (1500000, 5000000, 30, 0),
+            (5000000, 10000000, 30, 10),
+            (10000000, 20000000, 30, 15),
+            (20000000, None, 30, 25),
+        ],
+    }
+
     def handle(self, *args, **kwargs):
         self.stdout.write('Creating test data...')
         
@@ -83,6 +110,13 @@ class Command(BaseCommand):
                     'is_active': True
                 }
             )
+            if not TaxSlab.objects.filter(regime=regime).exists():
+                TaxSlab.objects.bulk_create(
+                    TaxSlab(regime=regime, min_amount=low, max_amount=high, tax_rate=rate, surcharge_rate=surcharge)
+                    for low, high, rate, surcharge in self.TAX_SLABS[name]
+                )
+                # bulk_create sends no post_save, so the cached slabs would not be reloaded
+                transaction.on_commit(reference_data.invalidate)
             regimes.append(regime)
         return regimes
 
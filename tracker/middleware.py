@@ -0,0 +1,88 @@
+import logging
+import time
+from contextlib import ExitStack
+from django.db import connections
+from .services.replica import get_read_replica_settings, has_written, replica_alias, replica_is_current, request_scope
+from .services.query_instrumentation import (
+    QueryBudgetExceeded, QueryRecorder, get_query_instrumentation_settings,
+    query_budget, query_stats
+)
+
+logger = logging.getLogger('tracker.queries')
+
+
+class QueryInstrumentationMiddleware:
+    """Counts and times the SQL each request runs and checks it against a query budget.
+
+    Every database connection is wrapped for the duration of the request,
+    so this works with DEBUG off. Results go to a Server-Timing header and
+    to the rolling per-URL summary shown on the query stats page. Queries
+    run while a streaming response is being sent are not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_query_instrumentation_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        url_name = match.view_name if match else 'unresolved'
+        report = recorder.report(slowest=config['SLOWEST'])
+        query_stats.record(url_name, report, total_ms, history=config['HISTORY'])
+
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'db;dur={report["sql_ms"]:.1f};desc="{report["count"]} queries", '
+                f'app;dur={total_ms:.1f}'
+            )
+
+        budget = query_budget(url_name)
+        if budget is not None and report['count'] > budget:
+            message = f'{url_name} ran {report["count"]} queries, over its budget of {budget}'
+            if report['duplicates']:
+                shape, count = report['duplicates'][0]
+                message += f'; most repeated ({count}x): {shape}'
+            if config['RAISE_ON_BUDGET']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+class ReadReplicaMiddleware:
+    """Routing state for ReadReplicaRouter, scoped to one request.
+
+    A request starts pinned to the primary when its client wrote within the
+    last MAX_LAG seconds (tracked with a cookie), so a redirect after a POST
+    does not read from a replica that has not caught up yet. A request that
+    writes tracker data sets that cookie (see ReadReplicaRouter). While the replica trails the primary by more
+    than MAX_LAG, e.g. because `manage.py refresh_replica` is not running,
+    every request reads from the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_alias():
+            return self.get_response(request)
+
+        config = get_read_replica_settings()
+        pinned = config['COOKIE'] in request.COOKIES or not replica_is_current()
+        with request_scope(pinned=pinned):
+            response = self.get_response(request)
+            wrote = has_written()
+        if wrote:
+            response.set_cookie(config['COOKIE'], '1', max_age=config['MAX_LAG'], httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, Count, Min, Max, F, FloatField
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+
+def build_rollups(apps, schema_editor):
+    for model_name, rollup_name, group_field in [
+        ('Expense', 'MonthlyExpenseRollup', 'category_id'),
+        ('Income', 'MonthlyIncomeRollup', 'source'),
+    ]:
+        model = apps.get_model('tracker', model_name)
+        rollup_model = apps.get_model('tracker', rollup_name)
+        grouped = model.objects.order_by().annotate(
+            year=ExtractYear('date'),
+            month=ExtractMonth('date'),
+        ).values('user_id', group_field, 'year', 'month').annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+            sum_squares=Sum(F('amount') * F('amount'), output_field=FloatField()),
+            min_amount=Min('amount'),
+            max_amount=Max('amount'),
+        )
+        rollup_model.objects.bulk_create([rollup_model(**row) for row in grouped], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_analysisjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('sum_squares', models.FloatField(default=0)),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tracker.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'year', 'month'), name='unique_expense_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyIncomeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('sum_squares', models.FloatField(default=0)),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source', models.CharField(choices=[('salary', 'Monthly Salary'), ('rental', 'Rental Income'), ('interest', 'Interest Received'), ('dividend', 'Dividend Income'), ('freelance', 'Freelance Income'), ('business', 'Business Income'), ('investment', 'Investment Returns'), ('gift', 'Gift Income'), ('other', 'Other Income')], max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'source', 'year', 'month'), name='unique_income_rollup')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
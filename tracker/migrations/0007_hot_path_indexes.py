@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_monthly_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budgetprediction',
+            index=models.Index(fields=['user', 'year', 'month'], name='prediction_user_year_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'category', 'date'], name='expense_user_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyexpenserollup',
+            index=models.Index(fields=['user', 'year', 'month'], name='expense_rollup_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyincomerollup',
+            index=models.Index(fields=['user', 'year', 'month'], name='income_rollup_user_month_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:20
+
+import tracker.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('references', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='taxdeduction',
+            name='proof_document',
+            field=models.FileField(blank=True, null=True, storage=tracker.storage.ContentAddressedStorage(), upload_to='tax_proofs/'),
+        ),
+        migrations.AlterField(
+            model_name='usertaxprofile',
+            name='form_16_document',
+            field=models.FileField(blank=True, null=True, storage=tracker.storage.ContentAddressedStorage(), upload_to='form16/'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:20
+
+import tracker.storage
+from collections import Counter
+from django.db import migrations
+
+
+def count_references(apps, schema_editor):
+    """Fill StoredFile with the references that rows saved before 0008 already hold.
+
+    Without them the first release of such a file would not be counted
+    down, and the file would stay on disk after its last row let go of it.
+    Files uploaded before the storage was content addressed keep their old
+    names; `manage.py dedupe_media` moves them to digest paths.
+    """
+    StoredFile = apps.get_model('tracker', 'StoredFile')
+    db_alias = schema_editor.connection.alias
+    references, storages = Counter(), {}
+    for model_name, field_name in (('TaxDeduction', 'proof_document'), ('UserTaxProfile', 'form_16_document')):
+        model = apps.get_model('tracker', model_name)
+        names = model.objects.using(db_alias).exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        for name in names.values_list(field_name, flat=True).iterator():
+            references[name] += 1
+            storages[name] = model._meta.get_field(field_name).storage
+
+    known = set(StoredFile.objects.using(db_alias).values_list('name', flat=True))
+    StoredFile.objects.using(db_alias).bulk_create(
+        StoredFile(name=name, size=storages[name].size(name), references=count)
+        for name, count in references.items()
+        if name not in known and storages[name].exists(name)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taxdeduction',
+            name='proof_document',
+            field=tracker.storage.ContentAddressedFileField(blank=True, null=True, storage=tracker.storage.ContentAddressedStorage(), upload_to='tax_proofs/'),
+        ),
+        migrations.AlterField(
+            model_name='usertaxprofile',
+            name='form_16_document',
+            field=tracker.storage.ContentAddressedFileField(blank=True, null=True, storage=tracker.storage.ContentAddressedStorage(), upload_to='form16/'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
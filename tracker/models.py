@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from .storage import ContentAddressedFileField, content_storage, save_transaction
 
 class UserProfile(models.Model):
     CURRENCY_CHOICES = [
@@ -37,6 +38,12 @@ class Expense(models.Model):
     date = models.DateField()
     description = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='expense_user_category_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.category.name} - ₹{self.amount:,.2f}"
 
@@ -59,6 +66,11 @@ class Income(models.Model):
     description = models.TextField(blank=True)
     source = models.CharField(max_length=100, choices=INCOME_SOURCE_CHOICES, default='salary')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - ₹{self.amount:,.2f} ({self.date})"
 
@@ -72,6 +84,11 @@ class BudgetPrediction(models.Model):
     notes = models.TextField(blank=True, null=True)  # Added notes field
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'year', 'month'], name='prediction_user_year_month_idx'),
+        ]
+
     def __str__(self):
         return f"{self.category.name} - ₹{self.predicted_amount:,.2f} ({self.month}/{self.year})"
 
@@ -178,7 +195,7 @@ class TaxDeduction(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     fiscal_year = models.CharField(max_length=7)  # Format: 2023-24
     date_claimed = models.DateField()
-    proof_document = models.FileField(upload_to='tax_proofs/', null=True, blank=True)
+    proof_document = ContentAddressedFileField(upload_to='tax_proofs/', storage=content_storage, null=True, blank=True)
     verification_status = models.CharField(max_length=10, choices=VERIFICATION_STATUS, default='pending')
     verification_notes = models.TextField(blank=True)
     last_modified = models.DateTimeField(auto_now=True)
@@ -186,8 +203,16 @@ class TaxDeduction(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.deduction_category.name} - ₹{self.amount:,.2f}"
 
+    def save(self, *args, **kwargs):
+        # A proof uploaded by this save takes its file reference in the same transaction
+        with save_transaction(self):
+            super().save(*args, **kwargs)
+
     def clean(self):
         from django.core.exceptions import ValidationError
+        # Either may be missing when the form already rejected it
+        if self.amount is None or self.deduction_category_id is None:
+            return
         if self.amount > self.deduction_category.max_limit:
             raise ValidationError(f'Amount exceeds maximum limit of ₹{self.deduction_category.max_limit:,.2f} for this category')
 
@@ -204,7 +229,7 @@ class UserTaxProfile(models.Model):
     is_senior_citizen = models.BooleanField(default=False)
     is_super_senior_citizen = models.BooleanField(default=False)
     employer_name = models.CharField(max_length=200, blank=True)
-    form_16_document = models.FileField(upload_to='form16/', null=True, blank=True)
+    form_16_document = ContentAddressedFileField(upload_to='form16/', storage=content_storage, null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.username}'s Tax Profile"
@@ -216,4 +241,84 @@ class UserTaxProfile(models.Model):
         age = today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
         self.is_senior_citizen = age >= 60
         self.is_super_senior_citizen = age >= 80
-        super().save(*args, **kwargs)
+        # A Form 16 uploaded by this save takes its file reference in the same transaction
+        with save_transaction(self):
+            super().save(*args, **kwargs)
+
+class AnalysisJob(models.Model):
+    """Pending budget recomputation for a user; one row per user so requests coalesce."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='analysis_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    requested_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)  # Last successful computation
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'requested_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.status}"
+
+class MonthlyRollup(models.Model):
+    """Per-month aggregates kept current by the signal handlers in tracker.signals."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    sum_squares = models.FloatField(default=0)  # Sum of amount², for variance
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    max_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+class MonthlyExpenseRollup(MonthlyRollup):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'year', 'month'], name='unique_expense_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'year', 'month'], name='expense_rollup_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} - ₹{self.total:,.2f} ({self.month}/{self.year})"
+
+class MonthlyIncomeRollup(MonthlyRollup):
+    source = models.CharField(max_length=100, choices=Income.INCOME_SOURCE_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'source', 'year', 'month'], name='unique_income_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'year', 'month'], name='income_rollup_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.source} - ₹{self.total:,.2f} ({self.month}/{self.year})"
+
+class StoredFile(models.Model):
+    """Reference count of a file kept by tracker.storage.ContentAddressedStorage."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    references = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
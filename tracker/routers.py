@@ -0,0 +1,41 @@
+from django.db import DEFAULT_DB_ALIAS
+from .services.replica import record_write, read_alias, replica_alias
+
+
+# Tracker tables written as bookkeeping rather than on the user's behalf: reading them from a
+# slightly stale replica shows the user nothing out of date
+UNPINNED_MODELS = {'tracker.AnalysisJob'}
+
+
+class ReadReplicaRouter:
+    """Send reporting reads to the read replica and everything else to the primary.
+
+    Reads go to TRACKER_READ_REPLICA['ALIAS'] only inside reporting views
+    (see tracker.services.replica.reporting) and only until the request
+    writes its user's data: the first write to a tracker model pins the
+    rest of the request to the primary, so it reads what it wrote. Session
+    saves, the recompute queue and other apps' tables do not pin. Writes
+    always go to the primary, including saves of instances that were
+    loaded from the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'tracker' and model._meta.label not in UNPINNED_MODELS:
+            record_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_ANALYTICS_CACHE_SETTINGS = {
+    'ALIAS': 'default',  # Django cache holding data versions and shared results
+    'TIMEOUT': 60 * 60,  # Seconds a result stays in the shared cache
+    'MAX_ENTRIES': 512,  # Results kept in the in-process LRU
+}
+
+_MISSING = object()
+
+
+class AnalyticsCache:
+    """Per-user cache for analysis results, invalidated by a per-user data version.
+
+    Results are stored under a key that includes the user's current data
+    version, so bumping the version makes every older entry unreachable
+    without having to find and delete it. Lookups go through a size-bounded
+    in-process LRU first and then the configured Django cache backend, which
+    also holds the versions so every worker sees the same one.
+    """
+
+    def __init__(self, alias='default', timeout=3600, max_entries=512):
+        self.alias = alias
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @classmethod
+    def from_settings(cls):
+        config = {**DEFAULT_ANALYTICS_CACHE_SETTINGS, **getattr(settings, 'TRACKER_ANALYTICS_CACHE', {})}
+        return cls(alias=config['ALIAS'], timeout=config['TIMEOUT'], max_entries=config['MAX_ENTRIES'])
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _version_key(self, user_id):
+        return f'tracker:data-version:{user_id}'
+
+    def get_version(self, user_id):
+        """Return the user's data version, starting one if the cache has none."""
+        key = self._version_key(user_id)
+        version = self.backend.get(key)
+        if version is None:
+            # Time-based so a flushed cache never hands out a version seen before
+            self.backend.add(key, time.time_ns(), None)
+            version = self.backend.get(key)
+        return version
+
+    def bump_version(self, user_id):
+        """Invalidate everything cached for the user."""
+        self.backend.set(self._version_key(user_id), time.time_ns(), None)
+
+    def version_timestamp(self, version):
+        """Return the moment a data version was created as an aware datetime."""
+        return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+
+    def get_or_compute(self, user_id, name, compute):
+        """Return the cached result called `name` for the user, computing it on a miss."""
+        key = f'tracker:analytics:{user_id}:{self.get_version(user_id)}:{name}'
+
+        value = self._local_get(key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+
+        value = self.backend.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('shared_hits')
+            self._local_set(key, value)
+            return value
+
+        self._count('misses')
+        value = compute()
+        self.backend.set(key, value, self.timeout)
+        self._local_set(key, value)
+        return value
+
+    def _local_get(self, key):
+        with self._lock:
+            value = self._local.get(key, _MISSING)
+            if value is not _MISSING:
+                self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the in-process LRU."""
+        with self._lock:
+            stats = dict(self._stats, local_entries=len(self._local))
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+analytics_cache = AnalyticsCache.from_settings()
@@ -0,0 +1,90 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+from .analytics_cache import analytics_cache
+from .budget_analysis import BudgetAnalyzer
+from .jobs import mark_recomputed
+
+logger = logging.getLogger(__name__)
+
+
+def users_to_recompute(since=None):
+    """Return the ids of users to recompute, oldest account first.
+
+    With `since`, only users whose data changed after that moment and who
+    have not been recomputed since the change are kept, along with users
+    who have never been computed at all.
+    """
+    users = User.objects.order_by('id')
+    if since is not None:
+        users = users.filter(
+            Q(analysis_job__isnull=True) |
+            Q(analysis_job__finished_at__isnull=True) |
+            Q(analysis_job__requested_at__gte=since, analysis_job__finished_at__lt=F('analysis_job__requested_at'))
+        )
+    return list(users.values_list('id', flat=True))
+
+
+def shard(user_ids, shard_size):
+    return [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+
+
+def recompute_shard(user_ids):
+    """Recompute predictions and recommendations for a shard of users.
+
+    Runs inside a pool worker. Each user's results are written with the
+    analyzer's bulk sync, and the returned stats describe the whole shard.
+    """
+    started = time.perf_counter()
+    stats = {'users': 0, 'failed': 0, 'created': 0, 'updated': 0, 'deleted': 0}
+
+    for user in User.objects.filter(id__in=user_ids).order_by('id'):
+        requested_before = timezone.now()
+        try:
+            analyzer = BudgetAnalyzer(user)
+            results = (analyzer.predict_future_expenses(), analyzer.generate_recommendations())
+        except Exception:
+            logger.exception('Batch budget recomputation failed for user %s', user.id)
+            stats['failed'] += 1
+            continue
+
+        for result in results:
+            for change in ('created', 'updated', 'deleted'):
+                stats[change] += result[change]
+        mark_recomputed(user.id, requested_before)
+        analytics_cache.bump_version(user.id)
+        stats['users'] += 1
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def run_batch(user_ids, workers=1, shard_size=25):
+    """Recompute every user in `user_ids`, yielding (shard number, stats) as shards finish.
+
+    With more than one worker the shards are spread over a process pool;
+    each process opens its own database connection.
+    """
+    shards = shard(user_ids, shard_size)
+    if workers <= 1:
+        for number, user_shard in enumerate(shards, start=1):
+            yield number, recompute_shard(user_shard)
+        return
+
+    # Connections must not be shared with forked children
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(recompute_shard, user_shard): number for number, user_shard in enumerate(shards, start=1)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _init_worker():
+    # Spawned workers start without Django set up; forked ones inherit the parent's connections
+    django.setup()
+    connections.close_all()
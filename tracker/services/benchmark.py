@@ -0,0 +1,108 @@
+import statistics
+import time
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from .. import views
+from .analytics_cache import analytics_cache
+from .budget_analysis import BudgetAnalyzer
+
+# Benchmark name -> (view, path, query parameters)
+BENCHMARK_VIEWS = {
+    'dashboard': (views.dashboard, '/', {}),
+    'financial_summary': (views.financial_summary, '/financial-summary/', {}),
+    'get_monthly_data': (views.get_monthly_data, '/get-monthly-data/', {}),
+    'get_monthly_data:range': (views.get_monthly_data, '/get-monthly-data/', {'months': '-5:0'}),
+}
+
+ANALYZER_METHODS = (
+    'get_category_statistics',
+    'analyze_spending_patterns',
+    'predict_future_expenses',
+    'generate_recommendations',
+)
+
+
+class Measurement:
+    """Wall times and query counts collected over repeated calls."""
+
+    def __init__(self):
+        self.timings = []
+        self.queries = []
+
+    def run(self, func):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            self.timings.append((time.perf_counter() - started) * 1000)
+        self.queries.append(len(captured.captured_queries))
+
+    def summary(self):
+        return {
+            'calls': len(self.timings),
+            'median_ms': round(statistics.median(self.timings), 3),
+            'min_ms': round(min(self.timings), 3),
+            'max_ms': round(max(self.timings), 3),
+            'queries': max(self.queries),
+        }
+
+
+def benchmark_users(users, repeat=3):
+    """Time every benchmarked view and analyzer method for a sample of users.
+
+    Views are measured cold, right after the user's analytics version is
+    bumped as a data change would, and warm, with the cached result in
+    place. Analyzer methods run on a fresh BudgetAnalyzer each time, so
+    writes after the first call measure the no-change sync. Returns a dict
+    of benchmark name -> summary.
+    """
+    factory = RequestFactory()
+    results = {}
+
+    for name, (view, path, params) in BENCHMARK_VIEWS.items():
+        cold, warm = Measurement(), Measurement()
+        for user in users:
+            call = _view_call(factory, view, path, params, user)
+            for _ in range(repeat):
+                analytics_cache.bump_version(user.id)
+                cold.run(call)
+                warm.run(call)
+        results[f'{name}:cold'] = cold.summary()
+        results[f'{name}:warm'] = warm.summary()
+
+    for method in ANALYZER_METHODS:
+        measurement = Measurement()
+        for user in users:
+            for _ in range(repeat):
+                measurement.run(lambda: getattr(BudgetAnalyzer(user), method)())
+        results[f'BudgetAnalyzer.{method}'] = measurement.summary()
+
+    return results
+
+
+def compare_results(previous, current):
+    """Pair benchmarks from two result files by size and name.
+
+    Yields (size label, benchmark name, previous median, current median).
+    """
+    previous_runs = {_size_label(run['size']): run['benchmarks'] for run in previous.get('runs', [])}
+    for run in current['runs']:
+        label = _size_label(run['size'])
+        for name, summary in run['benchmarks'].items():
+            before = previous_runs.get(label, {}).get(name)
+            if before:
+                yield label, name, before['median_ms'], summary['median_ms']
+
+
+def _size_label(size):
+    return '{users}x{categories}x{years}'.format(**size)
+
+
+def _view_call(factory, view, path, params, user):
+    def call():
+        request = factory.get(path, params)
+        request.user = user
+        response = view(request)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+    return call
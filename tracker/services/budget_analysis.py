@@ -1,9 +1,13 @@
 from decimal import Decimal
 from datetime import datetime, timedelta
-from django.db.models import Avg, Sum, Count, StdDev, Min, Max
+import numpy as np
+from django.db.models import Q
 from django.utils import timezone
-from collections import defaultdict
-from ..models import Expense, Category, BudgetPrediction, BudgetRecommendation
+from ..models import BudgetPrediction, BudgetRecommendation
+from .category_stats import get_category_statistics
+from .forecasting import build_history_matrix, get_forecast_settings, get_forecaster
+from .persistence import sync_rows
+from .timeseries import month_sequence
 
 class BudgetAnalyzer:
     def __init__(self, user):
@@ -11,73 +15,18 @@ class BudgetAnalyzer:
         self.today = timezone.now()
         self.start_date = self.today - timedelta(days=180)  # Last 6 months
         self.min_months_for_prediction = 1  # Reduced to 1 month to allow initial predictions
+        self._category_stats = None
+
+        forecast_settings = get_forecast_settings()
+        self.horizon = forecast_settings['HORIZON']
+        self.forecaster = get_forecaster(forecast_settings['MODEL'])
 
     def get_category_statistics(self):
         """Calculate statistics for each expense category."""
-        stats = {}
-        categories = Category.objects.filter(user=self.user)
-        
-        for category in categories:
-            expenses = Expense.objects.filter(
-                user=self.user,
-                category=category,
-                date__range=[self.start_date, self.today]
-            )
-            
-            if expenses.exists():
-                # Get the date range of expenses
-                date_range = expenses.aggregate(
-                    min_date=Min('date'),
-                    max_date=Max('date')
-                )
-                
-                # Calculate the number of months between min and max date
-                if date_range['min_date'] and date_range['max_date']:
-                    months_diff = (date_range['max_date'].year - date_range['min_date'].year) * 12 + \
-                                 (date_range['max_date'].month - date_range['min_date'].month) + 1
-                else:
-                    months_diff = 1  # Default to 1 if we can't calculate
-                
-                # Ensure we have at least 1 month of data
-                months_diff = max(1, months_diff)
-                
-                avg = expenses.aggregate(Avg('amount'))['amount__avg']
-                total = expenses.aggregate(Sum('amount'))['amount__sum']
-                count = expenses.count()
-                std_dev = expenses.aggregate(StdDev('amount'))['amount__stddev'] or 0
-                
-                # Group expenses by month to identify variations
-                monthly_expenses = defaultdict(list)
-                for expense in expenses:
-                    month_key = (expense.date.year, expense.date.month)
-                    monthly_expenses[month_key].append(expense.amount)
-                
-                # Calculate monthly totals and identify variations
-                monthly_totals = {}
-                monthly_variations = {}
-                for month_key, amounts in monthly_expenses.items():
-                    month_total = sum(amounts)
-                    monthly_totals[month_key] = month_total
-                    
-                    # Calculate variation from average
-                    if avg > 0:
-                        variation_percent = abs((month_total - avg) / avg * 100)
-                        if variation_percent > 10:  # More than 10% variation
-                            monthly_variations[month_key] = variation_percent
-                
-                stats[category.id] = {
-                    'category': category,
-                    'average': avg,
-                    'total': total,
-                    'frequency': count,
-                    'std_dev': std_dev,
-                    'monthly_avg': total / months_diff,  # Use actual months of data
-                    'months_of_data': months_diff,
-                    'monthly_totals': monthly_totals,
-                    'monthly_variations': monthly_variations
-                }
-        
-        return stats
+        # Cached per analyzer: recommendations and predictions share one pass
+        if self._category_stats is None:
+            self._category_stats = get_category_statistics(self.user, self.start_date, self.today)
+        return self._category_stats
 
     def analyze_spending_patterns(self):
         """Analyze spending patterns and identify trends."""
@@ -112,8 +61,7 @@ class BudgetAnalyzer:
         stats = self.get_category_statistics()
         patterns = self.analyze_spending_patterns()
         
-        # Clear existing recommendations
-        BudgetRecommendation.objects.filter(user=self.user).delete()
+        recommendations = []
         
         for cat_id, data in stats.items():
             category = data['category']
@@ -139,7 +87,7 @@ class BudgetAnalyzer:
                     if variation_months:
                         reason += f" Notable variations in: {', '.join(variation_months)}."
                 
-                self._create_recommendation(
+                recommendations.append(self._build_recommendation(
                     category=category,
                     rec_type='reduce',
                     priority='high',
@@ -147,11 +95,11 @@ class BudgetAnalyzer:
                     recommended_amount=monthly_avg * Decimal('0.9'),
                     reason=reason,
                     confidence_factor=confidence_factor
-                )
+                ))
             
             # High variable expenses
             elif not category.is_fixed_expense and monthly_avg > Decimal('10000'):
-                self._create_recommendation(
+                recommendations.append(self._build_recommendation(
                     category=category,
                     rec_type='reduce',
                     priority='medium',
@@ -159,12 +107,12 @@ class BudgetAnalyzer:
                     recommended_amount=monthly_avg * Decimal('0.8'),
                     reason=f"High variable spending in {category.name}. Consider setting a budget limit.",
                     confidence_factor=confidence_factor
-                )
+                ))
             
             # Saving opportunities - ONLY for variable expenses
             elif not category.is_fixed_expense and std_dev < monthly_avg * Decimal('0.2'):
                 potential_saving = monthly_avg * Decimal('0.1')
-                self._create_recommendation(
+                recommendations.append(self._build_recommendation(
                     category=category,
                     rec_type='save',
                     priority='low',
@@ -172,17 +120,25 @@ class BudgetAnalyzer:
                     recommended_amount=monthly_avg - potential_saving,
                     reason=f"Consistent spending in {category.name}. Potential for {potential_saving:,.2f} monthly savings.",
                     confidence_factor=confidence_factor
-                )
+                ))
+
+        # Only write what changed; keeps ids and the user's implemented flag
+        return sync_rows(
+            BudgetRecommendation.objects.filter(user=self.user),
+            recommendations,
+            key_fields=('category_id', 'recommendation_type'),
+            compare_fields=('priority', 'current_amount', 'recommended_amount', 'potential_savings', 'reason'),
+        )
 
-    def _create_recommendation(self, category, rec_type, priority, current_amount, recommended_amount, reason, confidence_factor=1.0):
-        """Helper method to create a budget recommendation."""
+    def _build_recommendation(self, category, rec_type, priority, current_amount, recommended_amount, reason, confidence_factor=1.0):
+        """Helper method to build an unsaved budget recommendation."""
         potential_savings = current_amount - recommended_amount
         
         # Adjust the recommendation based on confidence factor
         if confidence_factor < 0.5:
             reason += " (Note: This recommendation is based on limited data and may become more accurate over time.)"
         
-        BudgetRecommendation.objects.create(
+        return BudgetRecommendation(
             user=self.user,
             category=category,
             recommendation_type=rec_type,
@@ -197,12 +153,15 @@ class BudgetAnalyzer:
         """Generate predictions for future expenses."""
         stats = self.get_category_statistics()
         
-        # Clear existing predictions
-        BudgetPrediction.objects.filter(
-            user=self.user,
-            month__gt=self.today.month,
-            year=self.today.year
-        ).delete()
+        predictions = []
+        forecast_rows = {}
+
+        if stats:
+            # Forecast every category and horizon in one vectorized pass
+            category_ids, history = build_history_matrix(stats, month_sequence(self.start_date, self.today))
+            fixed_mask = np.array([stats[cat_id]['category'].is_fixed_expense for cat_id in category_ids])
+            forecast = self.forecaster.forecast(history, self.horizon, fixed_mask)
+            forecast_rows = dict(zip(category_ids, forecast))
         
         for cat_id, data in stats.items():
             category = data['category']
@@ -233,17 +192,11 @@ class BudgetAnalyzer:
                 if variation_months:
                     data_note = f" (Variations detected in: {', '.join(variation_months)})"
             
-            # Predict next 3 months
-            for i in range(1, 4):
+            # Predict the configured number of months ahead
+            for i, forecast_amount in enumerate(forecast_rows[cat_id], start=1):
                 future_month = (self.today.month + i) % 12 or 12
                 future_year = self.today.year + (self.today.month + i - 1) // 12
-                
-                # Adjust prediction based on historical patterns
-                if category.is_fixed_expense:
-                    predicted_amount = monthly_avg
-                else:
-                    # Add slight increase for variable expenses
-                    predicted_amount = monthly_avg * (Decimal('1') + Decimal('0.02') * Decimal(str(i)))  # 2% increase per month
+                predicted_amount = Decimal(str(round(float(forecast_amount), 2)))
                 
                 # Create prediction with or without notes field
                 prediction_data = {
@@ -259,4 +212,15 @@ class BudgetAnalyzer:
                 if data_note:
                     prediction_data['notes'] = data_note
                 
-                BudgetPrediction.objects.create(**prediction_data)
\ No newline at end of file
+                predictions.append(BudgetPrediction(**prediction_data))
+
+        # Only write what changed against the stored future predictions
+        return sync_rows(
+            BudgetPrediction.objects.filter(
+                Q(year=self.today.year, month__gt=self.today.month) | Q(year__gt=self.today.year),
+                user=self.user
+            ),
+            predictions,
+            key_fields=('category_id', 'year', 'month'),
+            compare_fields=('predicted_amount', 'confidence_score', 'notes'),
+        )
\ No newline at end of file
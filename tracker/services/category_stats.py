@@ -0,0 +1,61 @@
+from collections import defaultdict
+from decimal import Decimal
+from ..models import MonthlyExpenseRollup
+from .rollups import month_range_q
+
+
+def get_category_statistics(user, start_date, end_date):
+    """Calculate per-category spending statistics for the months from start_date to end_date.
+
+    Reads the monthly rollups in a single query, so the cost depends on the
+    number of months and categories rather than the number of expenses.
+    """
+    buckets = MonthlyExpenseRollup.objects.filter(
+        month_range_q(start_date, end_date),
+        user=user,
+        count__gt=0,
+    ).select_related('category').order_by('category_id', 'year', 'month')
+
+    grouped = defaultdict(list)
+    for bucket in buckets:
+        grouped[bucket.category_id].append(bucket)
+
+    stats = {}
+    for category_id, category_buckets in grouped.items():
+        total = sum(bucket.total for bucket in category_buckets)
+        count = sum(bucket.count for bucket in category_buckets)
+        sum_squares = sum(bucket.sum_squares for bucket in category_buckets)
+        avg = total / count
+
+        # Population standard deviation from the running sums
+        variance = Decimal(str(sum_squares)) / count - avg * avg
+        std_dev = variance.sqrt() if variance > 0 else Decimal('0')
+
+        # Calculate the number of months between the first and last month with data
+        first, last = category_buckets[0], category_buckets[-1]
+        months_diff = max(1, (last.year - first.year) * 12 + (last.month - first.month) + 1)
+
+        monthly_totals = {(bucket.year, bucket.month): bucket.total for bucket in category_buckets}
+
+        # Identify months that vary by more than 10% from the average
+        monthly_variations = {}
+        if avg > 0:
+            for month_key, month_total in monthly_totals.items():
+                variation_percent = abs((month_total - avg) / avg * 100)
+                if variation_percent > 10:
+                    monthly_variations[month_key] = variation_percent
+
+        stats[category_id] = {
+            'category': first.category,
+            'average': avg,
+            'total': total,
+            'frequency': count,
+            'std_dev': std_dev,
+            'monthly_avg': total / months_diff,  # Use actual months of data
+            'months_of_data': months_diff,
+            'monthly_totals': monthly_totals,
+            'monthly_variations': monthly_variations
+        }
+
+    return stats
+
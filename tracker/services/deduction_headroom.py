@@ -0,0 +1,83 @@
+from decimal import Decimal
+from django.db.models import Q, Sum
+from ..models import TaxDeduction
+from .analytics_cache import analytics_cache
+from .reference_data import reference_data
+
+ZERO = Decimal('0')
+
+
+def compute_deduction_headroom(user_id, fiscal_year):
+    """Claimed, verified and remaining amounts per deduction section and category.
+
+    The user's deductions for the fiscal year are summed per category in one
+    grouped query; sections, categories and their limits come from the
+    reference data snapshot, so categories and sections without claims are
+    included. Claimed counts pending and verified deductions; rejected ones
+    are ignored. Returns {'sections': [...], 'categories': {category_id: ...}}.
+    """
+    snapshot = reference_data.get()
+    totals = {
+        row['deduction_category_id']: row
+        for row in TaxDeduction.objects.filter(user_id=user_id, fiscal_year=fiscal_year).values(
+            'deduction_category_id'
+        ).annotate(
+            claimed=Sum('amount', filter=~Q(verification_status='rejected')),
+            verified=Sum('amount', filter=Q(verification_status='verified')),
+        ).order_by()
+    }
+
+    sections = {
+        section.id: {
+            'id': section.id,
+            'section_code': section.section_code,
+            'name': section.name,
+            'description': section.description,
+            'max_limit': section.max_limit,
+            'applicable_old_regime': section.applicable_old_regime,
+            'applicable_new_regime': section.applicable_new_regime,
+            'claimed': ZERO,
+            'verified': ZERO,
+            'categories': [],
+        }
+        for section in snapshot.sections
+    }
+    categories = {}
+    for row in snapshot.categories:
+        section = sections[row.section_id]
+        claims = totals.get(row.id, {})
+        category = {
+            'id': row.id,
+            'name': row.name,
+            'section_id': row.section_id,
+            'max_limit': row.max_limit,
+            'claimed': claims.get('claimed') or ZERO,
+            'verified': claims.get('verified') or ZERO,
+        }
+        category['remaining'] = max(category['max_limit'] - category['claimed'], ZERO)
+        section['claimed'] += category['claimed']
+        section['verified'] += category['verified']
+        section['categories'].append(category)
+        categories[row.id] = category
+
+    # Match the old grouped query, which only listed sections that have categories
+    sections = [section for section in sections.values() if section['categories']]
+    for section in sections:
+        section['remaining'] = max(section['max_limit'] - section['claimed'], ZERO)
+        section['utilisation'] = (
+            float(min(section['claimed'] / section['max_limit'], 1) * 100) if section['max_limit'] else 0.0
+        )
+    return {'fiscal_year': fiscal_year, 'sections': sections, 'categories': categories}
+
+
+def deduction_headroom(user_id, fiscal_year):
+    """Cached compute_deduction_headroom.
+
+    A TaxDeduction change bumps the user's data version; a change to the
+    sections or categories changes the reference data version in the key.
+    """
+    return analytics_cache.get_or_compute(
+        user_id,
+        f'deduction-headroom:{fiscal_year}:{reference_data.get().version}',
+        lambda: compute_deduction_headroom(user_id, fiscal_year),
+    )
@@ -0,0 +1,91 @@
+import random
+from io import BytesIO
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+# Receipt layouts: header, title, (number label, prefix, digits), detail lines, footer lines, amount label
+RECEIPT_LAYOUTS = {
+    'ppf': (
+        'State Bank of India',
+        'Public Provident Fund Receipt',
+        ('Account Number', 'PPF-', 5),
+        ['Transaction Type: Cash Deposit', 'Branch: Mumbai Main Branch'],
+        ['This is a computer generated receipt', 'No signature required'],
+        'Amount Deposited',
+    ),
+    'life_insurance': (
+        'LIC of India',
+        'Premium Payment Receipt',
+        ('Policy Number', 'LIC-', 6),
+        ['Payment Mode: Online', 'Policy Type: Life Insurance', 'Premium Status: Paid'],
+        ['This is an electronically generated receipt', 'Valid without signature'],
+        'Premium Amount',
+    ),
+    'health_insurance': (
+        'Star Health Insurance',
+        'Health Insurance Premium Receipt',
+        ('Policy Number', 'STAR-HEALTH-', 5),
+        ['Coverage Type: Family Floater', 'Policy Period: 1 Year', 'Payment Status: Success'],
+        ['This is a valid premium payment receipt', 'Authorized by IRDAI'],
+        'Premium Amount',
+    ),
+    'elss': (
+        'SBI Mutual Fund',
+        'ELSS Investment Receipt',
+        ('Folio Number', 'ELSS-', 6),
+        ['Scheme: SBI Long Term Equity Fund', 'Investment Type: ELSS (Tax Saving)', 'Lock-in Period: 3 Years'],
+        ['Mutual Fund investments are subject to market risks', 'Please read the scheme information document carefully'],
+        'Investment Amount',
+    ),
+}
+
+
+def receipt_kind(section_code, category_name):
+    """Return the receipt layout for a deduction category, or None if there is none."""
+    category_name = category_name.lower()
+    if section_code == '80C':
+        if 'ppf' in category_name:
+            return 'ppf'
+        if 'insurance' in category_name:
+            return 'life_insurance'
+        if 'elss' in category_name or 'mutual' in category_name:
+            return 'elss'
+    elif section_code == '80D':
+        return 'health_insurance'
+    return None
+
+
+def render_receipt(kind, amount, date_str, seed):
+    """Render a sample receipt PDF.
+
+    The output depends only on the arguments: reportlab's invariant mode
+    leaves out the creation time and random document id, and the receipt
+    number comes from `seed`, so re-rendering the same receipt gives the
+    same bytes. Runs in worker processes, so it must not touch the database.
+    """
+    header, title, (number_label, number_prefix, digits), details, footer, amount_label = RECEIPT_LAYOUTS[kind]
+    number = random.Random(seed).randint(10 ** (digits - 1), 10 ** digits - 1)
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+
+    # Header
+    c.setFont("Helvetica-Bold", 24)
+    c.drawString(50, 750, header)
+    c.setFont("Helvetica", 16)
+    c.drawString(50, 720, title)
+
+    # Content
+    c.setFont("Helvetica", 12)
+    lines = [f"{number_label}: {number_prefix}{number}", f"Date: {date_str}", f"{amount_label}: ₹{amount:,.2f}", *details]
+    for index, line in enumerate(lines):
+        c.drawString(50, 680 - 20 * index, line)
+
+    # Footer
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, 100, footer[0])
+    c.drawString(50, 80, footer[1])
+
+    c.save()
+    return buffer.getvalue()
+
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import zlib
+from ..models import Expense, Income
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_COLUMNS = ('type', 'id', 'date', 'category', 'amount', 'description')
+
+# Record type -> (model, lookup exported as the category column)
+EXPORT_SOURCES = {
+    'expense': (Expense, 'category__name'),
+    'income': (Income, 'source'),
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500  # Rows encoded together before a chunk of output is yielded
+
+
+def export_rows(user, start_date=None, end_date=None, categories=None, sources=None,
+                types=('expense', 'income'), chunk_size=DEFAULT_CHUNK_SIZE, using=None):
+    """Yield (type, id, date, category, amount, description) tuples for a user's history.
+
+    Rows come straight from values_list querysets read with iterator(), so no
+    model instances are built and only `chunk_size` rows are held at a time.
+    Expenses are filtered by category name and income by source; income has
+    no category, so a category filter leaves it out unless sources are given
+    too, and vice versa. `using` picks the database alias to read from.
+    """
+    for record_type in types:
+        model, category_lookup = EXPORT_SOURCES[record_type]
+        queryset = model.objects.using(using).filter(user=user)
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+
+        if record_type == 'expense':
+            if sources and not categories:
+                continue
+            if categories:
+                queryset = queryset.filter(category__name__in=categories)
+        else:
+            if categories and not sources:
+                continue
+            if sources:
+                queryset = queryset.filter(source__in=sources)
+
+        rows = queryset.order_by('date', 'id').values_list(
+            'id', 'date', category_lookup, 'amount', 'description'
+        )
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield (record_type, *row)
+
+
+def iter_csv(rows):
+    """Encode export rows as CSV, yielding bytes a few hundred rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    # Send the header straight away so the download starts before the first query finishes
+    yield _drain(buffer)
+
+    pending = 0
+    for record_type, pk, date, category, amount, description in rows:
+        writer.writerow((record_type, pk, date.isoformat(), category, amount, description))
+        pending += 1
+        if pending >= ROWS_PER_WRITE:
+            yield _drain(buffer)
+            pending = 0
+    if pending:
+        yield _drain(buffer)
+
+
+def iter_jsonl(rows):
+    """Encode export rows as JSON lines, one object per row."""
+    lines = []
+    for record_type, pk, date, category, amount, description in rows:
+        lines.append(json.dumps({
+            'type': record_type,
+            'id': pk,
+            'date': date.isoformat(),
+            'category': category,
+            'amount': str(amount),
+            'description': description,
+        }))
+        if len(lines) >= ROWS_PER_WRITE:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of byte chunks without holding more than one chunk in memory."""
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for index, chunk in enumerate(chunks):
+        compressed = compressor.compress(chunk)
+        if index == 0:
+            # Push the first chunk out rather than letting zlib buffer it
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(user, format='csv', compress=False, **filters):
+    """Return an iterator of bytes holding the user's export in the given format."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {format!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    encode = iter_csv if format == 'csv' else iter_jsonl
+    chunks = encode(export_rows(user, **filters))
+    return gzip_stream(chunks) if compress else chunks
+
+
+def export_filename(user, format='csv', compress=False):
+    return f"{user.username}-finance-export.{format}{'.gz' if compress else ''}"
+
+
+def _drain(buffer):
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    return data
@@ -0,0 +1,131 @@
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_FORECAST_SETTINGS = {
+    'MODEL': 'mean',
+    'HORIZON': 3,
+    'GROWTH_RATE': 0.02,  # Monthly increase applied to variable expenses by the mean model
+    'ALPHA': 0.5,  # Smoothing factor for exponential smoothing
+}
+
+
+def get_forecast_settings():
+    """Return the BUDGET_FORECAST setting merged over the defaults."""
+    return {**DEFAULT_FORECAST_SETTINGS, **getattr(settings, 'BUDGET_FORECAST', {})}
+
+
+def build_history_matrix(stats, months):
+    """Arrange per-category monthly totals into a (categories x months) matrix.
+
+    `stats` is the dict returned by get_category_statistics and `months` the
+    ordered list of (year, month) keys to use as columns; missing months are zero.
+    """
+    category_ids = list(stats)
+    column = {month_key: index for index, month_key in enumerate(months)}
+    history = np.zeros((len(category_ids), len(months)))
+    for row, category_id in enumerate(category_ids):
+        for month_key, total in stats[category_id]['monthly_totals'].items():
+            if month_key in column:
+                history[row, column[month_key]] = float(total)
+    return category_ids, history
+
+
+def active_span(history):
+    """Return the first and last month index with data for every row of the matrix."""
+    has_data = history != 0
+    first = has_data.argmax(axis=1)
+    last = history.shape[1] - 1 - has_data[:, ::-1].argmax(axis=1)
+    return first, last
+
+
+class MeanForecaster:
+    """Average over each category's active months, with a linear bump for variable expenses."""
+
+    def __init__(self, growth_rate=0.02, **kwargs):
+        self.growth_rate = growth_rate
+
+    def forecast(self, history, horizon, fixed_mask):
+        first, last = active_span(history)
+        spans = np.maximum(last - first + 1, 1)
+        means = history.sum(axis=1) / spans
+
+        steps = np.arange(1, horizon + 1)
+        growth = 1 + self.growth_rate * steps[np.newaxis, :]
+        growth = np.where(fixed_mask[:, np.newaxis], 1.0, growth)
+        return means[:, np.newaxis] * growth
+
+
+class ExponentialSmoothingForecaster:
+    """Simple exponential smoothing; every horizon takes the final smoothed level."""
+
+    def __init__(self, alpha=0.5, **kwargs):
+        if not 0 < alpha <= 1:
+            raise ImproperlyConfigured('BUDGET_FORECAST ALPHA must be in (0, 1].')
+        self.alpha = alpha
+
+    def forecast(self, history, horizon, fixed_mask):
+        months = history.shape[1]
+        first, _ = active_span(history)
+        t = np.arange(months)[np.newaxis, :]
+
+        # Closed form of level = alpha * x + (1 - alpha) * level, seeded with each
+        # category's first month of data; earlier months get no weight
+        age = months - 1 - t
+        weights = self.alpha * (1 - self.alpha) ** age
+        weights = np.where(t == first[:, np.newaxis], (1 - self.alpha) ** age, weights)
+        weights = np.where(t < first[:, np.newaxis], 0.0, weights)
+
+        levels = (history * weights).sum(axis=1)
+        return np.repeat(levels[:, np.newaxis], horizon, axis=1)
+
+
+class LinearTrendForecaster:
+    """Least-squares line through each category's active months, extrapolated forward."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def forecast(self, history, horizon, fixed_mask):
+        months = history.shape[1]
+        first, _ = active_span(history)
+        t = np.arange(months)[np.newaxis, :]
+        active = t >= first[:, np.newaxis]
+
+        counts = active.sum(axis=1)
+        t_mean = (t * active).sum(axis=1) / counts
+        x_mean = (history * active).sum(axis=1) / counts
+        t_centered = (t - t_mean[:, np.newaxis]) * active
+        x_centered = (history - x_mean[:, np.newaxis]) * active
+
+        denominator = (t_centered ** 2).sum(axis=1)
+        slopes = np.divide(
+            (t_centered * x_centered).sum(axis=1), denominator,
+            out=np.zeros_like(denominator), where=denominator > 0
+        )
+        # Fixed expenses are not expected to trend
+        slopes = np.where(fixed_mask, 0.0, slopes)
+
+        future_t = (months - 1) + np.arange(1, horizon + 1)
+        forecast = x_mean[:, np.newaxis] + slopes[:, np.newaxis] * (future_t[np.newaxis, :] - t_mean[:, np.newaxis])
+        return np.clip(forecast, 0, None)
+
+
+FORECASTERS = {
+    'mean': MeanForecaster,
+    'exponential_smoothing': ExponentialSmoothingForecaster,
+    'linear_trend': LinearTrendForecaster,
+}
+
+
+def get_forecaster(name=None):
+    """Instantiate the configured forecaster, or the one named."""
+    config = get_forecast_settings()
+    name = name or config['MODEL']
+    try:
+        forecaster_class = FORECASTERS[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown forecast model '{name}'. Choose one of: {', '.join(FORECASTERS)}"
+        )
+    return forecaster_class(growth_rate=config['GROWTH_RATE'], alpha=config['ALPHA'])
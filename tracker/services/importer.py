@@ -0,0 +1,191 @@
+import csv
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from ..models import Category, Expense
+from .analytics_cache import analytics_cache
+from .jobs import enqueue_recompute
+from .rollups import rebuild_rollups
+from .timeseries import shift_month
+
+DEFAULT_MAPPING = {
+    'date_column': 'Month',
+    'date_format': 'month_index',  # A strptime format, or month_index for 1-based month offsets
+    'start_month': None,           # YYYY-MM that month index 1 refers to
+    'day': 1,                      # Day of the month used for month_index dates
+    'amount_columns': None,        # Wide layout: {column: category name}, None for every other column
+    'exclude_columns': ['Total'],
+    'category_column': None,       # Long layout: one expense per row with its own category
+    'amount_column': None,
+    'description_column': None,
+}
+
+MAX_REPORTED_ERRORS = 20
+
+
+class ExpenseImporter:
+    """Streams expense rows from a CSV into the database in bulk.
+
+    Rows are read one at a time and inserted with bulk_create in chunks of
+    `chunk_size`, each in its own transaction, so memory use does not grow
+    with the size of the file. Two layouts are supported: wide files with a
+    date column and one amount column per category (like
+    data/indian_personal_finance.csv), and long files with category and
+    amount columns. Categories the user does not have yet are created as they
+    are first seen.
+    """
+
+    def __init__(self, user, mapping=None, chunk_size=1000):
+        self.user = user
+        self.mapping = {**DEFAULT_MAPPING, **(mapping or {})}
+        self.chunk_size = chunk_size
+        self._categories = None
+        self._start_month = self._parse_start_month()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'rows': 0, 'created': 0, 'skipped': 0, 'categories_created': 0, 'seconds': 0.0}
+        self.errors = []
+
+    def import_file(self, lines, on_chunk=None):
+        """Import every row from an iterable of CSV lines and return the stats.
+
+        `on_chunk` is called with the running stats after each chunk is saved.
+        """
+        started = time.perf_counter()
+        reader = csv.DictReader(lines)
+        self._check_columns(reader.fieldnames or [])
+
+        chunk = []
+        for expense in self._expenses(reader):
+            chunk.append(expense)
+            if len(chunk) >= self.chunk_size:
+                self._save_chunk(chunk)
+                chunk = []
+                if on_chunk:
+                    on_chunk(dict(self.stats, seconds=time.perf_counter() - started))
+        if chunk:
+            self._save_chunk(chunk)
+            if on_chunk:
+                on_chunk(dict(self.stats, seconds=time.perf_counter() - started))
+
+        if self.stats['created']:
+            # bulk_create skips the signal handlers that keep derived data current
+            rebuild_rollups(user=self.user)
+            analytics_cache.bump_version(self.user.id)
+            enqueue_recompute(self.user.id)
+
+        self.stats['seconds'] = time.perf_counter() - started
+        return self.stats
+
+    def _save_chunk(self, chunk):
+        with transaction.atomic():
+            Expense.objects.bulk_create(chunk)
+        self.stats['created'] += len(chunk)
+
+    def _expenses(self, reader):
+        mapping = self.mapping
+        amount_columns = self._amount_columns(reader.fieldnames)
+        description_column = mapping['description_column']
+
+        for line_number, row in enumerate(reader, start=2):
+            self.stats['rows'] += 1
+            try:
+                expense_date = self._parse_date(row.get(mapping['date_column']))
+                if amount_columns is None:
+                    entries = [(row.get(mapping['category_column']), row.get(mapping['amount_column']))]
+                else:
+                    entries = [(name, row.get(column)) for column, name in amount_columns.items()]
+
+                description = (row.get(description_column) or '').strip() if description_column else ''
+                # Parse the whole row first so a bad cell skips the row rather than part of it
+                amounts = [(name, self._parse_amount(raw_amount)) for name, raw_amount in entries]
+                expenses = [
+                    Expense(
+                        user=self.user,
+                        category_id=self._category_id(category_name),
+                        amount=amount,
+                        date=expense_date,
+                        description=description,
+                    )
+                    for category_name, amount in amounts if amount is not None
+                ]
+            except ValueError as e:
+                self.stats['skipped'] += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append(f'Line {line_number}: {e}')
+                continue
+            yield from expenses
+
+    def _amount_columns(self, fieldnames):
+        mapping = self.mapping
+        if mapping['category_column']:
+            return None
+        if mapping['amount_columns']:
+            return dict(mapping['amount_columns'])
+        ignored = {mapping['date_column'], mapping['description_column'], *mapping['exclude_columns']}
+        return {column: column for column in fieldnames if column not in ignored}
+
+    def _check_columns(self, fieldnames):
+        mapping = self.mapping
+        if mapping['category_column']:
+            required = [mapping['date_column'], mapping['category_column'], mapping['amount_column']]
+        else:
+            required = [mapping['date_column'], *(mapping['amount_columns'] or {})]
+        if mapping['description_column']:
+            required.append(mapping['description_column'])
+
+        missing = [column for column in required if column not in fieldnames]
+        if missing:
+            raise ValueError(f"CSV is missing column(s): {', '.join(str(column) for column in missing)}")
+
+    def _parse_start_month(self):
+        if self.mapping['category_column'] and not self.mapping['amount_column']:
+            raise ValueError('amount_column is required when category_column is set')
+        if self.mapping['date_format'] != 'month_index':
+            return None
+        if not self.mapping['start_month']:
+            raise ValueError('start_month (YYYY-MM) is required for month_index dates')
+        start = datetime.strptime(self.mapping['start_month'], '%Y-%m')
+        return start.year, start.month
+
+    def _parse_date(self, value):
+        value = (value or '').strip()
+        if self._start_month is None:
+            return datetime.strptime(value, self.mapping['date_format']).date()
+        index = int(value)
+        if index < 1:
+            raise ValueError(f'month index must be 1 or more, got {index}')
+        year, month = shift_month(*self._start_month, index - 1)
+        return date(year, month, self.mapping['day'])
+
+    def _parse_amount(self, value):
+        value = (value or '').strip().replace(',', '')
+        if not value:
+            return None
+        try:
+            amount = Decimal(value).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f'invalid amount {value!r}')
+        # Expenses must be positive; zero means nothing was spent
+        return amount if amount > 0 else None
+
+    def _category_id(self, name):
+        name = (name or '').strip()
+        if not name:
+            raise ValueError('missing category')
+        if self._categories is None:
+            self._categories = dict(
+                Category.objects.filter(user=self.user).values_list('name', 'id')
+            )
+        if name not in self._categories:
+            category, created = Category.objects.get_or_create(
+                user=self.user,
+                name=name,
+                defaults={'description': f'{name} expenses'}
+            )
+            if created:
+                self.stats['categories_created'] += 1
+            self._categories[name] = category.id
+        return self._categories[name]
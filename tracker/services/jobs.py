@@ -0,0 +1,108 @@
+import logging
+import traceback
+from datetime import timedelta
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from ..models import AnalysisJob
+from .analytics_cache import analytics_cache
+from .budget_analysis import BudgetAnalyzer
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+
+def enqueue_recompute(user_id):
+    """Queue a budget recomputation for a user.
+
+    Repeated requests coalesce into the user's single job row, so a burst of
+    writes results in one recomputation.
+    """
+    now = timezone.now()
+    updated = AnalysisJob.objects.filter(user_id=user_id).update(
+        status='pending', requested_at=now, attempts=0
+    )
+    if not updated:
+        try:
+            AnalysisJob.objects.get_or_create(user_id=user_id, defaults={'requested_at': now})
+        except IntegrityError:
+            # The user was deleted along with the rows that triggered the request
+            pass
+
+
+def claim_next_job():
+    """Mark the oldest pending job as running and return it, or None if the queue is empty."""
+    while True:
+        job = AnalysisJob.objects.filter(status='pending').order_by('requested_at').first()
+        if job is None:
+            return None
+
+        # Another worker may have claimed the job since it was read
+        claimed = AnalysisJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Recompute predictions and recommendations for the job's user."""
+    try:
+        analyzer = BudgetAnalyzer(job.user)
+        analyzer.predict_future_expenses()
+        analyzer.generate_recommendations()
+    except Exception:
+        logger.exception('Budget recomputation failed for user %s', job.user_id)
+        status = 'pending' if job.attempts < MAX_ATTEMPTS else 'failed'
+        AnalysisJob.objects.filter(pk=job.pk, status='running').update(
+            status=status, last_error=traceback.format_exc()
+        )
+        return False
+
+    # A write that arrived while running has set the job back to pending; leave it queued
+    AnalysisJob.objects.filter(pk=job.pk, status='running').update(
+        status='done', finished_at=timezone.now(), last_error=''
+    )
+    # Cached dashboards hold the previous predictions and recommendations
+    analytics_cache.bump_version(job.user_id)
+    return True
+
+
+def process_jobs(limit=None):
+    """Run queued jobs until the queue is empty or `limit` jobs have run."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def mark_recomputed(user_id, started_at):
+    """Record a recomputation done outside the queue, e.g. by the nightly batch.
+
+    The user's job is marked done unless a worker is running it or a write
+    has requested a newer recomputation since `started_at`.
+    """
+    now = timezone.now()
+    updated = AnalysisJob.objects.filter(user_id=user_id, requested_at__lte=started_at).exclude(
+        status='running'
+    ).update(status='done', finished_at=now, attempts=0, last_error='')
+    if not updated:
+        try:
+            AnalysisJob.objects.get_or_create(
+                user_id=user_id,
+                defaults={'status': 'done', 'requested_at': started_at, 'finished_at': now}
+            )
+        except IntegrityError:
+            pass
+
+
+def requeue_stale_jobs(older_than=timedelta(minutes=30)):
+    """Return jobs left running by a crashed worker to the queue."""
+    cutoff = timezone.now() - older_than
+    return AnalysisJob.objects.filter(status='running', started_at__lt=cutoff).update(status='pending')
@@ -0,0 +1,90 @@
+import posixpath
+from collections import Counter
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from ..models import StoredFile
+from ..storage import content_storage, is_content_name, stored_file_fields
+
+
+def stored_fields(storage=content_storage):
+    """(model, field) for every file field kept in storage."""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in stored_file_fields(model)
+        if field.storage is storage
+    ]
+
+
+def file_references(storage=content_storage):
+    """Count how many rows point at each stored name."""
+    references = Counter()
+    for model, field in stored_fields(storage):
+        names = model.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+        references.update(names.values_list(field.name, flat=True).iterator())
+    return references
+
+
+def migrate_legacy_files(storage=content_storage):
+    """Move files saved before the storage was content addressed to their digest paths.
+
+    Rows are pointed at the new name and the old file is removed, so
+    identical uploads collapse into one file. Returns the number of files
+    moved and the names whose files are missing.
+    """
+    moved, missing = 0, []
+    for model, field in stored_fields(storage):
+        names = model.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+        for name in set(names.values_list(field.name, flat=True)):
+            if is_content_name(name):
+                continue
+            if not storage.exists(name):
+                missing.append(name)
+                continue
+            with storage.open(name) as source:
+                new_name = storage.save(posixpath.join(field.upload_to, posixpath.basename(name)), source)
+            model.objects.filter(**{field.name: name}).update(**{field.name: new_name})
+            FileSystemStorage.delete(storage, name)
+            moved += 1
+    return moved, missing
+
+
+def rebuild_references(storage=content_storage):
+    """Reset the StoredFile table to the references the rows actually hold."""
+    references = file_references(storage)
+    rows = {row.name: row for row in StoredFile.objects.all()}
+    for name, count in references.items():
+        if not storage.exists(name):
+            continue
+        row = rows.pop(name, None)
+        if row is None:
+            StoredFile.objects.create(name=name, size=storage.size(name), references=count)
+        elif row.references != count:
+            row.references = count
+            row.save(update_fields=['references'])
+    StoredFile.objects.filter(name__in=list(rows)).delete()
+    return references
+
+
+def prune_unreferenced(storage=content_storage):
+    """Delete files in the upload directories that no row points at. Returns (files, bytes) removed."""
+    referenced = set(file_references(storage))
+    removed, freed = 0, 0
+    for directory in {field.upload_to.rstrip('/') for _, field in stored_fields(storage)}:
+        for name in _walk(storage, directory):
+            if name not in referenced:
+                freed += storage.size(name)
+                FileSystemStorage.delete(storage, name)
+                removed += 1
+    StoredFile.objects.exclude(name__in=referenced).delete()
+    return removed, freed
+
+
+def _walk(storage, directory):
+    if not storage.exists(directory):
+        return
+    subdirectories, files = storage.listdir(directory)
+    for filename in files:
+        yield posixpath.join(directory, filename)
+    for subdirectory in subdirectories:
+        yield from _walk(storage, posixpath.join(directory, subdirectory))
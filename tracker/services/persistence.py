@@ -0,0 +1,68 @@
+from decimal import Decimal
+from django.db import models, transaction
+
+
+def sync_rows(queryset, desired, key_fields, compare_fields):
+    """Make the rows in `queryset` match the unsaved instances in `desired`.
+
+    Rows are matched on `key_fields`. New keys are bulk-created, matched rows
+    whose `compare_fields` differ are bulk-updated in place (keeping their
+    primary key and any other columns), and rows with no desired counterpart
+    are removed with one delete. Nothing is written when nothing changed.
+
+    Returns a dict with the number of rows created, updated and deleted.
+    """
+    model = queryset.model
+    fields = {name: model._meta.get_field(name) for name in compare_fields}
+
+    def key(obj):
+        return tuple(getattr(obj, name) for name in key_fields)
+
+    existing, duplicates = {}, []
+    for obj in queryset:
+        # Rows written before keys were unique are cleared out as stale
+        if key(obj) in existing:
+            duplicates.append(obj.pk)
+        else:
+            existing[key(obj)] = obj
+
+    to_create, to_update, seen = [], [], set()
+    for obj in desired:
+        for name, field in fields.items():
+            setattr(obj, name, _normalize(field, getattr(obj, name)))
+
+        obj_key = key(obj)
+        seen.add(obj_key)
+        current = existing.get(obj_key)
+        if current is None:
+            to_create.append(obj)
+            continue
+
+        changed = False
+        for name in compare_fields:
+            if getattr(current, name) != getattr(obj, name):
+                setattr(current, name, getattr(obj, name))
+                changed = True
+        if changed:
+            to_update.append(current)
+
+    stale = duplicates + [obj.pk for obj_key, obj in existing.items() if obj_key not in seen]
+
+    if to_create or to_update or stale:
+        with transaction.atomic():
+            if to_create:
+                model.objects.bulk_create(to_create, batch_size=500)
+            if to_update:
+                model.objects.bulk_update(to_update, compare_fields, batch_size=500)
+            if stale:
+                model.objects.filter(pk__in=stale).delete()
+
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(stale)}
+
+
+def _normalize(field, value):
+    """Round a value the way the database will store it, so unchanged rows compare equal."""
+    if isinstance(field, models.DecimalField) and value is not None:
+        return Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places))
+    return value
+
@@ -0,0 +1,119 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from django.conf import settings
+
+DEFAULT_QUERY_INSTRUMENTATION_SETTINGS = {
+    'ENABLED': True,
+    'BUDGETS': {},             # URL name -> most queries a request may run
+    'DEFAULT_BUDGET': None,    # Budget for URL names without their own; None for no limit
+    'RAISE_ON_BUDGET': False,  # Raise QueryBudgetExceeded instead of logging a warning (for tests)
+    'SLOWEST': 3,              # Slowest statements kept per request
+    'HISTORY': 100,            # Requests kept per URL name for the summary page
+    'SERVER_TIMING': True,     # Add a Server-Timing header to responses
+}
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def get_query_instrumentation_settings():
+    """Return the TRACKER_QUERY_INSTRUMENTATION setting merged over the defaults."""
+    return {**DEFAULT_QUERY_INSTRUMENTATION_SETTINGS, **getattr(settings, 'TRACKER_QUERY_INSTRUMENTATION', {})}
+
+
+def query_budget(url_name):
+    config = get_query_instrumentation_settings()
+    return config['BUDGETS'].get(url_name, config['DEFAULT_BUDGET'])
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def sql_shape(sql):
+    """Reduce a statement to its shape so repeats with different values compare equal."""
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    sql = _STRING_LITERAL.sub('?', sql)
+    return _NUMBER_LITERAL.sub('?', sql)
+
+
+class QueryRecorder:
+    """Database execute wrapper that records every statement and how long it took.
+
+    Installed with connection.execute_wrapper(), so it sees queries whether
+    or not DEBUG is on.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+    def report(self, slowest=3):
+        """Return the query count, total SQL time, slowest statements and repeated shapes."""
+        shapes = Counter(sql_shape(sql) for sql, _ in self.queries)
+        return {
+            'count': len(self.queries),
+            'sql_ms': sum(duration for _, duration in self.queries),
+            'slowest': sorted(((duration, sql) for sql, duration in self.queries), reverse=True)[:slowest],
+            'duplicates': [(shape, count) for shape, count in shapes.most_common() if count > 1],
+        }
+
+
+class QueryStatsStore:
+    """Rolling per-URL-name history of request query reports, kept in process memory."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(deque)
+
+    def record(self, url_name, report, total_ms, history=100):
+        entry = dict(report, total_ms=total_ms, budget=query_budget(url_name))
+        with self._lock:
+            requests = self._requests[url_name]
+            requests.append(entry)
+            while len(requests) > history:
+                requests.popleft()
+
+    def summary(self):
+        """Return one dict of aggregate figures per URL name, busiest first."""
+        with self._lock:
+            snapshot = {name: list(requests) for name, requests in self._requests.items()}
+
+        rows = []
+        for url_name, requests in snapshot.items():
+            counts = [request['count'] for request in requests]
+            sql_times = [request['sql_ms'] for request in requests]
+            duplicates = Counter()
+            for request in requests:
+                duplicates.update(dict(request['duplicates']))
+            budget = query_budget(url_name)
+            rows.append({
+                'url_name': url_name,
+                'requests': len(requests),
+                'avg_queries': sum(counts) / len(counts),
+                'max_queries': max(counts),
+                'avg_sql_ms': sum(sql_times) / len(sql_times),
+                'max_sql_ms': max(sql_times),
+                'avg_total_ms': sum(request['total_ms'] for request in requests) / len(requests),
+                'budget': budget,
+                'over_budget': sum(1 for count in counts if budget is not None and count > budget),
+                'slowest': max((request['slowest'][0] for request in requests if request['slowest']), default=None),
+                'duplicates': duplicates.most_common(3),
+            })
+        return sorted(rows, key=lambda row: row['requests'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+
+
+query_stats = QueryStatsStore()
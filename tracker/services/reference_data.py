@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_REFERENCE_DATA_SETTINGS = {
+    'ALIAS': 'default',      # Django cache holding the version shared by every worker
+    'CHECK_INTERVAL': 1.0,   # Seconds between checks of the shared version
+}
+
+Regime = namedtuple('Regime', 'id name description is_active')
+Slab = namedtuple('Slab', 'id regime_id min_amount max_amount tax_rate surcharge_rate cess_rate')
+Section = namedtuple(
+    'Section', 'id section_code name description max_limit applicable_old_regime applicable_new_regime'
+)
+Category = namedtuple('Category', 'id section_id name description max_limit requires_proof proof_description')
+
+VERSION_KEY = 'tracker:reference-data-version'
+
+
+class ReferenceData:
+    """Immutable snapshot of the tax reference tables."""
+
+    def __init__(self, version, regimes, slabs, sections, categories):
+        self.version = version
+        self.regimes = tuple(regimes)
+        self.sections = tuple(sorted(sections, key=lambda section: section.section_code))
+        self.categories = tuple(sorted(categories, key=lambda category: (category.section_id, category.name)))
+
+        slabs_by_regime = {regime.id: [] for regime in self.regimes}
+        for slab in sorted(slabs, key=lambda slab: slab.min_amount):
+            slabs_by_regime[slab.regime_id].append(slab)
+        self.slabs = MappingProxyType({regime_id: tuple(slabs) for regime_id, slabs in slabs_by_regime.items()})
+        self.regimes_by_id = MappingProxyType({regime.id: regime for regime in self.regimes})
+        self.sections_by_id = MappingProxyType({section.id: section for section in self.sections})
+        self.categories_by_id = MappingProxyType({category.id: category for category in self.categories})
+
+    @classmethod
+    def load(cls, version):
+        """Read all four tables; four queries, however many rows they hold."""
+        from ..models import DeductionCategory, DeductionSection, TaxRegime, TaxSlab
+        return cls(
+            version,
+            [Regime(*row) for row in TaxRegime.objects.values_list(*Regime._fields)],
+            [Slab(*row) for row in TaxSlab.objects.values_list(*Slab._fields)],
+            [Section(*row) for row in DeductionSection.objects.values_list(*Section._fields)],
+            [Category(*row) for row in DeductionCategory.objects.values_list(*Category._fields)],
+        )
+
+    def categories_for_regime(self, code):
+        """Deduction categories whose section applies to the 'old' or 'new' regime."""
+        flag = f'applicable_{code}_regime'
+        return tuple(
+            category for category in self.categories
+            if getattr(self.sections_by_id[category.section_id], flag)
+        )
+
+    def category_label(self, category):
+        return f'{self.sections_by_id[category.section_id].section_code} - {category.name}'
+
+
+class ReferenceDataCache:
+    """Process-wide read-through cache of the tax reference tables.
+
+    The tables are read on first use and kept as an immutable snapshot.
+    Saving or deleting a row (through the admin or anywhere else) bumps a
+    version in the shared Django cache; every worker compares its snapshot
+    against that version at most once per CHECK_INTERVAL and reloads when
+    it has changed, so lookups normally cost no queries at all.
+    """
+
+    def __init__(self, alias='default', check_interval=1.0):
+        self.alias = alias
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    @classmethod
+    def from_settings(cls):
+        config = {**DEFAULT_REFERENCE_DATA_SETTINGS, **getattr(settings, 'TRACKER_REFERENCE_DATA', {})}
+        return cls(alias=config['ALIAS'], check_interval=config['CHECK_INTERVAL'])
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def shared_version(self):
+        version = self.backend.get(VERSION_KEY)
+        if version is None:
+            self.backend.add(VERSION_KEY, time.time_ns(), None)
+            version = self.backend.get(VERSION_KEY)
+        return version
+
+    def get(self):
+        """Return the current ReferenceData snapshot, loading it if it is missing or stale."""
+        with self._lock:
+            now = time.monotonic()
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._checked_at < self.check_interval:
+                return snapshot
+            version = self.shared_version()
+            self._checked_at = now
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = ReferenceData.load(version)
+            return snapshot
+
+    def refresh(self):
+        """Like get(), but compare against the shared version now instead of after CHECK_INTERVAL.
+
+        For a lookup that missed a row newer than the snapshot, e.g. a
+        category another worker created a moment ago.
+        """
+        with self._lock:
+            self._checked_at = 0.0
+        return self.get()
+
+    def invalidate(self):
+        """Make every worker reload the tables on its next lookup."""
+        with self._lock:
+            self._snapshot = None
+        self.backend.set(VERSION_KEY, time.time_ns(), None)
+
+    def connect_signals(self, models):
+        """Invalidate whenever a row of one of `models` is saved or deleted."""
+        from django.db import transaction
+        from django.db.models.signals import post_delete, post_save
+
+        def changed(sender, **kwargs):
+            transaction.on_commit(self.invalidate)
+
+        for model in models:
+            post_save.connect(changed, sender=model, weak=False, dispatch_uid=f'reference-data-{model._meta.label}')
+            post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f'reference-data-{model._meta.label}')
+
+
+reference_data = ReferenceDataCache.from_settings()
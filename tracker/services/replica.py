@@ -0,0 +1,147 @@
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_READ_REPLICA_SETTINGS = {
+    'ALIAS': None,            # DATABASES alias of the replica; None sends every read to the primary
+    'MAX_LAG': 30,            # Seconds the replica may trail the primary before reads fall back to it
+    'CACHE_ALIAS': 'default', # Django cache holding the time of the last refresh, shared by every worker
+    'COOKIE': 'tracker_primary',  # Keeps a client on the primary for MAX_LAG seconds after it writes
+}
+
+REFRESHED_AT_KEY = 'tracker:replica-refreshed-at'
+REFRESH_LOCK_KEY = 'tracker:replica-refresh-lock'
+
+logger = logging.getLogger(__name__)
+
+# True inside views and admin pages whose reads may come from the replica
+_reporting = ContextVar('tracker_reporting_reads', default=False)
+# True once the current request has written, or when its client wrote in an earlier one
+_pinned = ContextVar('tracker_pinned_to_primary', default=False)
+_written = ContextVar('tracker_written', default=False)
+
+
+def get_read_replica_settings():
+    """Return the TRACKER_READ_REPLICA setting merged over the defaults."""
+    return {**DEFAULT_READ_REPLICA_SETTINGS, **getattr(settings, 'TRACKER_READ_REPLICA', {})}
+
+
+def replica_alias():
+    """The replica's DATABASES alias, or None when no replica is configured.
+
+    A replica that is the primary database itself, as when the test runner
+    mirrors it onto the test database, counts as none.
+    """
+    alias = get_read_replica_settings()['ALIAS']
+    if not alias or alias not in settings.DATABASES:
+        return None
+    if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    return alias
+
+
+def read_alias():
+    """Alias that reads should use right now: the replica for reporting reads, else the primary."""
+    alias = replica_alias()
+    if alias and _reporting.get() and not _pinned.get():
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+def record_write():
+    """Send the rest of the current request's reads to the primary."""
+    _pinned.set(True)
+    _written.set(True)
+
+
+def has_written():
+    return _written.get()
+
+
+@contextmanager
+def reporting_reads():
+    """Let reads inside the block go to the replica, unless this request has written."""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def reporting(view):
+    """Decorator for views whose reads may come from the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with reporting_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Give a request its own routing state, so nothing leaks between requests on one thread."""
+    tokens = [(_reporting, _reporting.set(False)), (_pinned, _pinned.set(pinned)), (_written, _written.set(False))]
+    try:
+        yield
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+
+def replica_is_current():
+    """Whether the replica trails the primary by at most MAX_LAG seconds.
+
+    A SQLite stand-in replica is current when `manage.py refresh_replica`
+    copied it within MAX_LAG; one that was never copied, or whose
+    refresher stopped, is not read from.
+    """
+    alias = replica_alias()
+    if not alias:
+        return False
+    if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+        # A real replica, kept current by the database itself
+        return True
+    config = get_read_replica_settings()
+    refreshed_at = caches[config['CACHE_ALIAS']].get(REFRESHED_AT_KEY)
+    return bool(refreshed_at) and time.time() - refreshed_at <= config['MAX_LAG']
+
+
+def refresh_replica():
+    """Copy the primary into a SQLite stand-in replica with the online backup API.
+
+    Returns True once the copy is made. Returns False, leaving the recorded
+    refresh time alone so reads soon fall back to the primary, when another
+    refresher holds the lock or the copy fails.
+    """
+    config = get_read_replica_settings()
+    alias = replica_alias()
+    if not alias or connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+        return False
+    primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+
+    cache = caches[config['CACHE_ALIAS']]
+    if not cache.add(REFRESH_LOCK_KEY, True, timeout=60):
+        return False
+    try:
+        started = time.time()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'], timeout=30)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+    except sqlite3.Error:
+        logger.exception('Could not copy the primary database into the %s replica', alias)
+        return False
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+    # Connections opened before the copy could still hold a stale schema
+    replica.close()
+    cache.set(REFRESHED_AT_KEY, started, None)
+    return True
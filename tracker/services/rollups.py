@@ -0,0 +1,192 @@
+from datetime import date
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum, Count, Min, Max, F, Value, DecimalField, FloatField
+from django.db.models.functions import ExtractYear, ExtractMonth, Greatest, Least
+from django.utils import timezone
+from ..models import Expense, Income, MonthlyExpenseRollup, MonthlyIncomeRollup
+
+# Raw model -> (rollup model, name of the field that splits buckets within a month)
+ROLLUPS = {
+    Expense: (MonthlyExpenseRollup, 'category_id'),
+    Income: (MonthlyIncomeRollup, 'source'),
+}
+
+
+def bucket_key(model, row):
+    """Return the rollup lookup for a raw row given as a model instance or a dict of values."""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    rollup_model, group_field = ROLLUPS[model]
+    return {
+        'user_id': get('user_id'),
+        group_field: get(group_field),
+        'year': get('date').year,
+        'month': get('date').month,
+    }
+
+
+def add_to_rollup(model, row):
+    """Add one raw row to its monthly bucket, creating the bucket if needed."""
+    rollup_model = ROLLUPS[model][0]
+    key = bucket_key(model, row)
+    amount = _amount(row)
+    amount_value = Value(amount, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    with transaction.atomic():
+        updated = rollup_model.objects.filter(**key).update(
+            total=F('total') + amount_value,
+            count=F('count') + 1,
+            sum_squares=F('sum_squares') + Value(float(amount) ** 2, output_field=FloatField()),
+            min_amount=Least('min_amount', amount_value),
+            max_amount=Greatest('max_amount', amount_value),
+            updated_at=timezone.now(),
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                rollup_model.objects.create(
+                    **key,
+                    total=amount,
+                    count=1,
+                    sum_squares=float(amount) ** 2,
+                    min_amount=amount,
+                    max_amount=amount,
+                )
+        except IntegrityError:
+            # Created concurrently; fold this row into it
+            recompute_bucket(model, key)
+
+
+def remove_from_rollup(model, row):
+    """Remove one raw row from its monthly bucket."""
+    rollup_model = ROLLUPS[model][0]
+    key = bucket_key(model, row)
+    amount = _amount(row)
+
+    with transaction.atomic():
+        bucket = rollup_model.objects.filter(**key).first()
+        if bucket is None:
+            return
+        # Min and max cannot be decremented, so rebuild the bucket when an extreme is removed
+        if bucket.count <= 1 or amount in (bucket.min_amount, bucket.max_amount):
+            recompute_bucket(model, key)
+            return
+        rollup_model.objects.filter(pk=bucket.pk).update(
+            total=F('total') - Value(amount, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            count=F('count') - 1,
+            sum_squares=F('sum_squares') - Value(float(amount) ** 2, output_field=FloatField()),
+            updated_at=timezone.now(),
+        )
+
+
+def change_in_rollup(model, previous, row):
+    """Move one edited raw row's amount within its bucket, leaving the count alone.
+
+    For a row whose user, group and month are unchanged; `previous` holds the
+    stored values from before the save and `row` the saved instance.
+    """
+    rollup_model = ROLLUPS[model][0]
+    key = bucket_key(model, row)
+    old_amount, new_amount = _amount(previous), _amount(row)
+    if old_amount == new_amount:
+        return
+    new_value = Value(new_amount, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    with transaction.atomic():
+        bucket = rollup_model.objects.filter(**key).first()
+        # The old amount may have been the only extreme, which cannot be decremented
+        if bucket is None or old_amount in (bucket.min_amount, bucket.max_amount):
+            recompute_bucket(model, key)
+            return
+        rollup_model.objects.filter(pk=bucket.pk).update(
+            total=F('total') + Value(new_amount - old_amount, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            sum_squares=F('sum_squares') + Value(
+                float(new_amount) ** 2 - float(old_amount) ** 2, output_field=FloatField()
+            ),
+            min_amount=Least('min_amount', new_value),
+            max_amount=Greatest('max_amount', new_value),
+            updated_at=timezone.now(),
+        )
+
+
+def recompute_bucket(model, key):
+    """Rebuild a single bucket from the raw rows it covers."""
+    rollup_model = ROLLUPS[model][0]
+    filters = {k: v for k, v in key.items() if k not in ('year', 'month')}
+    first_day, next_month = month_bounds(key['year'], key['month'])
+    aggregates = model.objects.filter(
+        **filters,
+        date__gte=first_day,
+        date__lt=next_month,
+    ).aggregate(**_rollup_aggregates())
+
+    if not aggregates['count']:
+        rollup_model.objects.filter(**key).delete()
+        return
+    rollup_model.objects.update_or_create(**key, defaults=aggregates)
+
+
+def rebuild_rollups(user=None):
+    """Regenerate the rollup tables from raw rows, for one user or everyone.
+
+    Returns a dict of rollup model -> number of buckets written.
+    """
+    written = {}
+    for model, (rollup_model, group_field) in ROLLUPS.items():
+        rows = model.objects.all()
+        buckets = rollup_model.objects.all()
+        if user is not None:
+            rows = rows.filter(user=user)
+            buckets = buckets.filter(user=user)
+
+        grouped = rows.order_by().annotate(
+            year=ExtractYear('date'),
+            month=ExtractMonth('date'),
+        ).values('user_id', group_field, 'year', 'month').annotate(**_rollup_aggregates())
+
+        with transaction.atomic():
+            buckets.delete()
+            created = rollup_model.objects.bulk_create(
+                (rollup_model(**row) for row in grouped.iterator(chunk_size=2000)),
+                batch_size=500,
+            )
+        written[rollup_model] = len(created)
+    return written
+
+
+def month_bounds(year, month):
+    """Return the first day of a month and of the month after it.
+
+    Filtering with date__gte/date__lt on these keeps the lookup sargable, so
+    SQLite can use the (user, date) indexes; date__year/date__month cannot.
+    """
+    first_day = date(year, month, 1)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return first_day, next_month
+
+
+def month_range_q(start_date, end_date):
+    """Filter rollup rows whose (year, month) falls between the months of two dates."""
+    return (
+        # The plain year range lets SQLite seek the (user, year, month) index
+        Q(year__gte=start_date.year, year__lte=end_date.year) &
+        (Q(year__gt=start_date.year) | Q(year=start_date.year, month__gte=start_date.month)) &
+        (Q(year__lt=end_date.year) | Q(year=end_date.year, month__lte=end_date.month))
+    )
+
+
+def _amount(row):
+    amount = row['amount'] if isinstance(row, dict) else row.amount
+    # Match the two-decimal value the database stores for the raw row
+    return Decimal(str(amount)).quantize(Decimal('0.01'))
+
+
+def _rollup_aggregates():
+    return {
+        'total': Sum('amount'),
+        'count': Count('id'),
+        'sum_squares': Sum(F('amount') * F('amount'), output_field=FloatField()),
+        'min_amount': Min('amount'),
+        'max_amount': Max('amount'),
+    }
@@ -0,0 +1,140 @@
+import calendar
+import random
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import transaction
+from ..models import Category, Expense, Income, UserProfile
+from ..signals import row_signals_muted
+from .analytics_cache import analytics_cache
+from .rollups import ROLLUPS, rebuild_rollups
+from .timeseries import shift_month
+
+# Name, fixed expense?, typical monthly spend (INR), purchases per month
+CATEGORY_PROFILES = [
+    ('Rent', True, 22000, 1),
+    ('Utilities', True, 4500, 1),
+    ('Insurance', True, 3000, 1),
+    ('Internet', True, 1000, 1),
+    ('Groceries', False, 11000, 8),
+    ('Dining Out', False, 5500, 6),
+    ('Transportation', False, 6000, 12),
+    ('Entertainment', False, 3500, 3),
+    ('Shopping', False, 7000, 3),
+    ('Healthcare', False, 2500, 1),
+    ('Education', False, 4000, 1),
+    ('Travel', False, 9000, 1),
+]
+
+# Extra spending in festival and holiday months
+SEASONALITY = {10: 1.15, 11: 1.2, 12: 1.25}
+
+
+def seed_users(count, categories=8, years=1, seed=0, prefix='bench_', end_month=None, batch_size=5000):
+    """Bulk-create `count` users with `years` of expenses and income each.
+
+    Every user gets `categories` categories drawn from CATEGORY_PROFILES
+    (cycled with numbered names beyond twelve), a lognormal salary, and
+    Poisson-like purchase counts with lognormal amounts per category and
+    month. The same seed, sizes and end month always produce the same rows.
+    Returns a dict of row counts by model name.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    end_year, end_month_number = end_month or (today.year, today.month)
+    months = [shift_month(end_year, end_month_number, -offset) for offset in range(years * 12 - 1, -1, -1)]
+    counts = {'users': 0, 'categories': 0, 'expenses': 0, 'incomes': 0}
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{index:05d}', email=f'{prefix}{index:05d}@example.com')
+            for index in range(count)
+        ], batch_size=batch_size)
+        counts['users'] = len(users)
+
+        salaries = {user.id: Decimal(round(rng.lognormvariate(11.2, 0.35), -2)) for user in users}
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, monthly_income=salaries[user.id]) for user in users],
+            batch_size=batch_size
+        )
+
+        category_rows = []
+        for user in users:
+            for index in range(categories):
+                name, is_fixed = CATEGORY_PROFILES[index % len(CATEGORY_PROFILES)][:2]
+                if index >= len(CATEGORY_PROFILES):
+                    name = f'{name} {index // len(CATEGORY_PROFILES) + 1}'
+                category_rows.append(Category(
+                    user=user, name=name, is_fixed_expense=is_fixed, description=f'{name} expenses'
+                ))
+        Category.objects.bulk_create(category_rows, batch_size=batch_size)
+        counts['categories'] = len(category_rows)
+
+    profiles = [CATEGORY_PROFILES[index % len(CATEGORY_PROFILES)] for index in range(categories)]
+    for index, user in enumerate(users):
+        user_categories = zip(category_rows[index * categories:(index + 1) * categories], profiles)
+        expenses, incomes = _user_rows(rng, user, list(user_categories), salaries[user.id], months)
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses, batch_size=batch_size)
+            Income.objects.bulk_create(incomes, batch_size=batch_size)
+            # bulk_create skips the signal handlers that maintain rollups and cache versions
+            rebuild_rollups(user=user)
+        analytics_cache.bump_version(user.id)
+        counts['expenses'] += len(expenses)
+        counts['incomes'] += len(incomes)
+
+    return counts
+
+
+def delete_seeded_users(prefix):
+    """Delete users created by seed_users with the given prefix, with all their data."""
+    users = User.objects.filter(username__startswith=prefix)
+    with transaction.atomic(), row_signals_muted():
+        # The users go away entirely, so nothing derived from their rows needs updating
+        for model, (rollup_model, _) in ROLLUPS.items():
+            rollup_model.objects.filter(user__in=users).delete()
+            model.objects.filter(user__in=users).delete()
+        return users.delete()[1].get('auth.User', 0)
+
+
+def _user_rows(rng, user, categories, salary, months):
+    """Build one user's expenses and income; `categories` pairs each Category with its profile."""
+    # Each user spends at their own scale, loosely tied to their salary
+    scale = float(salary) / 75000 * rng.uniform(0.7, 1.3)
+    expenses, incomes = [], []
+
+    for year, month in months:
+        days = calendar.monthrange(year, month)[1]
+        season = SEASONALITY.get(month, 1.0)
+
+        for category, (_, is_fixed, spend, purchases) in categories:
+            if is_fixed:
+                amount = spend * scale * rng.uniform(0.97, 1.03)
+                expenses.append(_expense(user, category, amount, date(year, month, min(5, days))))
+                continue
+
+            # Purchase count and sizes vary month to month around the category's typical spend
+            for _ in range(max(1, round(rng.gauss(purchases, purchases ** 0.5)))):
+                amount = rng.lognormvariate(0, 0.45) * spend * scale * season / purchases
+                expenses.append(_expense(user, category, amount, date(year, month, rng.randint(1, days))))
+
+        incomes.append(Income(
+            user=user, amount=salary, date=date(year, month, 1), source='salary',
+            description=f'Monthly salary for {calendar.month_name[month]} {year}'
+        ))
+        if rng.random() < 0.25:
+            incomes.append(Income(
+                user=user, amount=_money(rng.lognormvariate(9.5, 0.6)), date=date(year, month, rng.randint(1, days)),
+                source=rng.choice(['freelance', 'interest', 'dividend']), description=''
+            ))
+
+    return expenses, incomes
+
+
+def _expense(user, category, amount, day):
+    return Expense(user=user, category=category, amount=_money(max(amount, 1)), date=day, description='')
+
+
+def _money(amount):
+    return Decimal(str(round(amount, 2)))
+
@@ -0,0 +1,226 @@
+import os
+import re
+import sqlite3
+import statistics
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_SQLITE_SETTINGS = {
+    # Stored in the database file, so it is set once with `manage.py set_journal_mode`
+    # rather than on every connection
+    'JOURNAL_MODE': 'wal',          # Readers no longer block the writer, nor the writer them
+    # Applied in this order to every new SQLite connection; an empty dict applies none
+    'PRAGMAS': {
+        'synchronous': 'normal',    # Safe with WAL; fsync only at checkpoints
+        'busy_timeout': 5000,       # Milliseconds to wait for a lock before "database is locked"
+        'cache_size': -20000,       # Negative is KiB: a 20 MB page cache per connection
+        'mmap_size': 134217728,     # Read up to 128 MB of the file through the page cache
+        'temp_store': 'memory',     # Sorts and temporary indexes stay in memory
+    },
+}
+
+# The values SQLite reports back for pragmas set by name
+_PRAGMA_NAMES = {
+    'synchronous': {'off': 0, 'normal': 1, 'full': 2, 'extra': 3},
+    'temp_store': {'default': 0, 'file': 1, 'memory': 2},
+}
+
+_NAME = re.compile(r'^[a-z_]+$')
+_VALUE = re.compile(r'^-?\w+$')
+
+# The profile that Django's SQLite backend gives a connection when no pragmas are set
+BASELINE_PRAGMAS = {
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+    'busy_timeout': 5000,
+}
+
+
+def get_sqlite_settings():
+    """Return the TRACKER_SQLITE setting merged over the defaults."""
+    return {**DEFAULT_SQLITE_SETTINGS, **getattr(settings, 'TRACKER_SQLITE', {})}
+
+
+def configured_pragmas():
+    """The pragmas to apply to every new connection, validated."""
+    pragmas = get_sqlite_settings()['PRAGMAS']
+    for name, value in pragmas.items():
+        if not _NAME.match(name) or not _VALUE.match(str(value)):
+            raise ImproperlyConfigured(f'Invalid SQLite pragma in TRACKER_SQLITE: {name} = {value!r}')
+    if 'journal_mode' in pragmas:
+        raise ImproperlyConfigured(
+            "journal_mode is stored in the database file; set TRACKER_SQLITE['JOURNAL_MODE'] "
+            "and run `manage.py set_journal_mode` instead of listing it in PRAGMAS"
+        )
+    return pragmas
+
+
+def configured_journal_mode():
+    journal_mode = str(get_sqlite_settings()['JOURNAL_MODE']).lower()
+    if not _NAME.match(journal_mode):
+        raise ImproperlyConfigured(f'Invalid SQLite journal mode in TRACKER_SQLITE: {journal_mode!r}')
+    return journal_mode
+
+
+def configured_profile():
+    """The journal mode and connection pragmas together, as the diagnostics and benchmark compare them."""
+    return {'journal_mode': configured_journal_mode(), **configured_pragmas()}
+
+
+def apply_pragmas(connection, pragmas):
+    """Run PRAGMA name = value on a raw sqlite3 connection for each pragma."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def read_pragmas(connection, names):
+    """Current values of the named pragmas on a raw sqlite3 connection.
+
+    None for a pragma that reports nothing, such as mmap_size on an
+    in-memory database.
+    """
+    values = {}
+    for name in names:
+        row = connection.execute(f'PRAGMA {name}').fetchone()
+        values[name] = row[0] if row else None
+    return values
+
+
+def pragma_mismatches(configured, active):
+    """Names of pragmas whose active value differs from the configured one.
+
+    An in-memory database, for one, always reports journal_mode 'memory'.
+    """
+    mismatched = []
+    for name, value in configured.items():
+        expected = _PRAGMA_NAMES.get(name, {}).get(str(value).lower(), value)
+        actual = active.get(name)
+        if str(actual).lower() != str(expected).lower():
+            mismatched.append(name)
+    return mismatched
+
+
+def sqlite_diagnostics(connection):
+    """Configured and active pragmas of a Django SQLite connection, with the file sizes."""
+    connection.ensure_connection()
+    configured = configured_profile()
+    active = read_pragmas(connection.connection, configured)
+    path = str(connection.settings_dict['NAME'])
+    files = {}
+    for label, suffix in (('database', ''), ('wal', '-wal'), ('shared_memory', '-shm')):
+        if os.path.exists(path + suffix):
+            files[label] = os.path.getsize(path + suffix)
+    return {
+        'vendor': connection.vendor,
+        'sqlite_version': sqlite3.sqlite_version,
+        'transaction_mode': connection.settings_dict.get('OPTIONS', {}).get('transaction_mode'),
+        'configured': configured,
+        'active': active,
+        'mismatched': pragma_mismatches(configured, active),
+        'files': files,
+    }
+
+
+def _connect(path, pragmas):
+    # isolation_level=None leaves transactions to the explicit BEGIN statements below
+    connection = sqlite3.connect(path, timeout=pragmas.get('busy_timeout', 5000) / 1000, isolation_level=None)
+    # The journal mode is a property of the file, set once when the copy is made; switching it
+    # here would wait on the other processes' locks
+    apply_pragmas(connection, {name: value for name, value in pragmas.items() if name != 'journal_mode'})
+    return connection
+
+
+def _is_lock_error(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def _wait_until(start_at):
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def run_reader(path, pragmas, user_ids, start_at, duration):
+    """Run a dashboard-style read in a loop; return reads, lock errors and latencies in ms."""
+    connection = _connect(path, pragmas)
+    since = (date.today() - timedelta(days=365)).isoformat()
+    reads, errors, latencies = 0, 0, []
+    _wait_until(start_at)
+    deadline = start_at + duration
+    while time.time() < deadline:
+        user_id = user_ids[reads % len(user_ids)] if user_ids else 0
+        started = time.perf_counter()
+        try:
+            connection.execute('BEGIN')
+            connection.execute(
+                'SELECT category_id, SUM(amount), COUNT(*) FROM tracker_expense '
+                'WHERE user_id = ? AND date >= ? GROUP BY category_id',
+                (user_id, since),
+            ).fetchall()
+            connection.execute(
+                'SELECT year, month, SUM(total) FROM tracker_monthlyexpenserollup '
+                'WHERE user_id = ? GROUP BY year, month',
+                (user_id,),
+            ).fetchall()
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        reads += 1
+    connection.close()
+    return {'operations': reads, 'errors': errors, 'latencies': latencies}
+
+
+def run_writer(path, pragmas, start_at, duration, rows_per_write=20):
+    """Commit small write transactions in a loop, like the dashboard's write-on-GET."""
+    connection = _connect(path, pragmas)
+    writes, errors, latencies = 0, 0, []
+    _wait_until(start_at)
+    deadline = start_at + duration
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO benchmark_writes (payload, created_at) VALUES (?, ?)',
+                [('x' * 200, time.time())] * rows_per_write,
+            )
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        writes += 1
+    connection.close()
+    return {'operations': writes, 'errors': errors, 'latencies': latencies}
+
+
+def summarize(results, duration):
+    """Combine per-process results into throughput, lock errors and latency percentiles."""
+    operations = sum(result['operations'] for result in results)
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    summary = {
+        'operations': operations,
+        'per_second': round(operations / duration, 1),
+        'errors': sum(result['errors'] for result in results),
+        'median_ms': None,
+        'p95_ms': None,
+        'max_ms': None,
+    }
+    if latencies:
+        summary['median_ms'] = round(statistics.median(latencies), 2)
+        summary['p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        summary['max_ms'] = round(latencies[-1], 2)
+    return summary
@@ -0,0 +1,255 @@
+import hashlib
+import re
+import threading
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.db.models import Sum
+from ..models import MonthlyIncomeRollup, TaxDeduction
+from .deduction_headroom import deduction_headroom
+from .reference_data import reference_data
+from .rollups import month_range_q
+
+# Width of a step on the extra-deduction axis of the regime comparison grid
+REGIME_GRID_STEP = 5000
+
+# UserTaxProfile.tax_regime code -> DeductionSection flag for deductions allowed under it
+REGIME_DEDUCTION_FLAGS = {
+    'old': 'applicable_old_regime',
+    'new': 'applicable_new_regime',
+}
+
+
+def regime_code(regime):
+    """Map a TaxRegime to the 'old'/'new' code used by UserTaxProfile.tax_regime."""
+    return 'new' if 'new' in regime.name.lower() else 'old'
+
+
+def is_valid_fiscal_year(fiscal_year):
+    """Whether a string is a fiscal year like '2024-25' whose dates fit in a datetime.date."""
+    match = re.fullmatch(r'(\d{4})-(\d{2})', fiscal_year)
+    if not match:
+        return False
+    start_year = int(match.group(1))
+    return 1 <= start_year < 9999 and match.group(2) == f'{(start_year + 1) % 100:02d}'
+
+
+def fiscal_year_bounds(fiscal_year):
+    """Return the first and last day of an Indian fiscal year written as '2024-25'."""
+    start_year = int(fiscal_year.split('-')[0])
+    return date(start_year, 4, 1), date(start_year + 1, 3, 31)
+
+
+def current_fiscal_year(today=None):
+    today = today or date.today()
+    start_year = today.year if today.month >= 4 else today.year - 1
+    return f'{start_year}-{str(start_year + 1)[-2:]}'
+
+
+class CompiledRegime:
+    """A regime's slabs as sorted numpy arrays, for evaluating many incomes at once.
+
+    Tax is charged at each slab's rate on the part of the taxable income
+    inside it. The slab the income falls in sets the surcharge rate,
+    applied to the tax, and the cess rate, applied to tax plus surcharge.
+    Marginal relief, the section 87A rebate and the standard deduction are
+    not modelled: the slabs carry no fiscal year, and the rebate thresholds
+    and the deduction differ between years and regimes.
+    """
+
+    def __init__(self, regime, slabs):
+        self.regime_id = regime.id
+        self.name = regime.name
+        self.code = regime_code(regime)
+        slabs = sorted(slabs, key=lambda slab: slab.min_amount)
+        self.lowers = np.array([float(slab.min_amount) for slab in slabs])
+        self.uppers = np.array([float(slab.max_amount) if slab.max_amount is not None else np.inf for slab in slabs])
+        self.rates = np.array([float(slab.tax_rate) / 100 for slab in slabs])
+        self.surcharge_rates = np.array([float(slab.surcharge_rate) / 100 for slab in slabs])
+        self.cess_rates = np.array([float(slab.cess_rate) / 100 for slab in slabs])
+        arrays = (self.lowers, self.uppers, self.rates, self.surcharge_rates, self.cess_rates)
+        self.fingerprint = hashlib.sha1(b''.join(array.tobytes() for array in arrays)).hexdigest()[:12]
+
+    def evaluate(self, taxable_incomes):
+        """Return arrays of tax, surcharge, cess and total liability for each taxable income."""
+        incomes = np.maximum(np.asarray(taxable_incomes, dtype=float), 0)
+        in_slab = np.clip(incomes[:, np.newaxis] - self.lowers, 0, self.uppers - self.lowers)
+        tax = in_slab @ self.rates
+
+        slab = np.searchsorted(self.lowers, incomes, side='right') - 1
+        below_first = slab < 0
+        slab = np.maximum(slab, 0)
+        surcharge = np.where(below_first, 0, tax * self.surcharge_rates[slab])
+        cess = np.where(below_first, 0, (tax + surcharge) * self.cess_rates[slab])
+        return {
+            'tax': tax,
+            'surcharge': surcharge,
+            'cess': cess,
+            'total': tax + surcharge + cess,
+        }
+
+
+_compiled = (None, {})
+_compiled_lock = threading.Lock()
+
+
+def compiled_regimes():
+    """Return {regime code: CompiledRegime} for active regimes, compiling them on first use.
+
+    The slabs come from the reference data cache and are recompiled only
+    when its snapshot changes.
+    """
+    global _compiled
+    snapshot = reference_data.get()
+    with _compiled_lock:
+        version, compiled = _compiled
+        if version != snapshot.version:
+            compiled = {}
+            for regime in snapshot.regimes:
+                if regime.is_active and snapshot.slabs[regime.id]:
+                    compiled_regime = CompiledRegime(regime, snapshot.slabs[regime.id])
+                    compiled[compiled_regime.code] = compiled_regime
+            _compiled = (snapshot.version, compiled)
+        return compiled
+
+
+def regimes_fingerprint():
+    """Short digest of every compiled regime's slabs, for keys of results computed from them."""
+    regimes = compiled_regimes()
+    return '-'.join(f'{code}.{regimes[code].fingerprint}' for code in sorted(regimes)) or 'none'
+
+
+def gross_incomes(fiscal_year, user_ids=None):
+    """Total income per user for a fiscal year, read from the monthly rollups in one query."""
+    start, end = fiscal_year_bounds(fiscal_year)
+    rollups = MonthlyIncomeRollup.objects.filter(month_range_q(start, end))
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+    return {
+        row['user_id']: float(row['total'])
+        for row in rollups.values('user_id').annotate(total=Sum('total')).order_by()
+    }
+
+
+def capped_deductions(fiscal_year, user_ids=None):
+    """Verified deductions per user and regime code, each section capped at its max_limit.
+
+    One grouped query over (user, category); sections, their limits and
+    applicable_* flags come from the reference data snapshot, and a section
+    only counts towards the regimes its flags allow. A category missing from
+    the snapshot makes it reload once; claims in a category still unknown
+    after that are left out, as deduction_headroom() leaves them out.
+    """
+    snapshot = reference_data.get()
+    deductions = TaxDeduction.objects.filter(fiscal_year=fiscal_year, verification_status='verified')
+    if user_ids is not None:
+        deductions = deductions.filter(user_id__in=user_ids)
+    rows = deductions.values('user_id', 'deduction_category_id').annotate(total=Sum('amount')).order_by()
+
+    claimed = defaultdict(Decimal)
+    refreshed = False
+    for row in rows:
+        category_id = row['deduction_category_id']
+        if category_id not in snapshot.categories_by_id and not refreshed:
+            # Created after the snapshot was taken
+            snapshot, refreshed = reference_data.refresh(), True
+        if category_id not in snapshot.categories_by_id:
+            continue  # Not announced yet, so its section and limit are unknown
+        section_id = snapshot.categories_by_id[category_id].section_id
+        claimed[row['user_id'], section_id] += row['total']
+
+    totals = defaultdict(lambda: dict.fromkeys(REGIME_DEDUCTION_FLAGS, 0.0))
+    for (user_id, section_id), total in claimed.items():
+        section = snapshot.sections_by_id[section_id]
+        allowed = float(min(total, section.max_limit))
+        for code, flag in REGIME_DEDUCTION_FLAGS.items():
+            if getattr(section, flag):
+                totals[user_id][code] += allowed
+    return totals
+
+
+def compute_liabilities(fiscal_year, user_ids=None):
+    """Compute every user's liability under each active regime for a fiscal year.
+
+    Incomes and deductions come from two grouped queries and each regime is
+    evaluated once over the whole batch. Returns {user_id: result} where
+    result holds the gross income, a per-regime breakdown and the cheaper
+    regime's code. Users without income in the fiscal year are left out.
+
+    Liabilities are slab estimates (see CompiledRegime): without the 87A
+    rebate and the standard deduction, the new regime in particular comes
+    out dearer than it is for incomes near the rebate threshold, and the
+    better regime can be the wrong one there.
+    """
+    incomes = gross_incomes(fiscal_year, user_ids)
+    deductions = capped_deductions(fiscal_year, user_ids)
+    user_order = sorted(incomes)
+    gross = np.array([incomes[user_id] for user_id in user_order])
+
+    results = {
+        user_id: {'gross_income': incomes[user_id], 'regimes': {}, 'better_regime': None}
+        for user_id in user_order
+    }
+    for code, regime in compiled_regimes().items():
+        claimed = np.array([deductions.get(user_id, {}).get(code, 0.0) for user_id in user_order])
+        taxable = np.maximum(gross - claimed, 0)
+        evaluated = regime.evaluate(taxable)
+        for index, user_id in enumerate(user_order):
+            results[user_id]['regimes'][code] = {
+                'deductions': round(float(claimed[index]), 2),
+                'taxable_income': round(float(taxable[index]), 2),
+                **{key: round(float(values[index]), 2) for key, values in evaluated.items()},
+            }
+
+    for result in results.values():
+        if result['regimes']:
+            result['better_regime'] = min(result['regimes'], key=lambda code: result['regimes'][code]['total'])
+    return results
+
+
+def regime_grid(user_id, fiscal_year, section_code='80C', step=REGIME_GRID_STEP):
+    """A user's liability under every regime across a range of extra deductions.
+
+    The extra-deduction axis runs from 0 to the section's limit in `step`
+    increments. An extra amount only lowers the taxable income of regimes
+    the section applies to, and only up to the headroom the user's verified
+    claims leave in it. All grid points of a regime are evaluated in one
+    call, so a UI can answer slider moves by indexing into the result.
+    Like compute_liabilities(), the totals leave out the 87A rebate and the
+    standard deduction.
+    """
+    sections = deduction_headroom(user_id, fiscal_year)['sections']
+    section = next((section for section in sections if section['section_code'] == section_code), None)
+    gross = gross_incomes(fiscal_year, [user_id]).get(user_id, 0.0)
+    deductions = capped_deductions(fiscal_year, [user_id]).get(user_id, dict.fromkeys(REGIME_DEDUCTION_FLAGS, 0.0))
+
+    limit = float(section['max_limit']) if section else 0.0
+    headroom = max(limit - float(section['verified']), 0.0) if section else 0.0
+    extras = np.append(np.arange(0, limit, step), limit) if limit else np.zeros(1)
+
+    regimes = {}
+    for code, regime in compiled_regimes().items():
+        applies = bool(section and section[REGIME_DEDUCTION_FLAGS[code]])
+        effective = np.minimum(extras, headroom) if applies else np.zeros_like(extras)
+        taxable = np.maximum(gross - deductions[code] - effective, 0)
+        regimes[code] = {
+            'name': regime.name,
+            'deductions': round(deductions[code], 2),
+            'section_applies': applies,
+            'totals': np.round(regime.evaluate(taxable)['total'], 2).tolist(),
+        }
+
+    codes = sorted(regimes)
+    cheaper = [min(codes, key=lambda code: regimes[code]['totals'][index]) for index in range(len(extras))] if codes else []
+    return {
+        'fiscal_year': fiscal_year,
+        'gross_income': round(gross, 2),
+        'section': section_code,
+        'section_limit': limit,
+        'headroom': headroom,
+        'step': step,
+        'extra_deductions': extras.tolist(),
+        'regimes': regimes,
+        'cheaper': cheaper,
+    }
@@ -0,0 +1,64 @@
+import calendar
+from decimal import Decimal
+from django.db.models import Sum
+from ..models import Expense, Income, MonthlyExpenseRollup, MonthlyIncomeRollup
+from .rollups import month_range_q
+
+# Raw model -> (rollup model, lookup used to break totals down)
+SERIES_SOURCES = {
+    Expense: (MonthlyExpenseRollup, 'category__name'),
+    Income: (MonthlyIncomeRollup, 'source'),
+}
+
+
+def shift_month(year, month, delta):
+    """Return the (year, month) that is `delta` calendar months away."""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def month_sequence(start, end):
+    """Return every (year, month) from the month of `start` to the month of `end`, inclusive."""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        year, month = shift_month(year, month, 1)
+    return months
+
+
+def month_label(year, month):
+    return f"{calendar.month_name[month]} {year}"
+
+
+def monthly_series(user, start, end, model=Expense, by_category=False):
+    """Return calendar-month totals for a user between two dates, with empty months filled in.
+
+    Each entry is a dict with year, month, label and total; with by_category
+    it also has a 'categories' dict of name -> total (income is broken down by
+    source). Either way the data comes from a single grouped query over the
+    monthly rollups.
+    """
+    rollup_model, breakdown = SERIES_SOURCES[model]
+    group_by = ['year', 'month', breakdown] if by_category else ['year', 'month']
+
+    rows = rollup_model.objects.filter(
+        month_range_q(start, end),
+        user=user
+    ).values(*group_by).annotate(total=Sum('total')).order_by(*group_by)
+
+    series = {}
+    for year, month in month_sequence(start, end):
+        entry = {'year': year, 'month': month, 'label': month_label(year, month), 'total': Decimal('0')}
+        if by_category:
+            entry['categories'] = {}
+        series[(year, month)] = entry
+
+    for row in rows:
+        entry = series[(row['year'], row['month'])]
+        entry['total'] += row['total']
+        if by_category:
+            name = row[breakdown]
+            entry['categories'][name] = entry['categories'].get(name, Decimal('0')) + row['total']
+
+    return list(series.values())
@@ -1 +1,225 @@
- 
\ No newline at end of file
+import weakref
+from contextlib import contextmanager
+from django.db import connections, router, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from .models import Expense, Income, Category, UserProfile, TaxDeduction, UserTaxProfile
+from .services.analytics_cache import analytics_cache
+from .services.jobs import enqueue_recompute
+from .services.rollups import ROLLUPS, bucket_key, add_to_rollup, change_in_rollup, remove_from_rollup
+from .services.sqlite_profile import apply_pragmas, configured_pragmas
+from .storage import claim_uploads, stored_file_fields
+
+
+class _CommitBatch:
+    """Callbacks queued in one transaction or savepoint, run in order when it commits."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def __call__(self):
+        callbacks, self.callbacks = self.callbacks, None
+        for func in callbacks.values():
+            func()
+
+
+# connection -> {savepoint stack: batch}. Only transaction.on_commit holds a batch, so one
+# that has run, or was discarded with a rolled back savepoint, drops out of the registry.
+_commit_batches = weakref.WeakKeyDictionary()
+
+
+def on_commit_once(key, func):
+    """Run func when the current transaction commits, once per key.
+
+    A bulk delete or a cascade fires a signal per row; without this each
+    row would queue its own job update and version bump for the same user.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        func()
+        return
+    batches = _commit_batches.setdefault(connection, weakref.WeakValueDictionary())
+    scope = tuple(connection.savepoint_ids)
+    batch = batches.get(scope)
+    if batch is None or batch.callbacks is None:
+        batch = batches[scope] = _CommitBatch()
+        transaction.on_commit(batch)
+    batch.callbacks.setdefault(key, func)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Income)
+@receiver(post_delete, sender=Income)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def queue_budget_recompute(sender, instance, **kwargs):
+    """Recompute the owner's predictions and recommendations once the write commits."""
+    user_id = instance.user_id
+    on_commit_once(('recompute', user_id), lambda: enqueue_recompute(user_id))
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Income)
+@receiver(post_delete, sender=Income)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=TaxDeduction)
+@receiver(post_delete, sender=TaxDeduction)
+def bump_data_version(sender, instance, **kwargs):
+    """Invalidate the owner's cached analytics once the write commits."""
+    user_id = instance.user_id
+    on_commit_once(('data-version', user_id), lambda: analytics_cache.bump_version(user_id))
+
+
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Income)
+def remember_rollup_bucket(sender, instance, raw=False, **kwargs):
+    """Keep the stored version of an updated row so it can be taken out of its old bucket."""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    group_field = ROLLUPS[sender][1]
+    instance._rollup_previous = sender.objects.filter(pk=instance.pk).values(
+        'user_id', group_field, 'date', 'amount'
+    ).first()
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Income)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        # The row is saved already, so rebuilding its bucket from raw rows and adding it would count it twice
+        if bucket_key(sender, previous) == bucket_key(sender, instance):
+            change_in_rollup(sender, previous, instance)
+            return
+        remove_from_rollup(sender, previous)
+    add_to_rollup(sender, instance)
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Income)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    # Deleting a category or user cascades to its rollup rows as well
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model in (Category, User):
+        return
+    remove_from_rollup(sender, instance)
+
+
+@receiver(post_init, sender=TaxDeduction)
+@receiver(post_init, sender=UserTaxProfile)
+def remember_stored_files(sender, instance, **kwargs):
+    """Keep the file names a row was loaded with, to release them when they are replaced."""
+    instance._stored_files = {
+        field.attname: instance.__dict__[field.attname]
+        for field in stored_file_fields(sender) if field.attname in instance.__dict__
+    }
+
+
+@receiver(post_save, sender=TaxDeduction)
+@receiver(post_save, sender=UserTaxProfile)
+def update_file_references(sender, instance, created=False, **kwargs):
+    """Move the row's file references from the names it had to the names it has now."""
+    previous = {} if created else getattr(instance, '_stored_files', {})
+    uploads = claim_uploads(instance)
+    for field in stored_file_fields(sender):
+        new_name = getattr(instance, field.attname).name or ''
+        # An upload through this instance took its reference when the file was saved
+        upload = uploads.get(field.attname)
+        uploaded = bool(new_name) and upload == new_name
+        if upload and not uploaded:
+            # Replaced by another name before the row was saved
+            transaction.on_commit(lambda storage=field.storage, name=upload: storage.delete(name))
+        if field.attname not in previous and not created:
+            continue  # Deferred when loaded, so the previous name is unknown
+        old_name = previous.get(field.attname) or ''
+        if old_name == new_name and not uploaded:
+            continue
+        if new_name and not uploaded:
+            field.storage.retain(new_name)
+        if old_name:
+            transaction.on_commit(lambda storage=field.storage, name=old_name: storage.delete(name))
+    instance._stored_files = {
+        field.attname: getattr(instance, field.attname).name for field in stored_file_fields(sender)
+    }
+
+
+@receiver(post_delete, sender=TaxDeduction)
+@receiver(post_delete, sender=UserTaxProfile)
+def release_files_on_delete(sender, instance, **kwargs):
+    for field in stored_file_fields(sender):
+        name = getattr(instance, field.attname).name
+        if name:
+            transaction.on_commit(lambda storage=field.storage, name=name: storage.delete(name))
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    # On the raw connection, so the pragmas stay out of query counts and instrumentation. The
+    # journal mode is not among them: it is written to the file by `manage.py set_journal_mode`
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection, configured_pragmas())
+
+# Every handler above that runs once per Expense or Income row
+ROW_HANDLERS = [
+    (pre_save, remember_rollup_bucket),
+    (post_save, queue_budget_recompute),
+    (post_save, bump_data_version),
+    (post_save, update_rollup_on_save),
+    (post_delete, queue_budget_recompute),
+    (post_delete, bump_data_version),
+    (post_delete, update_rollup_on_delete),
+]
+
+
+@contextmanager
+def row_signals_muted():
+    """Detach the per-row Expense and Income handlers, e.g. to purge rows in bulk.
+
+    With no receivers left Django deletes the rows with a single query
+    instead of loading them one by one. The caller is responsible for the
+    rollups, cache versions and recompute jobs the handlers would have kept
+    up to date. Only meant for management commands: the handlers are
+    detached process-wide.
+    """
+    for signal, handler in ROW_HANDLERS:
+        for model in (Expense, Income):
+            signal.disconnect(handler, sender=model)
+    try:
+        yield
+    finally:
+        for signal, handler in ROW_HANDLERS:
+            for model in (Expense, Income):
+                signal.connect(handler, sender=model)
+
+
+def purge_category(category):
+    """Delete a category and everything filed under it in a fixed number of queries.
+
+    A plain delete() would load every expense in the category, run the
+    per-row handlers above and delete them in batches of 100. Muting the
+    handlers is not an option inside a request, so the expenses are removed
+    with one DELETE statement instead. Nothing references an expense, and
+    the rest still goes through the normal cascade: the category's rollup
+    buckets, budget predictions and recommendations are deleted with it, and
+    its own delete signals bump the user's data version and queue a
+    recomputation.
+    """
+    # A plain filter() would be routed like a read, to the replica inside reporting views
+    using = router.db_for_write(Expense, instance=category)
+    table = connections[using].ops.quote_name(Expense._meta.db_table)
+    column = connections[using].ops.quote_name(Expense._meta.get_field('category').column)
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE {column} = %s', [category.pk])
+        category.delete(using=using)
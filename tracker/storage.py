@@ -0,0 +1,182 @@
+import hashlib
+import os
+import re
+from contextlib import contextmanager, nullcontext
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FileField, Sum
+from django.db.models.fields.files import FieldFile
+from django.utils.deconstruct import deconstructible
+
+CONTENT_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})(?:\.\w+)?$')
+
+
+def is_content_name(name):
+    """Whether a stored name is a content-addressed path written by ContentAddressedStorage."""
+    return bool(name and CONTENT_NAME.search(name))
+
+
+def stored_file_fields(model):
+    """The file fields of a model that are kept in a ContentAddressedStorage."""
+    return [
+        field for field in model._meta.fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def claim_uploads(instance):
+    """Hand the references taken by an instance's uploads over to its row.
+
+    Returns {attname: name} for every file uploaded through the instance
+    since its row was last written, and forgets them.
+    """
+    return instance.__dict__.pop('_uploaded_files', {})
+
+
+@contextmanager
+def upload_transaction(instance):
+    """Run a block that uploads files through instance, e.g. its save(), in one transaction.
+
+    A block that fails rolls back the references its uploads took, and the
+    instance forgets them again.
+    """
+    uploads = dict(instance.__dict__.get('_uploaded_files', {}))
+    try:
+        with transaction.atomic():
+            yield
+    except BaseException:
+        instance.__dict__['_uploaded_files'] = uploads
+        raise
+
+
+def save_transaction(instance):
+    """The block to save instance in: an upload_transaction() if the save uploads a file.
+
+    A file assigned to a field but not stored yet is uploaded by the field
+    during the save; other saves run without the extra savepoint.
+    """
+    for field in stored_file_fields(type(instance)):
+        value = instance.__dict__.get(field.attname)
+        if isinstance(value, File) and not getattr(value, '_committed', False):
+            return upload_transaction(instance)
+    return nullcontext()
+
+
+class ContentAddressedFieldFile(FieldFile):
+    def save(self, name, content, save=True):
+        """Store content and note on the instance that the upload holds a reference.
+
+        The reference is the row's once the row is written with this name;
+        the post_save handler in tracker.signals claims it. With save=False
+        the caller saves the row, in the same transaction so that a failed
+        save gives the reference back.
+        """
+        with upload_transaction(self.instance):
+            uploads = self.instance.__dict__.setdefault('_uploaded_files', {})
+            replaced = uploads.get(self.field.attname)
+            super().save(name, content, save=False)
+            uploads[self.field.attname] = self.name
+            if replaced:
+                # Uploaded earlier through this instance, but never written to its row
+                transaction.on_commit(lambda: self.storage.delete(replaced))
+            if save:
+                self.instance.save()
+
+
+class ContentAddressedFileField(FileField):
+    """A FileField whose uploads record their reference on the model instance."""
+
+    attr_class = ContentAddressedFieldFile
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that keeps one copy of each distinct file.
+
+    A file is stored as <upload_to>/<aa>/<sha256>.<ext>, where the digest is
+    computed while streaming the upload in chunks. Saving bytes that are
+    already stored writes nothing and returns the existing name.
+
+    tracker.models.StoredFile counts the rows that point at each file.
+    Saving a file takes a reference for the row it is being saved for, which
+    ContentAddressedFieldFile notes on the row's instance; the signal
+    handlers in tracker.signals claim it once that row is saved. They call
+    retain() when a row starts pointing at a name without an upload and
+    delete() when it stops, and delete() only removes the file once its
+    last reference is released.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allow_overwrite', True)  # Same name means same bytes
+        super().__init__(**kwargs)
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            digest.update(chunk)
+            size += len(chunk)
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(directory, hexdigest[:2], hexdigest + extension).replace('\\', '/'), size
+
+    def _save(self, name, content):
+        name, size = self.content_name(name, content)
+        # The reference comes first: a delete() of the last other one either finishes before
+        # it, and the file is written again below, or sees it and keeps the file
+        with transaction.atomic():
+            self.retain(name, size)
+            if not self.exists(name):
+                name = super()._save(name, content)
+        return name
+
+    def delete(self, name):
+        """Release one reference to name and remove the file once none are left.
+
+        Files the reference table does not know about (written before this
+        storage was in use) are left alone; rebuild the counts with
+        `manage.py dedupe_media` to bring them under management.
+        """
+        from .models import StoredFile
+        if not name:
+            return
+        # One transaction, so a concurrent _save() waits to take its reference until the file is gone
+        with transaction.atomic():
+            StoredFile.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+            if StoredFile.objects.filter(name=name, references__lte=0).delete()[0]:
+                super().delete(name)
+
+    def retain(self, name, size=None):
+        """Record one more reference to an already stored file."""
+        from .models import StoredFile
+        if StoredFile.objects.filter(name=name).update(references=F('references') + 1):
+            return
+        if size is None:
+            size = self.size(name)
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, size=size, references=1)
+        except IntegrityError:
+            # Created by a concurrent save in the meantime
+            StoredFile.objects.filter(name=name).update(references=F('references') + 1)
+
+    def stats(self):
+        """Return the number of stored files and references, their sizes and the dedup ratio."""
+        from .models import StoredFile
+        totals = StoredFile.objects.aggregate(
+            files=Count('id'),
+            reference_count=Sum('references'),
+            stored_bytes=Sum('size'),
+            logical_bytes=Sum(F('size') * F('references')),
+        )
+        totals = {key: value or 0 for key, value in totals.items()}
+        totals['saved_bytes'] = totals['logical_bytes'] - totals['stored_bytes']
+        totals['dedup_ratio'] = totals['logical_bytes'] / totals['stored_bytes'] if totals['stored_bytes'] else 1.0
+        return totals
+
+
+content_storage = ContentAddressedStorage()
@@ -1,3 +1,1196 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from .models import (
+    Category, Expense, Income, DeductionSection, DeductionCategory,
+    TaxDeduction, UserTaxProfile, StoredFile, TaxRegime, TaxSlab, MonthlyExpenseRollup, AnalysisJob,
+    BudgetRecommendation
+)
+from .services.analytics_cache import analytics_cache
+from .services.budget_analysis import BudgetAnalyzer
+from .services.export import EXPORT_COLUMNS, export_rows, export_stream
+from .services.forecasting import FORECASTERS, get_forecaster
+from .services.deduction_headroom import compute_deduction_headroom
+from .services.importer import ExpenseImporter
+from .services.jobs import mark_recomputed
+from .services.persistence import sync_rows
+from .admin import EstimatedCountPaginator
+from .forms import TaxDeductionForm
+from .management.commands.setup_test_data import Command as SetupTestDataCommand
+from .services.seeding import seed_users
+from .signals import on_commit_once
+from .services.sqlite_profile import configured_pragmas
+from .routers import ReadReplicaRouter
+from .services.reference_data import VERSION_KEY as REFERENCE_DATA_VERSION_KEY, reference_data
+from .services.replica import refresh_replica, replica_is_current, reporting_reads, request_scope
+from .services.tax_engine import capped_deductions, compiled_regimes, compute_liabilities, regime_grid
+from .services.timeseries import monthly_series
+from .storage import content_storage
 
-# Create your tests here.
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tracker-tests-default'},
+    'analytics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tracker-tests-analytics'},
+}
+
+# Over-budget requests fail the test instead of logging a warning
+TEST_QUERY_INSTRUMENTATION = {**getattr(settings, 'TRACKER_QUERY_INSTRUMENTATION', {}), 'RAISE_ON_BUDGET': True}
+
+# Most seconds the full BudgetAnalyzer pipeline may take on the large dataset
+ANALYZER_TIME_LIMIT = 1.0
+
+
+@override_settings(CACHES=TEST_CACHES, TRACKER_QUERY_INSTRUMENTATION=TEST_QUERY_INSTRUMENTATION)
+class QueryCountTestCase(TestCase):
+    """Seeds a small and a large dataset so each view can be checked against both.
+
+    The small user has 3 categories and a year of history, the large one 12
+    categories and three years (a few thousand expenses). A view whose
+    query count differs between the two has an N+1 somewhere.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        end_month = (date.today().year, date.today().month)
+        seed_users(1, categories=3, years=1, seed=1, prefix='small_', end_month=end_month)
+        seed_users(1, categories=12, years=3, seed=1, prefix='large_', end_month=end_month)
+        cls.small_user = User.objects.get(username='small_00000')
+        cls.large_user = User.objects.get(username='large_00000')
+
+        section = DeductionSection.objects.create(
+            section_code='80C', name='Investments & Payments', description='80C', max_limit=Decimal('150000')
+        )
+        deduction_categories = [
+            DeductionCategory.objects.create(
+                section=section, name=name, description=name, max_limit=Decimal('150000')
+            )
+            for name in ('PPF', 'ELSS', 'Life Insurance')
+        ]
+
+        for user, deductions in ((cls.small_user, 1), (cls.large_user, 12)):
+            UserTaxProfile.objects.create(user=user, date_of_birth=date(1990, 1, 1), pan_number='ABCDE1234F')
+            for index in range(deductions):
+                TaxDeduction.objects.create(
+                    user=user,
+                    deduction_category=deduction_categories[index % len(deduction_categories)],
+                    amount=Decimal('1000'),
+                    fiscal_year='2024-25',
+                    date_claimed=date(2024, 6, 1),
+                )
+
+            analyzer = BudgetAnalyzer(user)
+            analyzer.predict_future_expenses()
+            analyzer.generate_recommendations()
+            mark_recomputed(user.id, started_at=analyzer.today)
+
+    def setUp(self):
+        # Start every test cold; the locmem caches outlive the per-test rollback
+        analytics_cache.clear_local()
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        # Load this database's reference tables before any query is counted or budgeted
+        reference_data.invalidate()
+        reference_data.get()
+
+    def assertQueriesForBothDatasets(self, expected, make_request, target=None):
+        """Run make_request(user, obj) for the small and the large user and pin its query count.
+
+        `target(user)` looks up the object the request acts on, outside the
+        counted block.
+        """
+        for user in (self.small_user, self.large_user):
+            self.client.force_login(user)
+            obj = target(user) if target else None
+            with self.subTest(user=user.username), self.assertNumQueries(expected):
+                make_request(user, obj)
+
+    def assertStatus(self, response, status=200):
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status)
+        return response
+
+
+class AnalyticsViewQueryTests(QueryCountTestCase):
+    def test_dashboard_uncached(self):
+        def request(user, obj):
+            analytics_cache.bump_version(user.id)
+            self.assertStatus(self.client.get(reverse('tracker:dashboard')))
+        self.assertQueriesForBothDatasets(7, request)
+
+    def test_dashboard_cached(self):
+        for user in (self.small_user, self.large_user):
+            self.client.force_login(user)
+            self.client.get(reverse('tracker:dashboard'))
+        self.assertQueriesForBothDatasets(2, lambda user, obj: self.assertStatus(self.client.get(reverse('tracker:dashboard'))))
+
+    def test_financial_summary(self):
+        def request(user, obj):
+            analytics_cache.bump_version(user.id)
+            self.assertStatus(self.client.get(reverse('tracker:financial_summary')))
+        self.assertQueriesForBothDatasets(4, request)
+
+    def test_financial_summary_covers_twelve_months(self):
+        self.client.force_login(self.large_user)
+        months = list(self.assertStatus(self.client.get(reverse('tracker:financial_summary'))).context['monthly_totals'])
+        today = date.today()
+        self.assertEqual(len(months), 12)
+        self.assertEqual(months[-1], (today.year, today.month))
+        self.assertEqual(months[0], (today.year - 1, today.month + 1) if today.month < 12 else (today.year, 1))
+
+    def test_monthly_data(self):
+        def request(user, obj):
+            analytics_cache.bump_version(user.id)
+            self.assertStatus(self.client.get(reverse('tracker:get_monthly_data')))
+        self.assertQueriesForBothDatasets(4, request)
+
+    def test_monthly_data_range(self):
+        def request(user, obj):
+            analytics_cache.bump_version(user.id)
+            self.assertStatus(self.client.get(reverse('tracker:get_monthly_data'), {'months': '-11:0'}))
+        self.assertQueriesForBothDatasets(4, request)
+
+    def test_monthly_data_rejects_years_out_of_range(self):
+        self.client.force_login(self.small_user)
+        for params in ({'year': 0, 'month': 6}, {'year': 10000, 'month': 6}, {'year': 1, 'month': 1, 'months': '-1:0'},
+                       {'year': 9999, 'month': 12, 'months': '0:1'}):
+            with self.subTest(**params):
+                self.assertStatus(self.client.get(reverse('tracker:get_monthly_data'), params), 400)
+
+    def test_monthly_data_not_modified(self):
+        # The conditional request is answered from the data version alone
+        self.client.force_login(self.small_user)
+        first = self.client.get(reverse('tracker:get_monthly_data'))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('tracker:get_monthly_data'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_export(self):
+        def request(user, obj):
+            response = self.assertStatus(self.client.get(reverse('tracker:export_data'), {'format': 'jsonl'}))
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertQueriesForBothDatasets(4, request)
+
+
+class FormViewQueryTests(QueryCountTestCase):
+    def test_add_expense_page(self):
+        self.assertQueriesForBothDatasets(3, lambda user, obj: self.assertStatus(self.client.get(reverse('tracker:add_expense'))))
+
+    def test_add_expense(self):
+        def request(user, category):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:add_expense'), {
+                    'category': category.id, 'amount': '125.50', 'date': date.today().isoformat(), 'description': 'Test',
+                }), 302)
+        self.assertQueriesForBothDatasets(9, request, target=lambda user: Category.objects.filter(user=user).first())
+
+    def test_add_category(self):
+        def request(user, obj):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:add_category'), {
+                    'name': 'Pets', 'description': '', 'is_fixed_expense': '',
+                }), 302)
+        self.assertQueriesForBothDatasets(4, request)
+
+    def test_add_income_page(self):
+        self.assertQueriesForBothDatasets(2, lambda user, obj: self.assertStatus(self.client.get(reverse('tracker:add_income'))))
+
+    def test_add_income(self):
+        def request(user, obj):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:add_income'), {
+                    'source': 'freelance', 'amount': '5000', 'date': date.today().isoformat(), 'description': '',
+                }), 302)
+        self.assertQueriesForBothDatasets(11, request)
+
+    def test_edit_expense_page(self):
+        def request(user, expense):
+            self.assertStatus(self.client.get(reverse('tracker:edit_expense', args=[expense.id])))
+        self.assertQueriesForBothDatasets(4, request, target=lambda user: Expense.objects.filter(user=user).first())
+
+    def test_edit_expense(self):
+        def request(user, expense):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:edit_expense', args=[expense.id]), {
+                    'category': expense.category_id, 'amount': expense.amount,
+                    'date': expense.date.isoformat(), 'description': 'Renamed',
+                }), 302)
+        self.assertQueriesForBothDatasets(8, request, target=lambda user: Expense.objects.filter(user=user).first())
+
+    def test_delete_expense_page(self):
+        def request(user, expense):
+            self.assertStatus(self.client.get(reverse('tracker:delete_expense', args=[expense.id])))
+        self.assertQueriesForBothDatasets(4, request, target=lambda user: Expense.objects.filter(user=user).first())
+
+    def test_delete_expense(self):
+        def request(user, expense):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:delete_expense', args=[expense.id])), 302)
+        # The largest expense is its bucket's maximum, so the bucket is rebuilt from raw rows
+        self.assertQueriesForBothDatasets(
+            10, request, target=lambda user: Expense.objects.filter(user=user).order_by('-amount').first()
+        )
+
+    def test_edit_category(self):
+        def request(user, category):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:edit_category', args=[category.id]), {
+                    'name': category.name, 'description': 'Updated', 'is_fixed_expense': 'on',
+                }), 302)
+        self.assertQueriesForBothDatasets(5, request, target=lambda user: Category.objects.filter(user=user).first())
+
+    def test_delete_category(self):
+        deleted = []
+
+        def request(user, category):
+            deleted.append((category.pk, category.expenses))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:delete_category', args=[category.id])), 302)
+
+        def busiest_category(user):
+            # The large user's has several hundred expenses
+            return Category.objects.filter(user=user).annotate(expenses=Count('expense')).order_by('-expenses').first()
+
+        self.assertQueriesForBothDatasets(12, request, target=busiest_category)
+        ids = [pk for pk, expenses in deleted]
+        self.assertTrue(all(expenses for pk, expenses in deleted))
+        self.assertFalse(Expense.objects.filter(category_id__in=ids).exists())
+        self.assertFalse(MonthlyExpenseRollup.objects.filter(category_id__in=ids).exists())
+
+    def test_edit_income(self):
+        def request(user, income):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:edit_income', args=[income.id]), {
+                    'source': income.source, 'amount': income.amount,
+                    'date': income.date.isoformat(), 'description': 'Updated',
+                }), 302)
+        self.assertQueriesForBothDatasets(6, request, target=lambda user: Income.objects.filter(user=user).first())
+
+    def test_delete_income(self):
+        def request(user, income):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertStatus(self.client.post(reverse('tracker:delete_income', args=[income.id])), 302)
+        self.assertQueriesForBothDatasets(10, request, target=lambda user: Income.objects.filter(user=user).first())
+
+
+class TaxViewQueryTests(QueryCountTestCase):
+    def test_tax_deductions_page(self):
+        self.assertQueriesForBothDatasets(5, lambda user, obj: self.assertStatus(self.client.get(reverse('tracker:tax_deductions'))))
+
+    def test_tax_deductions_page_rejects_invalid_fiscal_year(self):
+        self.client.force_login(self.small_user)
+        default = self.client.get(reverse('tracker:tax_deductions')).context['fiscal_year']
+        for fiscal_year in ('bad', '0000-01', '9999-00', '2024-26'):
+            with self.subTest(fiscal_year=fiscal_year):
+                response = self.client.get(reverse('tracker:tax_deductions'), {'fiscal_year': fiscal_year})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['fiscal_year'], default)
+                self.assertContains(response, 'Invalid fiscal year.')
+
+    def test_add_tax_deduction(self):
+        def request(user, deduction_category):
+            self.assertStatus(self.client.post(reverse('tracker:tax_deductions'), {
+                'deduction_category': deduction_category.id, 'amount': '2000',
+                'fiscal_year': '2024-25', 'date_claimed': '2024-07-01',
+            }), 302)
+        # The form looks the chosen category up and the model checks it exists, as for any foreign key
+        self.assertQueriesForBothDatasets(7, request, target=lambda user: DeductionCategory.objects.first())
+
+    def test_edit_tax_deduction(self):
+        def request(user, deduction):
+            self.assertStatus(self.client.post(reverse('tracker:edit_tax_deduction', args=[deduction.id]), {
+                'deduction_category': deduction.deduction_category_id, 'amount': '3000',
+                'fiscal_year': '2024-25', 'date_claimed': '2024-07-01',
+            }), 302)
+        self.assertQueriesForBothDatasets(8, request, target=lambda user: TaxDeduction.objects.filter(user=user).first())
+
+    def test_delete_tax_deduction(self):
+        def request(user, deduction):
+            self.assertStatus(self.client.post(reverse('tracker:delete_tax_deduction', args=[deduction.id])), 302)
+        self.assertQueriesForBothDatasets(4, request, target=lambda user: TaxDeduction.objects.filter(user=user).first())
+
+    def test_deduction_headroom_is_one_query(self):
+        for user, claimed in ((self.small_user, Decimal('1000')), (self.large_user, Decimal('12000'))):
+            with self.subTest(user=user.username), self.assertNumQueries(1):
+                headroom = compute_deduction_headroom(user.id, '2024-25')
+            section = headroom['sections'][0]
+            self.assertEqual(section['claimed'], claimed)
+            self.assertEqual(section['verified'], 0)
+            self.assertEqual(section['remaining'], Decimal('150000') - claimed)
+            self.assertEqual(len(section['categories']), 3)
+
+    def test_deduction_over_remaining_headroom_rejected(self):
+        self.client.force_login(self.large_user)
+        category = DeductionCategory.objects.get(name='PPF')
+        data = {'deduction_category': category.id, 'fiscal_year': '2024-25', 'date_claimed': '2024-07-01'}
+        response = self.client.post(reverse('tracker:tax_deductions'), dict(data, amount='140000'))
+        self.assertContains(response, 'Only ₹138,000.00 of the ₹150,000.00 section 80C limit is left in 2024-25')
+
+        # Editing a deduction frees up its own amount
+        deduction = TaxDeduction.objects.filter(user=self.large_user, deduction_category=category).first()
+        response = self.client.post(reverse('tracker:edit_tax_deduction', args=[deduction.id]), dict(data, amount='139000'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_deduction_form_reads_reference_data_from_memory(self):
+        category = DeductionCategory.objects.get(name='PPF')
+        data = {'deduction_category': category.id, 'amount': '1000', 'fiscal_year': '2024-25', 'date_claimed': '2024-07-01'}
+        with self.assertNumQueries(0):  # Choices come from memory
+            self.assertIn('80C - PPF', TaxDeductionForm(user=self.small_user, tax_profile=None).as_p())
+        with self.assertNumQueries(3):  # The category lookup, its foreign key check and the user's headroom
+            form = TaxDeductionForm(data, user=self.small_user, tax_profile=None)
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['deduction_category'].max_limit, Decimal('150000'))
+        missing = TaxDeductionForm(dict(data, deduction_category=0), user=self.small_user, tax_profile=None)
+        self.assertIn('deduction_category', missing.errors)
+
+        # Saving a category, as the admin does, makes the next lookup reload the tables
+        category.name = 'Public Provident Fund'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        self.assertIn('80C - Public Provident Fund', TaxDeductionForm(user=self.small_user, tax_profile=None).as_p())
+
+    def test_tax_profile_page(self):
+        self.assertQueriesForBothDatasets(3, lambda user, obj: self.assertStatus(self.client.get(reverse('tracker:tax_profile'))))
+
+
+class BudgetAnalyzerPerformanceTests(QueryCountTestCase):
+    def test_query_counts_do_not_grow_with_data(self):
+        for method, expected in (
+            ('get_category_statistics', 1),
+            ('analyze_spending_patterns', 1),
+            ('predict_future_expenses', 2),
+            ('generate_recommendations', 2),
+        ):
+            for user in (self.small_user, self.large_user):
+                with self.subTest(method=method, user=user.username), self.assertNumQueries(expected):
+                    getattr(BudgetAnalyzer(user), method)()
+
+    def test_full_pipeline_time(self):
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            analyzer = BudgetAnalyzer(self.large_user)
+            analyzer.predict_future_expenses()
+            analyzer.generate_recommendations()
+            timings.append(time.perf_counter() - started)
+        self.assertLess(min(timings), ANALYZER_TIME_LIMIT)
+
+
+@override_settings(BUDGET_FORECAST={'GROWTH_RATE': 0.02, 'ALPHA': 0.5})
+class ForecastingTests(SimpleTestCase):
+    # Four months of history: a fixed expense, a rising variable one, one that only
+    # started last month, and one with no spending at all
+    HISTORY = np.array([
+        [100.0, 100.0, 100.0, 100.0],
+        [0.0, 10.0, 20.0, 30.0],
+        [0.0, 0.0, 0.0, 50.0],
+        [0.0, 0.0, 0.0, 0.0],
+    ])
+    FIXED = np.array([True, False, False, False])
+
+    def forecast(self, name, history=HISTORY, fixed=FIXED, horizon=2):
+        return get_forecaster(name).forecast(history, horizon, fixed)
+
+    def test_mean(self):
+        np.testing.assert_allclose(self.forecast('mean'), [
+            [100.0, 100.0],  # Fixed expenses do not grow
+            [20.4, 20.8],  # Averaged over the three months since it started
+            [51.0, 52.0],
+            [0.0, 0.0],
+        ])
+
+    def test_exponential_smoothing(self):
+        np.testing.assert_allclose(self.forecast('exponential_smoothing'), [
+            [100.0, 100.0],
+            [22.5, 22.5],  # Seeded with 10, then smoothed with 20 and 30
+            [50.0, 50.0],
+            [0.0, 0.0],
+        ])
+
+    def test_linear_trend(self):
+        np.testing.assert_allclose(self.forecast('linear_trend'), [
+            [100.0, 100.0],
+            [40.0, 50.0],
+            [50.0, 50.0],  # A single month has no trend
+            [0.0, 0.0],
+        ])
+        # A falling trend stops at zero
+        falling = np.array([[30.0, 20.0, 10.0]])
+        np.testing.assert_allclose(self.forecast('linear_trend', falling, np.array([False]), horizon=3), [[0.0, 0.0, 0.0]])
+
+    def test_single_month_of_history(self):
+        history = np.array([[80.0], [0.0]])
+        fixed = np.array([False, True])
+        expected = {
+            'mean': [[81.6, 83.2], [0.0, 0.0]],
+            'exponential_smoothing': [[80.0, 80.0], [0.0, 0.0]],
+            'linear_trend': [[80.0, 80.0], [0.0, 0.0]],
+        }
+        for name in FORECASTERS:
+            with self.subTest(model=name):
+                np.testing.assert_allclose(self.forecast(name, history, fixed), expected[name])
+
+    def test_unknown_model(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_forecaster('arima')
+
+
+class AdminChangelistQueryTests(QueryCountTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff_user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff_user)
+
+    def test_changelists_scoped_to_a_user(self):
+        for name, expected in (('expense', 6), ('income', 5)):
+            for user in (self.small_user, self.large_user):
+                url = reverse(f'admin:tracker_{name}_changelist')
+                with self.subTest(changelist=name, user=user.username), self.assertNumQueries(expected):
+                    self.assertStatus(self.client.get(url, {'user__id__exact': user.id}))
+
+    def test_category_filter_lists_only_the_users_categories(self):
+        url = reverse('admin:tracker_expense_changelist')
+        for user, categories in ((self.small_user, 3), (self.large_user, 12)):
+            filter_spec = self.client.get(url, {'user__id__exact': user.id}).context['cl'].filter_specs[0]
+            self.assertEqual(len(filter_spec.lookup_choices), categories)
+        # Unscoped, the filter has no choices and is left out
+        self.assertNotIn('category', [spec.title for spec in self.client.get(url).context['cl'].filter_specs])
+
+    def test_period_filter_drills_down_from_rollups(self):
+        url = reverse('admin:tracker_expense_changelist')
+        expense = Expense.objects.filter(user=self.large_user).order_by('date').first()
+        period = f'{expense.date.year}-{expense.date.month:02d}'
+        response = self.client.get(url, {'user__id__exact': self.large_user.id, 'period': period})
+        choices = dict(response.context['cl'].filter_specs[1].lookup_choices)
+        self.assertIn(str(expense.date.year), choices)
+        self.assertIn(period, choices)
+        self.assertEqual(response.context['cl'].result_count, Expense.objects.filter(
+            user=self.large_user, date__year=expense.date.year, date__month=expense.date.month
+        ).count())
+
+    def test_count_estimated_past_the_exact_limit(self):
+        last_id = Expense.objects.order_by('-id').values_list('id', flat=True).first()
+        paginator = EstimatedCountPaginator(Expense.objects.order_by('-id'), 100)
+        paginator.exact_count_limit = 50
+        with self.assertNumQueries(2):  # The bounded count and the table estimate
+            self.assertEqual(paginator.count, last_id)
+
+        filtered = EstimatedCountPaginator(Expense.objects.filter(user=self.large_user).order_by('-pk'), 100)
+        filtered.exact_count_limit = 50
+        self.assertEqual(filtered.count, 51)
+
+
+class RollupMaintenanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rollups', password='pass')
+        self.category = Category.objects.create(user=self.user, name='Food')
+
+    def add_expenses(self, *amounts, day=date(2024, 5, 10)):
+        return [
+            Expense.objects.create(user=self.user, category=self.category, amount=Decimal(amount), date=day)
+            for amount in amounts
+        ]
+
+    def assertBucket(self, month, total, count, min_amount, max_amount):
+        bucket = MonthlyExpenseRollup.objects.get(user=self.user, category=self.category, year=2024, month=month)
+        self.assertEqual(
+            (bucket.total, bucket.count, bucket.min_amount, bucket.max_amount),
+            (Decimal(total), count, Decimal(min_amount), Decimal(max_amount)),
+        )
+        amounts = Expense.objects.filter(user=self.user, date__month=month).values_list('amount', flat=True)
+        self.assertAlmostEqual(bucket.sum_squares, sum(float(amount) ** 2 for amount in amounts))
+
+    def test_amount_edit_within_a_bucket(self):
+        first, second = self.add_expenses('200', '200')
+        first.amount = Decimal('300')
+        first.save()
+        self.assertBucket(5, '500', 2, '200', '300')
+
+        # Neither the old nor the new amount is an extreme
+        middle = self.add_expenses('250')[0]
+        middle.amount = Decimal('260')
+        middle.save()
+        self.assertBucket(5, '760', 3, '200', '300')
+
+    def test_amount_edit_of_a_single_row(self):
+        expense = self.add_expenses('100')[0]
+        expense.amount = Decimal('120')
+        expense.save()
+        self.assertBucket(5, '120', 1, '120', '120')
+
+    def test_edit_moving_a_row_to_another_month(self):
+        expense, _ = self.add_expenses('100', '50')
+        expense.date = date(2024, 6, 1)
+        expense.amount = Decimal('80')
+        expense.save()
+        self.assertBucket(5, '50', 1, '50', '50')
+        self.assertBucket(6, '80', 1, '80', '80')
+
+
+class MonthlySeriesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('series_user', password='pass')
+        food = Category.objects.create(user=self.user, name='Food')
+        rent = Category.objects.create(user=self.user, name='Rent', is_fixed_expense=True)
+        for category, amount, day in ((food, '100', date(2023, 11, 3)), (food, '50', date(2024, 1, 9)),
+                                      (rent, '900', date(2024, 1, 1)), (food, '75', date(2024, 4, 1))):
+            Expense.objects.create(user=self.user, category=category, amount=Decimal(amount), date=day)
+        Income.objects.create(user=self.user, amount=Decimal('5000'), date=date(2023, 12, 1), source='salary')
+
+    def test_missing_months_are_zero(self):
+        with self.assertNumQueries(1):
+            series = monthly_series(self.user, date(2023, 11, 20), date(2024, 2, 10), by_category=True)
+        self.assertEqual([(entry['year'], entry['month']) for entry in series], [(2023, 11), (2023, 12), (2024, 1), (2024, 2)])
+        self.assertEqual(series[1]['label'], 'December 2023')
+        self.assertEqual([entry['total'] for entry in series], [Decimal('100'), 0, Decimal('950'), 0])
+        self.assertEqual([entry['categories'] for entry in series], [
+            {'Food': Decimal('100')}, {}, {'Food': Decimal('50'), 'Rent': Decimal('900')}, {},
+        ])
+
+        income = monthly_series(self.user, date(2023, 11, 1), date(2024, 1, 31), model=Income)
+        self.assertEqual([entry['total'] for entry in income], [0, Decimal('5000'), 0])
+        self.assertNotIn('categories', income[0])
+
+
+class SyncRowsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sync_user', password='pass')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.rent = Category.objects.create(user=self.user, name='Rent', is_fixed_expense=True)
+
+    def sync(self, amounts):
+        desired = [
+            BudgetRecommendation(
+                user=self.user, category=category, recommendation_type='reduce', priority='medium',
+                # More decimals than the column keeps, as the analyzer's Decimal arithmetic produces
+                current_amount=amount, recommended_amount=amount * Decimal('0.8'),
+                potential_savings=amount * Decimal('0.2'), reason=f'Spending in {category.name}',
+            )
+            for category, amount in amounts.items()
+        ]
+        return sync_rows(
+            BudgetRecommendation.objects.filter(user=self.user), desired,
+            key_fields=('category_id', 'recommendation_type'),
+            compare_fields=('priority', 'current_amount', 'recommended_amount', 'potential_savings', 'reason'),
+        )
+
+    def stored(self):
+        return {
+            row.category_id: row
+            for row in BudgetRecommendation.objects.filter(user=self.user)
+        }
+
+    def test_identical_sync_writes_nothing(self):
+        amounts = {self.food: Decimal('1234.567'), self.rent: Decimal('20000')}
+        self.assertEqual(self.sync(amounts), {'created': 2, 'updated': 0, 'deleted': 0})
+        BudgetRecommendation.objects.filter(category=self.food).update(implemented=True)
+        before = {category_id: row.pk for category_id, row in self.stored().items()}
+
+        with self.assertNumQueries(1):  # Reading the stored rows
+            self.assertEqual(self.sync(amounts), {'created': 0, 'updated': 0, 'deleted': 0})
+        stored = self.stored()
+        self.assertEqual({category_id: row.pk for category_id, row in stored.items()}, before)
+        self.assertTrue(stored[self.food.id].implemented)
+
+    def test_changed_rows_keep_their_id_and_flag(self):
+        self.sync({self.food: Decimal('1000'), self.rent: Decimal('20000')})
+        BudgetRecommendation.objects.filter(category=self.food).update(implemented=True)
+        food_id = self.stored()[self.food.id].pk
+
+        self.assertEqual(self.sync({self.food: Decimal('1500')}), {'created': 0, 'updated': 1, 'deleted': 1})
+        stored = self.stored()
+        self.assertEqual(list(stored), [self.food.id])
+        self.assertEqual(stored[self.food.id].pk, food_id)
+        self.assertTrue(stored[self.food.id].implemented)
+        self.assertEqual(stored[self.food.id].current_amount, Decimal('1500'))
+
+
+class OnCommitOnceTests(TestCase):
+    def test_one_callback_per_key(self):
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for _ in range(3):
+                on_commit_once(('bump', 1), lambda: calls.append(1))
+            on_commit_once(('bump', 2), lambda: calls.append(2))
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(calls, [1, 2])
+
+    def test_key_queued_in_a_rolled_back_savepoint_is_queued_again(self):
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    on_commit_once(('bump', 1), lambda: calls.append('rolled back'))
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            on_commit_once(('bump', 1), lambda: calls.append('committed'))
+        self.assertEqual(calls, ['committed'])
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied_on_connect_and_reported(self):
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        diagnostics = self.client.get(reverse('tracker:database_diagnostics')).json()
+        self.assertEqual(diagnostics['active']['busy_timeout'], 5000)
+        self.assertEqual(diagnostics['active']['cache_size'], -20000)
+        self.assertEqual(diagnostics['active']['temp_store'], 2)
+        # The test database lives in memory, which has no WAL and does not memory-map
+        self.assertEqual(diagnostics['mismatched'], ['journal_mode', 'mmap_size'])
+
+        self.client.force_login(User.objects.create_user('member', password='pass'))
+        self.assertEqual(self.client.get(reverse('tracker:database_diagnostics')).status_code, 302)
+
+    @override_settings(TRACKER_SQLITE={'PRAGMAS': {'synchronous': 'normal; DROP TABLE auth_user'}})
+    def test_invalid_pragma_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            configured_pragmas()
+
+    @override_settings(TRACKER_SQLITE={'PRAGMAS': {'journal_mode': 'wal'}})
+    def test_journal_mode_not_applied_per_connection(self):
+        with self.assertRaises(ImproperlyConfigured):
+            configured_pragmas()
+
+
+@override_settings(CACHES=TEST_CACHES, TRACKER_READ_REPLICA={'ALIAS': 'replica'})
+class ReadReplicaRoutingTests(TestCase):
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        # The test runner mirrors the replica onto the test database; give it a name of its own
+        # so it is routed to. Only routing decisions are checked, so it is never queried.
+        replica_name = mock.patch.dict(connections['replica'].settings_dict, NAME='replica-under-test')
+        replica_name.start()
+        self.addCleanup(replica_name.stop)
+
+    def test_reporting_reads_use_replica_until_a_write(self):
+        router = ReadReplicaRouter()
+        with request_scope():
+            self.assertEqual(router.db_for_read(Expense), 'default')
+            with reporting_reads():
+                self.assertEqual(router.db_for_read(Expense), 'replica')
+                self.assertEqual(router.db_for_write(Expense), 'default')
+                self.assertEqual(router.db_for_read(Expense), 'default')
+        with request_scope(pinned=True), reporting_reads():
+            self.assertEqual(router.db_for_read(Expense), 'default')
+
+    def test_bookkeeping_writes_do_not_pin(self):
+        router = ReadReplicaRouter()
+        with request_scope(), reporting_reads():
+            for model in (Session, AnalysisJob, User):
+                with self.subTest(model=model.__name__):
+                    self.assertEqual(router.db_for_write(model), 'default')
+                    self.assertEqual(router.db_for_read(Expense), 'replica')
+
+        User.objects.create_user('replica_login', password='pass')
+        response = self.client.post(reverse('login'), {'username': 'replica_login', 'password': 'pass'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('tracker_primary', response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        user = User.objects.create_user('replica_user', password='pass')
+        category = Category.objects.create(user=user, name='Food')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('tracker:add_expense'))
+        self.assertNotIn('tracker_primary', response.cookies)
+        response = self.client.post(reverse('tracker:add_expense'), {
+            'category': category.id, 'amount': '125.50', 'date': date.today().isoformat(), 'description': 'Test',
+        })
+        self.assertEqual(response.cookies['tracker_primary']['max-age'], 30)
+
+        # The cookie sends the redirected request's reporting reads to the primary, which the test can query
+        self.assertEqual(self.client.get(reverse('tracker:financial_summary')).status_code, 200)
+
+    @contextmanager
+    def copy_stubbed(self):
+        # Backing up the test database from inside its own transaction would wait forever
+        primary = mock.Mock()
+        with mock.patch('tracker.services.replica.sqlite3.connect'), \
+                mock.patch.object(connections['default'], 'connection', primary):
+            yield primary.backup
+
+    def test_replica_read_only_while_recently_refreshed(self):
+        self.assertFalse(replica_is_current())
+        with self.copy_stubbed() as backup:
+            self.assertTrue(refresh_replica())
+        backup.assert_called_once()
+        self.assertTrue(replica_is_current())
+        with mock.patch('tracker.services.replica.time.time', return_value=time.time() + 31):
+            self.assertFalse(replica_is_current())
+
+    def test_failed_refresh_falls_back_to_primary(self):
+        error = sqlite3.OperationalError('unable to open database file')
+        with mock.patch('tracker.services.replica.sqlite3.connect', side_effect=error), \
+                self.assertLogs('tracker.services.replica', 'ERROR'):
+            self.assertFalse(refresh_replica())
+        self.assertFalse(replica_is_current())
+        # The lock is released for the next attempt
+        with self.copy_stubbed():
+            self.assertTrue(refresh_replica())
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('storage_user', password='pass')
+        section = DeductionSection.objects.create(section_code='80C', name='Section 80C', max_limit=Decimal('150000'))
+        category = DeductionCategory.objects.create(section=section, name='PPF', max_limit=Decimal('150000'))
+        self.deductions = [
+            TaxDeduction.objects.create(
+                user=self.user, deduction_category=category, amount=Decimal('1000'),
+                fiscal_year='2024-25', date_claimed=date(2024, 7, 1),
+            )
+            for _ in range(3)
+        ]
+
+    def upload(self, deduction, content):
+        deduction.proof_document.save('receipt.pdf', ContentFile(content), save=True)
+        return deduction.proof_document.name
+
+    def references(self, name):
+        return StoredFile.objects.filter(name=name).values_list('references', flat=True).first()
+
+    def test_identical_uploads_share_one_file(self):
+        names = {self.upload(deduction, b'same receipt') for deduction in self.deductions}
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertRegex(name, r'^tax_proofs/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$')
+        self.assertEqual(self.references(name), 3)
+
+        stats = content_storage.stats()
+        self.assertEqual((stats['files'], stats['reference_count']), (1, 3))
+        self.assertEqual(stats['dedup_ratio'], 3.0)
+
+    def test_file_removed_with_its_last_reference(self):
+        for deduction in self.deductions[:2]:
+            name = self.upload(deduction, b'shared receipt')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.deductions[0].delete()
+        self.assertEqual(self.references(name), 1)
+        self.assertTrue(content_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.deductions[1], b'replacement receipt')
+        self.assertIsNone(self.references(name))
+        self.assertFalse(content_storage.exists(name))
+
+    def test_upload_keeps_its_file_until_the_row_is_saved(self):
+        name = self.upload(self.deductions[0], b'receipt')
+        # The same bytes uploaded for another row, which is not saved yet
+        self.deductions[1].proof_document.save('receipt.pdf', ContentFile(b'receipt'), save=False)
+        self.assertEqual(self.references(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.deductions[0].delete()
+        self.assertTrue(content_storage.exists(name))
+        self.deductions[1].save()
+        self.assertEqual(self.references(name), 1)
+
+    def test_failed_save_gives_back_its_upload_reference(self):
+        orphan = TaxDeduction(
+            deduction_category=self.deductions[0].deduction_category, amount=Decimal('1000'),
+            fiscal_year='2024-25', date_claimed=date(2024, 7, 1),
+        )
+        with self.assertRaises(IntegrityError):
+            orphan.proof_document.save('receipt.pdf', ContentFile(b'orphan receipt'), save=True)
+        self.assertIsNone(self.references(orphan.proof_document.name))
+
+        # Uploaded while the row is written, as a form does
+        orphan.proof_document = ContentFile(b'orphan receipt', name='receipt.pdf')
+        with self.assertRaises(IntegrityError):
+            orphan.save()
+        self.assertIsNone(self.references(orphan.proof_document.name))
+
+        # Saved properly, the row takes one reference and nothing is left over
+        orphan.user = self.user
+        orphan.save()
+        self.assertEqual(self.references(orphan.proof_document.name), 1)
+
+    def test_upload_reference_belongs_to_its_own_row(self):
+        first, second = self.deductions[:2]
+        first.proof_document.save('receipt.pdf', ContentFile(b'receipt'), save=False)
+        name = first.proof_document.name
+        # Pointed at the same name without an upload, so it takes a reference of its own
+        second.proof_document = name
+        second.save()
+        self.assertEqual(self.references(name), 2)
+        first.save()
+        self.assertEqual(self.references(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            second.delete()
+        self.assertFalse(content_storage.exists(name))
+
+    def test_migration_counts_existing_references(self):
+        name = self.upload(self.deductions[0], b'receipt')
+        TaxDeduction.objects.filter(pk=self.deductions[1].pk).update(proof_document=name)
+        StoredFile.objects.all().delete()
+
+        count_references = import_module('tracker.migrations.0009_stored_file_references').count_references
+        count_references(django_apps, mock.Mock(connection=connections['default']))
+        self.assertEqual(self.references(name), 2)
+
+    def test_generate_test_documents_rerun_reuses_files(self):
+        def generate():
+            out = StringIO()
+            call_command('generate_test_documents', workers=1, stdout=out)
+            return out.getvalue()
+
+        def stored_files():
+            return sorted(os.path.join(root, name) for root, _, names in os.walk(settings.MEDIA_ROOT) for name in names)
+
+        # The three claims share a user and layout, so their receipts are identical
+        self.assertIn('1 written, 2 reused', generate())
+        files = stored_files()
+        names = set(TaxDeduction.objects.values_list('proof_document', flat=True))
+        self.assertEqual(len(files), 1)
+        self.assertEqual(len(names), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIn('0 written, 3 reused', generate())
+        self.assertEqual(stored_files(), files)
+        self.assertEqual(set(TaxDeduction.objects.values_list('proof_document', flat=True)), names)
+        self.assertEqual(self.references(names.pop()), 3)
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_reupload_of_same_content_keeps_count(self):
+        name = self.upload(self.deductions[0], b'receipt')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.deductions[0], b'receipt')
+        self.assertEqual(self.references(name), 1)
+        self.assertTrue(content_storage.exists(name))
+
+
+@override_settings(CACHES=TEST_CACHES, TRACKER_QUERY_INSTRUMENTATION=TEST_QUERY_INSTRUMENTATION)
+class TaxEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        old = TaxRegime.objects.create(name='Old', description='Old regime')
+        new = TaxRegime.objects.create(name='New', description='New regime')
+        for regime, slabs in ((old, SetupTestDataCommand.TAX_SLABS['Old']), (new, SetupTestDataCommand.TAX_SLABS['New'])):
+            for low, high, rate, surcharge in slabs:
+                TaxSlab.objects.create(
+                    regime=regime, min_amount=low, max_amount=high, tax_rate=rate, surcharge_rate=surcharge
+                )
+
+        section_80c = DeductionSection.objects.create(
+            section_code='80C', name='Investments', description='80C', max_limit=Decimal('150000')
+        )
+        section_80d = DeductionSection.objects.create(
+            section_code='80D', name='Health Insurance', description='80D', max_limit=Decimal('25000')
+        )
+        ppf = DeductionCategory.objects.create(section=section_80c, name='PPF', description='', max_limit=Decimal('150000'))
+        health = DeductionCategory.objects.create(section=section_80d, name='Health', description='', max_limit=Decimal('25000'))
+
+        cls.users = []
+        for index, monthly_income in enumerate((50000, 100000, 500000)):
+            user = User.objects.create_user(f'tax_{index}', password='pass')
+            for month in range(1, 13):
+                year = 2024 if month >= 4 else 2025
+                Income.objects.create(user=user, amount=Decimal(monthly_income), date=date(year, month, 5))
+            cls.users.append(user)
+
+        # 80C over its limit, 80D within it, and an unverified claim that must be ignored
+        for category, amount, status in ((ppf, '200000', 'verified'), (health, '20000', 'verified'), (health, '5000', 'pending')):
+            TaxDeduction.objects.create(
+                user=cls.users[1], deduction_category=category, amount=Decimal(amount),
+                fiscal_year='2024-25', date_claimed=date(2024, 7, 1), verification_status=status,
+            )
+
+    def setUp(self):
+        analytics_cache.clear_local()
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        reference_data.invalidate()
+        reference_data.get()
+
+    def test_slab_evaluation(self):
+        evaluated = compiled_regimes()['old'].evaluate([0, 500000, 1000000, 6000000])
+        self.assertEqual(list(evaluated['tax']), [0, 12500, 112500, 1612500])
+        self.assertEqual(list(evaluated['surcharge']), [0, 0, 0, 161250])
+        self.assertEqual(list(evaluated['total']), [0, 13000, 117000, 1844700])
+
+    def test_deductions_capped_per_section_and_regime(self):
+        results = compute_liabilities('2024-25')
+        regimes = results[self.users[1].id]['regimes']
+        self.assertEqual(regimes['old']['deductions'], 170000)
+        self.assertEqual(regimes['old']['taxable_income'], 1200000 - 170000)
+        self.assertEqual(regimes['new']['deductions'], 0)
+        self.assertEqual(results[self.users[1].id]['better_regime'], 'new')
+
+    def test_batch_query_count_is_constant(self):
+        compiled_regimes()
+        with self.assertNumQueries(2):
+            results = compute_liabilities('2024-25')
+        self.assertEqual(set(results), {user.id for user in self.users})
+
+    def test_slab_change_recompiles(self):
+        self.assertEqual(compiled_regimes()['new'].evaluate([500000])['tax'][0], 10000)
+        slab = TaxSlab.objects.get(regime__name='New', min_amount=300000)
+        slab.tax_rate = 10
+        with self.captureOnCommitCallbacks(execute=True):
+            slab.save()
+        self.assertEqual(compiled_regimes()['new'].evaluate([500000])['tax'][0], 20000)
+
+    def test_setup_test_data_slabs_reach_the_compiled_regimes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TaxSlab.objects.filter(regime__name='New').delete()
+        self.assertNotIn('new', compiled_regimes())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SetupTestDataCommand()._create_tax_regimes()
+        self.assertEqual(compiled_regimes()['new'].evaluate([500000])['tax'][0], 10000)
+
+    def test_category_newer_than_the_snapshot(self):
+        section = DeductionSection.objects.get(section_code='80D')
+        # Saved without running the on-commit invalidation, as by another worker whose commit is not seen yet
+        category = DeductionCategory.objects.create(section=section, name='Checkup', description='', max_limit=Decimal('5000'))
+        TaxDeduction.objects.create(
+            user=self.users[0], deduction_category=category, amount=Decimal('4000'),
+            fiscal_year='2024-25', date_claimed=date(2024, 7, 1), verification_status='verified',
+        )
+        self.assertEqual(capped_deductions('2024-25')[self.users[0].id]['old'], 0)
+
+        # Once the other worker has bumped the shared version, the miss reloads the snapshot
+        reference_data.backend.set(REFERENCE_DATA_VERSION_KEY, time.time_ns(), None)
+        self.assertEqual(capped_deductions('2024-25')[self.users[0].id]['old'], 4000)
+
+    def test_regime_grid_limits_extra_deductions_to_headroom(self):
+        grid = regime_grid(self.users[0].id, '2024-25')
+        self.assertEqual(grid['extra_deductions'][0], 0)
+        self.assertEqual(grid['extra_deductions'][-1], 150000)
+        old, new = grid['regimes']['old']['totals'], grid['regimes']['new']['totals']
+        self.assertLess(old[-1], old[0])
+        self.assertEqual(len(set(new)), 1)  # 80C does not apply to the new regime
+
+        # The second user's verified 80C claims already exceed the limit
+        grid = regime_grid(self.users[1].id, '2024-25')
+        self.assertEqual(grid['headroom'], 0)
+        self.assertEqual(len(set(grid['regimes']['old']['totals'])), 1)
+
+    def test_regime_comparison_cached_until_deductions_change(self):
+        user = self.users[0]
+        self.client.force_login(user)
+        url = reverse('tracker:regime_comparison_data') + '?fiscal_year=2024-25'
+        first = self.client.get(url).json()
+        with self.assertNumQueries(2):  # Session and user only
+            self.assertEqual(self.client.get(url).json(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaxDeduction.objects.create(
+                user=user, deduction_category=DeductionCategory.objects.get(name='PPF'), amount=Decimal('150000'),
+                fiscal_year='2024-25', date_claimed=date(2024, 7, 1), verification_status='verified',
+            )
+        updated = self.client.get(url).json()
+        self.assertEqual(updated['headroom'], 0)
+        self.assertLess(updated['regimes']['old']['totals'][0], first['regimes']['old']['totals'][0])
+
+    def test_regime_comparison_page(self):
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse('tracker:regime_comparison'), {'fiscal_year': '2024-25'})
+        self.assertContains(response, 'id="regime-grid"')
+        for fiscal_year in ('bad', '0000-01', '9999-00', '2024-26'):
+            with self.subTest(fiscal_year=fiscal_year):
+                data = self.client.get(reverse('tracker:regime_comparison_data'), {'fiscal_year': fiscal_year})
+                self.assertEqual(data.status_code, 400)
+                page = self.client.get(reverse('tracker:regime_comparison'), {'fiscal_year': fiscal_year})
+                self.assertRedirects(page, reverse('tracker:regime_comparison'))
+
+    def test_regime_comparison_follows_deduction_limit_changes(self):
+        user = self.users[0]
+        self.client.force_login(user)
+        url = reverse('tracker:regime_comparison_data') + '?fiscal_year=2024-25'
+        self.assertEqual(self.client.get(url).json()['headroom'], 150000)
+
+        section = DeductionSection.objects.get(section_code='80C')
+        section.max_limit = Decimal('100000')
+        with self.captureOnCommitCallbacks(execute=True):
+            section.save()
+        reference_data.get()  # Reload outside the request's query budget
+        self.assertEqual(self.client.get(url).json()['headroom'], 100000)
+
+
+class ManagementCommandTests(TestCase):
+    def test_recompute_all_rejects_impossible_since(self):
+        for since in ('2024-02-30', '2024-02-30 10:00', '99999999d', 'yesterday'):
+            with self.subTest(since=since), self.assertRaisesMessage(CommandError, 'Invalid --since value'):
+                call_command('recompute_all', since=since, workers=1, stdout=StringIO())
+
+
+class ExpenseImporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('import_user', password='pass')
+        self.food = Category.objects.create(user=self.user, name='Food')
+
+    def expenses(self):
+        return sorted(
+            (expense.date, expense.category.name, expense.amount, expense.description)
+            for expense in Expense.objects.filter(user=self.user).select_related('category')
+        )
+
+    def test_wide_layout(self):
+        lines = [
+            'Month,Food,Rent,Total',
+            '1,100,900,1000',
+            '2,50,,50',  # Nothing spent on rent
+            '3,0,"1,200.50",1200.50',
+            'x,10,20,30',
+            '4,10,abc,10',  # A bad cell skips the whole row
+        ]
+        importer = ExpenseImporter(self.user, mapping={'start_month': '2024-11'}, chunk_size=2)
+        stats = importer.import_file(lines)
+
+        self.assertEqual(self.expenses(), [
+            (date(2024, 11, 1), 'Food', Decimal('100.00'), ''),
+            (date(2024, 11, 1), 'Rent', Decimal('900.00'), ''),
+            (date(2024, 12, 1), 'Food', Decimal('50.00'), ''),
+            (date(2025, 1, 1), 'Rent', Decimal('1200.50'), ''),
+        ])
+        self.assertEqual(
+            {key: stats[key] for key in ('rows', 'created', 'skipped', 'categories_created')},
+            {'rows': 5, 'created': 4, 'skipped': 2, 'categories_created': 1},
+        )
+        self.assertEqual(len(importer.errors), 2)
+        self.assertTrue(importer.errors[0].startswith('Line 5: '))
+        self.assertIn("invalid amount 'abc'", importer.errors[1])
+        # The rollups are rebuilt from the bulk-created rows
+        self.assertEqual(MonthlyExpenseRollup.objects.filter(user=self.user).count(), 4)
+
+    def test_long_layout_through_the_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        csv_path, mapping_path = f'{directory}/expenses.csv', f'{directory}/mapping.json'
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write(
+                'Date,Category,Amount,Note\n'
+                '05/01/2024,Food,120.40,Groceries\n'
+                '06/01/2024,Travel,80,Bus pass\n'
+                '31/02/2024,Food,10,Impossible date\n'
+                '07/01/2024,,15,No category\n'
+                '08/01/2024,Food,-5,Refund\n'
+            )
+        with open(mapping_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'date_column': 'Date', 'date_format': '%d/%m/%Y', 'category_column': 'Category',
+                'amount_column': 'Amount', 'description_column': 'Note',
+            }, f)
+
+        out = StringIO()
+        call_command('import_expenses', csv_path, user=self.user.username, mapping=mapping_path, stdout=out)
+        self.assertEqual(self.expenses(), [
+            (date(2024, 1, 5), 'Food', Decimal('120.40'), 'Groceries'),
+            (date(2024, 1, 6), 'Travel', Decimal('80.00'), 'Bus pass'),
+        ])
+        output = out.getvalue()
+        self.assertIn('5 CSV rows, 2 skipped, 1 new categories', output)
+        self.assertIn('Line 4:', output)
+        self.assertIn('Line 5: missing category', output)
+
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('Date,Amount\n05/01/2024,10\n')
+        with self.assertRaisesMessage(CommandError, 'CSV is missing column(s): Category, Note'):
+            call_command('import_expenses', csv_path, user=self.user.username, mapping=mapping_path, stdout=out)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('export_user', password='pass')
+        food = Category.objects.create(user=self.user, name='Food')
+        rent = Category.objects.create(user=self.user, name='Rent', is_fixed_expense=True)
+        for category, amount, day in ((food, '120.40', date(2024, 1, 5)), (rent, '900', date(2024, 2, 1)),
+                                      (food, '35.10', date(2024, 3, 9)), (food, '60', date(2024, 4, 2))):
+            Expense.objects.create(
+                user=self.user, category=category, amount=Decimal(amount), date=day, description=f'{category.name} "bill"'
+            )
+        for source, amount, day in (('salary', '5000', date(2024, 1, 31)), ('rental', '700', date(2024, 3, 1))):
+            Income.objects.create(user=self.user, source=source, amount=Decimal(amount), date=day)
+
+        other = User.objects.create_user('export_other', password='pass')
+        Expense.objects.create(
+            user=other, category=Category.objects.create(user=other, name='Food'), amount=Decimal('1'), date=date(2024, 2, 2)
+        )
+
+    def exported(self, **filters):
+        return [(record_type, day.isoformat(), category) for record_type, pk, day, category, amount, description
+                in export_rows(self.user, **filters)]
+
+    def test_filters(self):
+        self.assertEqual(self.exported(start_date=date(2024, 2, 1), end_date=date(2024, 3, 1)), [
+            ('expense', '2024-02-01', 'Rent'),
+            ('income', '2024-03-01', 'rental'),
+        ])
+        # Income has no category, so a category filter alone leaves it out, and a source filter expenses
+        self.assertEqual(self.exported(categories=['Food']), [
+            ('expense', '2024-01-05', 'Food'), ('expense', '2024-03-09', 'Food'), ('expense', '2024-04-02', 'Food'),
+        ])
+        self.assertEqual(self.exported(sources=['salary']), [('income', '2024-01-31', 'salary')])
+        self.assertEqual(self.exported(categories=['Rent'], sources=['salary']), [
+            ('expense', '2024-02-01', 'Rent'), ('income', '2024-01-31', 'salary'),
+        ])
+        self.assertEqual(self.exported(types=('income',)), [('income', '2024-01-31', 'salary'), ('income', '2024-03-01', 'rental')])
+
+    def test_csv(self):
+        content = b''.join(export_stream(self.user, start_date=date(2024, 4, 1))).decode('utf-8')
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], list(EXPORT_COLUMNS))
+        self.assertEqual(rows[1][2:], ['2024-04-02', 'Food', '60.00', 'Food "bill"'])
+        self.assertEqual(len(rows), 2)
+
+    def test_gzip_jsonl_round_trip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/export.jsonl.gz'
+        # Several chunks, so the stream is compressed in more than one piece
+        with mock.patch('tracker.services.export.ROWS_PER_WRITE', 2):
+            call_command('export_user_data', user=self.user.username, output=path, format='jsonl', gzip=True,
+                         start='2024-01-01', type='all', stdout=StringIO())
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        expected = [
+            {'type': record_type, 'id': pk, 'date': day.isoformat(), 'category': category,
+             'amount': str(amount), 'description': description}
+            for record_type, pk, day, category, amount, description in export_rows(self.user)
+        ]
+        self.assertEqual(records, expected)
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0]['description'], 'Food "bill"')
+
+        with self.assertRaisesMessage(CommandError, 'YYYY-MM-DD'):
+            call_command('export_user_data', user=self.user.username, output=path, start='2024-02-30', stdout=StringIO())
@@ -20,5 +20,10 @@ urlpatterns = [
     path('income/<int:income_id>/delete/', views.delete_income, name='delete_income'),
     path('tax-deductions/<int:deduction_id>/edit/', views.edit_tax_deduction, name='edit_tax_deduction'),
     path('tax-deductions/<int:deduction_id>/delete/', views.delete_tax_deduction, name='delete_tax_deduction'),
+    path('tax-regimes/', views.regime_comparison, name='regime_comparison'),
+    path('tax-regimes/data/', views.regime_comparison_data, name='regime_comparison_data'),
     path('get-monthly-data/', views.get_monthly_data, name='get_monthly_data'),
+    path('export/', views.export_data, name='export_data'),
+    path('query-stats/', views.query_stats_summary, name='query_stats'),
+    path('db-diagnostics/', views.database_diagnostics, name='database_diagnostics'),
 ] 
\ No newline at end of file
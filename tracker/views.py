@@ -1,41 +1,66 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum
+from django.db import connection
+from django.db.models import Q
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import MAXYEAR, MINYEAR, datetime
 import calendar
 import random
 from decimal import Decimal
 from .models import (
     Category, Expense, BudgetPrediction, UserProfile, Income,
-    TaxDeduction, DeductionCategory, UserTaxProfile, DeductionSection,
-    BudgetRecommendation
+    TaxDeduction, DeductionCategory, UserTaxProfile,
+    BudgetRecommendation, AnalysisJob
 )
 from .forms import (
     ExpenseForm, CategoryForm, UserRegistrationForm, UserProfileForm,
     IncomeForm, TaxDeductionForm, UserTaxProfileForm
 )
-from .services.budget_analysis import BudgetAnalyzer
-from django.http import JsonResponse
+from .services.analytics_cache import analytics_cache
+from .services.deduction_headroom import deduction_headroom
+from .services.export import EXPORT_FORMATS, export_filename, export_stream
+from .services.forecasting import get_forecast_settings
+from .services.jobs import enqueue_recompute
+from .services.query_instrumentation import query_stats
+from .services.reference_data import reference_data
+from .services.replica import read_alias, reporting
+from .services.sqlite_profile import sqlite_diagnostics
+from .services.tax_engine import current_fiscal_year, is_valid_fiscal_year, regime_grid, regimes_fingerprint
+from .services.timeseries import monthly_series, shift_month
+from .signals import purge_category
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 import json
 
 @login_required
+@reporting
 def dashboard(request):
-    # Get current month's expenses
     today = timezone.now()
-    current_month_expenses = Expense.objects.filter(
-        user=request.user,
-        date__year=today.year,
-        date__month=today.month
-    ).select_related('category')
+
+    # Everything below only changes when the user's data does
+    context = analytics_cache.get_or_compute(
+        request.user.id,
+        f'dashboard:{today.year}-{today.month}',
+        lambda: _dashboard_analytics(request.user, today)
+    )
+    return render(request, 'tracker/dashboard.html', context)
+
+def _dashboard_analytics(user, today):
+    """Build the dashboard context for a user; cached by analytics_cache."""
+    # Monthly expense totals for the last 6 calendar months, current month last
+    history_start = datetime(*shift_month(today.year, today.month, -5), 1)
+    expense_series = monthly_series(user, history_start, today, by_category=True)
+    current_month = expense_series[-1]
 
     # Calculate total expenses
-    total_expenses = current_month_expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    total_expenses = current_month['total']
 
     # Get user's income
     try:
-        user_profile = UserProfile.objects.get(user=request.user)
+        user_profile = UserProfile.objects.get(user=user)
         monthly_income = user_profile.monthly_income
     except UserProfile.DoesNotExist:
         monthly_income = Decimal('0')
@@ -47,33 +72,33 @@ def dashboard(request):
         savings_rate = Decimal('0')
 
     # Get expense categories and their totals
-    categories = Category.objects.filter(user=request.user)
     category_totals = []
-    for category in categories:
-        total = current_month_expenses.filter(category=category).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    for name, total in current_month['categories'].items():
         if total > 0:  # Only include categories with expenses
             category_totals.append({
-                'name': category.name,
+                'name': name,
                 'total': total,
                 'percentage': (total / total_expenses * 100) if total_expenses > 0 else Decimal('0')
             })
 
-    # Run budget analysis and get recommendations
-    analyzer = BudgetAnalyzer(request.user)
-    analyzer.predict_future_expenses()
-    analyzer.generate_recommendations()
+    # Predictions and recommendations are computed by the background worker;
+    # queue a first run for users who have never had one
+    analysis_job = AnalysisJob.objects.filter(user=user).first()
+    if analysis_job is None:
+        enqueue_recompute(user.id)
 
     # Get predictions and recommendations
     predictions = BudgetPrediction.objects.filter(
-        user=request.user,
-        month__gt=today.month,
-        year=today.year
+        Q(year=today.year, month__gt=today.month) | Q(year__gt=today.year),
+        user=user
     ).select_related('category').order_by('year', 'month')
+    predictions = list(predictions)  # Evaluated so the results can be cached
 
     recommendations = BudgetRecommendation.objects.filter(
-        user=request.user,
+        user=user,
         implemented=False
     ).select_related('category').order_by('priority', '-potential_savings')[:5]  # Top 5 recommendations
+    recommendations = list(recommendations)
 
     # Prepare prediction data for charts
     prediction_months = []
@@ -81,16 +106,9 @@ def dashboard(request):
     actual_amounts = []
     
     # Last 6 months actual data
-    for i in range(5, -1, -1):
-        date = today - timedelta(days=i*30)
-        month_expenses = Expense.objects.filter(
-            user=request.user,
-            date__year=date.year,
-            date__month=date.month
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        actual_amounts.append(float(month_expenses))
-        prediction_months.append(date.strftime('%B %Y'))
+    for entry in expense_series:
+        actual_amounts.append(float(entry['total']))
+        prediction_months.append(entry['label'])
 
     # Next 3 months predictions
     for prediction in predictions:
@@ -109,8 +127,11 @@ def dashboard(request):
         'actual_amounts': actual_amounts,
         'recommendations': recommendations,
         'predictions': predictions,
+        'last_computed_at': analysis_job.finished_at if analysis_job else None,
+        'forecast_horizon': get_forecast_settings()['HORIZON'],
+        'analysis_pending': analysis_job is None or analysis_job.status in ('pending', 'running'),
     }
-    return render(request, 'tracker/dashboard.html', context)
+    return context
 
 @login_required
 def add_expense(request):
@@ -170,93 +191,68 @@ def add_income(request):
     return render(request, 'tracker/add_income.html', {'form': form})
 
 @login_required
+@reporting
 def financial_summary(request):
     """View for displaying financial summary including income and expenses for the last 12 months."""
-    # Get the date range for the last 12 months
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=365)
-    
-    # Get expenses for the last 12 months
-    expenses = Expense.objects.filter(
-        user=request.user,
-        date__range=[start_date, end_date]
-    ).select_related('category')
-    
-    # Get income for the last 12 months
-    income = Income.objects.filter(
-        user=request.user,
-        date__range=[start_date, end_date]
+    today = timezone.now().date()
+    context = analytics_cache.get_or_compute(
+        request.user.id,
+        f'financial-summary:{today.year}-{today.month}',
+        lambda: _financial_summary_context(request.user, today)
     )
+    return render(request, 'tracker/financial_summary.html', context)
+
+def _financial_summary_context(user, end_date):
+    """Build the financial summary from grouped monthly totals; memory grows with months x categories."""
+    # The last 12 calendar months, this one included; monthly_series covers whole months, so a
+    # start 365 days back would add a 13th
+    start_date = datetime(*shift_month(end_date.year, end_date.month, -11), 1).date()
     
-    # Initialize monthly totals dictionary
+    # (month, category) sums for expenses and month sums for income, oldest month first
+    expense_series = monthly_series(user, start_date, end_date, by_category=True)
+    income_series = monthly_series(user, start_date, end_date, model=Income)
+
+    # Monthly totals keyed by (year, month), skipping months with no activity
     monthly_totals = {}
-    
-    # Process expenses
-    for expense in expenses:
-        month_key = expense.date.strftime('%B %Y')
-        if month_key not in monthly_totals:
-            monthly_totals[month_key] = {
-                'total_expenses': 0,
-                'total_income': 0,
-                'net_income': 0,
-                'categories': {}
-            }
-        
-        monthly_totals[month_key]['total_expenses'] += expense.amount
-        category_name = expense.category.name
-        if category_name not in monthly_totals[month_key]['categories']:
-            monthly_totals[month_key]['categories'][category_name] = 0
-        monthly_totals[month_key]['categories'][category_name] += expense.amount
-    
-    # Process income
-    for income_item in income:
-        month_key = income_item.date.strftime('%B %Y')
-        if month_key not in monthly_totals:
-            monthly_totals[month_key] = {
-                'total_expenses': 0,
-                'total_income': 0,
-                'net_income': 0,
-                'categories': {}
-            }
-        
-        monthly_totals[month_key]['total_income'] += income_item.amount
-    
-    # Calculate net income for each month
-    for month_data in monthly_totals.values():
-        month_data['net_income'] = month_data['total_income'] - month_data['total_expenses']
-    
-    # Sort months chronologically
-    sorted_months = sorted(monthly_totals.keys(), 
-                         key=lambda x: datetime.strptime(x, '%B %Y'))
+    for expense_month, income_month in zip(expense_series, income_series):
+        if not expense_month['total'] and not income_month['total']:
+            continue
+
+        monthly_totals[(expense_month['year'], expense_month['month'])] = {
+            'label': expense_month['label'],
+            'total_expenses': expense_month['total'],
+            'total_income': income_month['total'],
+            'net_income': income_month['total'] - expense_month['total'],
+            'categories': expense_month['categories']
+        }
     
     # Prepare data for the line graph
     months = []
     expense_data = []
     income_data = []
     
-    for month in sorted_months:
-        months.append(month)
-        expense_data.append(float(monthly_totals[month]['total_expenses']))
-        income_data.append(float(monthly_totals[month]['total_income']))
+    for month_data in monthly_totals.values():
+        months.append(month_data['label'])
+        expense_data.append(float(month_data['total_expenses']))
+        income_data.append(float(month_data['total_income']))
     
     # Convert to JSON for JavaScript
-    months_json = json.dumps(months)
-    expense_data_json = json.dumps(expense_data)
-    income_data_json = json.dumps(income_data)
-    
-    context = {
+    return {
         'monthly_totals': monthly_totals,
-        'months': months_json,
-        'expense_data': expense_data_json,
-        'income_data': income_data_json,
+        'months': json.dumps(months),
+        'expense_data': json.dumps(expense_data),
+        'income_data': json.dumps(income_data),
     }
-    
-    return render(request, 'tracker/financial_summary.html', context)
 
 @login_required
 def tax_deductions(request):
+    try:
+        tax_profile = UserTaxProfile.objects.get(user=request.user)
+    except UserTaxProfile.DoesNotExist:
+        tax_profile = None
+
     if request.method == 'POST':
-        form = TaxDeductionForm(request.POST, request.FILES, user=request.user)
+        form = TaxDeductionForm(request.POST, request.FILES, user=request.user, tax_profile=tax_profile)
         if form.is_valid():
             deduction = form.save(commit=False)
             deduction.user = request.user
@@ -264,20 +260,28 @@ def tax_deductions(request):
             messages.success(request, 'Tax deduction added successfully.')
             return redirect('tracker:tax_deductions')
     else:
-        form = TaxDeductionForm(user=request.user)
-
-    deductions = TaxDeduction.objects.filter(user=request.user).order_by('-date_claimed')
-    sections = DeductionSection.objects.all()
-
-    try:
-        tax_profile = UserTaxProfile.objects.get(user=request.user)
-    except UserTaxProfile.DoesNotExist:
-        tax_profile = None
+        form = TaxDeductionForm(user=request.user, tax_profile=tax_profile)
+
+    deductions = list(TaxDeduction.objects.filter(user=request.user).select_related(
+        'deduction_category'
+    ).order_by('-date_claimed'))
+
+    # Show the utilisation of the requested year, else of the latest year with claims
+    fiscal_years = sorted({deduction.fiscal_year for deduction in deductions}, reverse=True)
+    default_fiscal_year = fiscal_years[0] if fiscal_years else current_fiscal_year()
+    fiscal_year = request.GET.get('fiscal_year') or default_fiscal_year
+    if not is_valid_fiscal_year(fiscal_year):
+        # Not redirected, so a posted form keeps its errors
+        messages.error(request, 'Invalid fiscal year.')
+        fiscal_year = default_fiscal_year
+    headroom = deduction_headroom(request.user.id, fiscal_year)
 
     context = {
         'form': form,
         'deductions': deductions,
-        'sections': sections,
+        'sections': headroom['sections'],
+        'fiscal_year': fiscal_year,
+        'fiscal_years': fiscal_years,
         'tax_profile': tax_profile,
     }
     return render(request, 'tracker/tax_deductions.html', context)
@@ -328,6 +332,44 @@ def tax_profile(request):
 
     return render(request, 'tracker/tax_profile.html', {'form': form, 'tax_profile': tax_profile})
 
+def _regime_grid(request):
+    """The user's cached regime comparison grid for the requested fiscal year, or None if it is invalid."""
+    fiscal_year = request.GET.get('fiscal_year') or current_fiscal_year()
+    if not is_valid_fiscal_year(fiscal_year):
+        return None
+    # Deduction and income changes bump the data version; slab changes change the fingerprint,
+    # and deduction section or category changes the reference data version
+    return analytics_cache.get_or_compute(
+        request.user.id,
+        f'regime-grid:{fiscal_year}:{regimes_fingerprint()}:{reference_data.get().version}',
+        lambda: regime_grid(request.user.id, fiscal_year)
+    )
+
+@login_required
+def regime_comparison(request):
+    grid = _regime_grid(request)
+    if grid is None:
+        messages.error(request, 'Invalid fiscal year.')
+        return redirect('tracker:regime_comparison')
+
+    current_regime = UserTaxProfile.objects.filter(user=request.user).values_list('tax_regime', flat=True).first()
+    latest = current_fiscal_year()
+    start_year = int(latest[:4])
+    context = {
+        'grid': grid,
+        'current_regime': current_regime,
+        'fiscal_years': [f'{year}-{str(year + 1)[-2:]}' for year in range(start_year, start_year - 4, -1)],
+    }
+    return render(request, 'tracker/regime_comparison.html', context)
+
+@login_required
+def regime_comparison_data(request):
+    """The regime comparison grid as JSON, for clients that drive their own what-if controls."""
+    grid = _regime_grid(request)
+    if grid is None:
+        return JsonResponse({'error': 'Invalid fiscal_year parameter.'}, status=400)
+    return JsonResponse(grid)
+
 @login_required
 def edit_expense(request, expense_id):
     expense = get_object_or_404(Expense, id=expense_id, user=request.user)
@@ -374,7 +416,7 @@ def delete_category(request, category_id):
     category = get_object_or_404(Category, id=category_id, user=request.user)
     
     if request.method == 'POST':
-        category.delete()
+        purge_category(category)
         messages.success(request, 'Category deleted successfully.')
         return redirect('tracker:dashboard')
     
@@ -418,28 +460,43 @@ def register(request):
         form = UserRegistrationForm()
     return render(request, 'tracker/register.html', {'form': form})
 
-@login_required
-def get_monthly_data(request):
-    year = int(request.GET.get('year', timezone.now().year))
-    month = int(request.GET.get('month', timezone.now().month))
-    
-    # Get expenses for the selected month
-    expenses = Expense.objects.filter(
-        user=request.user,
-        date__year=year,
-        date__month=month
-    ).select_related('category')
-    
-    # Calculate total expenses
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    
-    # Get income for the selected month
-    monthly_income = Income.objects.filter(
-        user=request.user,
-        date__year=year,
-        date__month=month
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    
+MAX_MONTHLY_DATA_RANGE = 24  # Most months get_monthly_data returns in one response
+
+def _monthly_data_params(request):
+    """Parse year, month and the optional months=<first>:<last> offset range, or return None."""
+    try:
+        year = int(request.GET.get('year', timezone.now().year))
+        month = int(request.GET.get('month', timezone.now().month))
+        first, last = (int(part) for part in request.GET.get('months', '0:0').split(':'))
+    except ValueError:
+        return None
+    if not 1 <= month <= 12 or not first <= 0 <= last or last - first >= MAX_MONTHLY_DATA_RANGE:
+        return None
+    # Every month in the range has to be a datetime
+    if not all(MINYEAR <= shift_month(year, month, offset)[0] <= MAXYEAR for offset in (first, last)):
+        return None
+    return year, month, first, last
+
+def _data_version(request):
+    """The user's data version, looked up once per request."""
+    if not hasattr(request, '_tracker_data_version'):
+        request._tracker_data_version = analytics_cache.get_version(request.user.id)
+    return request._tracker_data_version
+
+def _monthly_data_etag(request):
+    params = _monthly_data_params(request)
+    if params is None:
+        return None
+    return '{:x}-{}-{}-{}-{}'.format(_data_version(request), *params)
+
+def _monthly_data_last_modified(request):
+    return analytics_cache.version_timestamp(_data_version(request))
+
+def _monthly_summary(year, month, expenses, income):
+    """Build the JSON summary for one month from its expense and income series entries."""
+    total_expenses = expenses['total']
+    monthly_income = income['total']
+
     # Calculate savings rate
     if monthly_income > 0:
         savings_rate = ((monthly_income - total_expenses) / monthly_income) * 100
@@ -447,20 +504,109 @@ def get_monthly_data(request):
         savings_rate = Decimal('0')
     
     # Get category totals
-    categories = Category.objects.filter(user=request.user)
     category_totals = []
-    for category in categories:
-        total = expenses.filter(category=category).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    for name, total in expenses['categories'].items():
         if total > 0:
             category_totals.append({
-                'name': category.name,
+                'name': name,
                 'total': float(total),
                 'percentage': float((total / total_expenses * 100) if total_expenses > 0 else Decimal('0'))
             })
     
-    return JsonResponse({
+    return {
+        'year': year,
+        'month': month,
         'total_expenses': float(total_expenses),
         'monthly_income': float(monthly_income),
         'savings_rate': float(savings_rate),
         'category_totals': category_totals
-    })
+    }
+
+def _monthly_data_payload(user, year, month, first, last):
+    # Get expense and income totals for every requested month in two queries
+    start = datetime(*shift_month(year, month, first), 1)
+    end = datetime(*shift_month(year, month, last), 1)
+    expense_series = monthly_series(user, start, end, by_category=True)
+    income_series = monthly_series(user, start, end, model=Income)
+
+    summaries = [
+        _monthly_summary(expenses['year'], expenses['month'], expenses, income)
+        for expenses, income in zip(expense_series, income_series)
+    ]
+
+    # The selected month stays at the top level for single-month callers
+    payload = dict(summaries[-first])
+    if (first, last) != (0, 0):
+        payload['months'] = summaries
+    return payload
+
+@login_required
+@reporting
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_monthly_data_etag, last_modified_func=_monthly_data_last_modified)
+def get_monthly_data(request):
+    """Monthly totals as JSON; answers conditional requests from the user's data version alone."""
+    params = _monthly_data_params(request)
+    if params is None:
+        return JsonResponse({'error': 'Invalid year, month or months parameter.'}, status=400)
+
+    payload = analytics_cache.get_or_compute(
+        request.user.id,
+        'monthly-data:{}-{}:{}:{}'.format(*params),
+        lambda: _monthly_data_payload(request.user, *params)
+    )
+    return JsonResponse(payload)
+
+def _export_params(request):
+    """Parse the export query string into export_stream keyword arguments, or return None."""
+    params = request.GET
+    record_type = params.get('type', 'all')
+    if record_type not in ('all', 'expense', 'income') or params.get('format', 'csv') not in EXPORT_FORMATS:
+        return None
+    try:
+        start_date = datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') else None
+        end_date = datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end') else None
+    except ValueError:
+        return None
+    return {
+        'format': params.get('format', 'csv'),
+        'compress': params.get('gzip') in ('1', 'true'),
+        'start_date': start_date,
+        'end_date': end_date,
+        'categories': params.getlist('category'),
+        'sources': params.getlist('source'),
+        'types': ('expense', 'income') if record_type == 'all' else (record_type,),
+    }
+
+@login_required
+@reporting
+def export_data(request):
+    """Stream the user's expenses and income as a CSV or JSON-lines download."""
+    params = _export_params(request)
+    if params is None:
+        return JsonResponse({'error': 'Invalid format, type, start or end parameter.'}, status=400)
+
+    content_type = 'text/csv' if params['format'] == 'csv' else 'application/x-ndjson'
+    if params['compress']:
+        content_type = 'application/gzip'
+    # The rows are read while the response streams, after the view has returned
+    response = StreamingHttpResponse(export_stream(request.user, using=read_alias(), **params), content_type=content_type)
+    filename = export_filename(request.user, params['format'], params['compress'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@staff_member_required
+def query_stats_summary(request):
+    """Per-URL query counts and SQL timings collected by QueryInstrumentationMiddleware."""
+    if request.method == 'POST':
+        query_stats.clear()
+        messages.success(request, 'Query statistics cleared.')
+        return redirect('tracker:query_stats')
+    return render(request, 'tracker/query_stats.html', {'rows': query_stats.summary()})
+
+@staff_member_required
+def database_diagnostics(request):
+    """Configured and active SQLite pragmas of this worker's database connection."""
+    if connection.vendor != 'sqlite':
+        return JsonResponse({'vendor': connection.vendor})
+    return JsonResponse(sqlite_diagnostics(connection))